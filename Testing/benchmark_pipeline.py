@@ -0,0 +1,363 @@
+# file: benchmark_pipeline.py
+
+'''
+Microbenchmarks for the text-to-code pipeline at scale.
+Generates synthetic lexicons (1k to 1M terms) and transcripts (100 to 50k words), then
+measures each stage: keyword extraction (extract_medical_entities, and incrementally over
+dictation-sized phrases with ExtractorSession), Azure entity mapping
+(map_terms_from_azure, exact + fuzzy), convert_entities_to_mapped, and building/serializing
+the Pydantic response models. For every stage it records the latency distribution,
+throughput and peak traced memory, and saves the results as a JSON baseline.
+
+    python Testing/benchmark_pipeline.py run --output Testing/benchmark_baselines/baseline.json
+    python Testing/benchmark_pipeline.py run --quick --output /tmp/current.json
+    python Testing/benchmark_pipeline.py compare Testing/benchmark_baselines/baseline.json /tmp/current.json
+
+The full default run (up to 1M terms) takes a few minutes and several GiB of memory, most of it
+compiling the largest lexicon under tracemalloc; use --quick or --lexicon-sizes for a short run.
+`compare` exits with status 1 when a stage's p50 latency or peak memory regressed by more
+than the threshold (default 20%), so it can gate a CI job.
+'''
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import string
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AZURE_SPEECH_KEY", "benchmark")  # Settings require a key; nothing here calls Azure
+
+from app.models.schemas import TranscriptionResponse
+from app.services.lexicon import Lexicon, write_lexicon_artifact
+from app.services.term_index import install_lexicon
+from app.services.entity_extractor import ExtractorSession, extract_medical_entities
+from app.services.term_mapper import AZURE_CATEGORY_MAP, map_terms_from_azure
+from app.services.pipeline import convert_entities_to_mapped
+
+DEFAULT_LEXICON_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_TRANSCRIPT_WORDS = [100, 1_000, 10_000, 50_000]
+QUICK_LEXICON_SIZES = [1_000, 10_000]
+QUICK_TRANSCRIPT_WORDS = [100, 1_000]
+
+# Internal term types the synthetic lexicon spreads its terms over (all reachable from Azure categories)
+CATEGORIES = ["procedure", "diagnosis", "lab_test", "medication", "symptom"]
+AZURE_CATEGORY_FOR = {internal: azure for azure, internal in AZURE_CATEGORY_MAP.items()}
+FILLER_WORDS = ("the patient was seen today and reports no new complaints with stable vitals "
+                "plan to follow up in two weeks continue current regimen as discussed").split()
+AZURE_ENTITIES_PER_CALL = 200
+TERM_DENSITY = 0.05  # Fraction of transcript words that start a lexicon term
+PHRASE_WORDS = 10  # Words per appended phrase in the incremental extraction stage
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def synthetic_entries(size: int, seed: int) -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """{(type, term): (code, standard_name)} with unique 1-3 word pseudo-medical terms"""
+    rng = random.Random(seed)
+    syllables = ["ab", "cor", "di", "en", "fa", "gly", "hem", "io", "ka", "lo", "my", "neu",
+                 "os", "pa", "qui", "ren", "sta", "tox", "ur", "vas", "xy", "zo"]
+    entries = {}
+    while len(entries) < size:
+        words = [
+            "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+            for _ in range(rng.choice((1, 1, 2, 2, 3)))
+        ]
+        term = " ".join(words)
+        category = CATEGORIES[len(entries) % len(CATEGORIES)]
+        if (category, term) in entries:
+            continue
+        code = f"{category[:3].upper()}{len(entries):07d}"
+        entries[(category, term)] = (code, term.title())
+    return entries
+
+
+def synthetic_transcript(terms: List[str], words: int, seed: int) -> str:
+    """Filler text with lexicon terms sprinkled in at TERM_DENSITY"""
+    rng = random.Random(seed)
+    out: List[str] = []
+    while len(out) < words:
+        if rng.random() < TERM_DENSITY:
+            out.extend(rng.choice(terms).split())
+        else:
+            out.append(rng.choice(FILLER_WORDS))
+    return " ".join(out[:words])
+
+
+def misspell(term: str, rng: random.Random) -> str:
+    # One substituted character: close enough for the fuzzy matcher (ratio >= 0.8 for most terms)
+    i = rng.randrange(len(term))
+    return term[:i] + rng.choice(string.ascii_lowercase) + term[i + 1:]
+
+
+def synthetic_azure_entities(entries: List[Tuple[str, str]], count: int, seed: int) -> List[dict]:
+    """Azure-style entities: 50% exact terms, 30% misspelled (fuzzy path), 20% unmapped categories"""
+    rng = random.Random(seed)
+    entities = []
+    for i in range(count):
+        category, term = rng.choice(entries)
+        roll = rng.random()
+        if roll < 0.5:
+            text, azure_category = term, AZURE_CATEGORY_FOR[category]
+        elif roll < 0.8:
+            text, azure_category = misspell(term, rng), AZURE_CATEGORY_FOR[category]
+        else:
+            text, azure_category = term, "Organization"
+        entities.append({"category": azure_category, "text": text, "offset": i * 10,
+                         "length": len(text), "confidence_score": 0.9})
+    return entities
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    rank = max(1, min(len(sorted_values), math.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def measure(fn: Callable[[], object], max_repeats: int, max_seconds: float, min_repeats: int = 3) -> dict:
+    """
+    Time `fn` repeatedly (after one warm-up call, reported as cold_ms) until `max_repeats`
+    runs or `max_seconds` elapse, then run it once more under tracemalloc for peak memory.
+    """
+    started = time.perf_counter()
+    fn()
+    cold_ms = (time.perf_counter() - started) * 1000.0
+
+    samples: List[float] = []
+    budget_end = time.perf_counter() + max_seconds
+    while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() < budget_end):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "repeats": len(samples),
+        "cold_ms": round(cold_ms, 4),
+        "latency_ms": {
+            "min": round(samples[0], 4),
+            "p50": round(percentile(samples, 50), 4),
+            "p95": round(percentile(samples, 95), 4),
+            "p99": round(percentile(samples, 99), 4),
+            "max": round(samples[-1], 4),
+            "mean": round(sum(samples) / len(samples), 4),
+        },
+        "peak_memory_kb": round(peak / 1024.0, 1),
+    }
+
+
+def stage_result(stage: str, lexicon_terms: int, transcript_words: Optional[int], stats: dict,
+                 items: int, unit: str) -> dict:
+    p50_s = stats["latency_ms"]["p50"] / 1000.0
+    return {
+        "stage": stage,
+        "lexicon_terms": lexicon_terms,
+        "transcript_words": transcript_words,
+        **stats,
+        "throughput": {"value": round(items / p50_s, 1) if p50_s > 0 else None, "unit": unit},
+    }
+
+
+def build_lexicon(size: int, seed: int, workdir: str) -> Tuple[Lexicon, dict, Dict]:
+    """Compile and map a synthetic lexicon, timing the build and tracing its peak memory"""
+    entries = synthetic_entries(size, seed)
+    path = os.path.join(workdir, f"synthetic_{size}.lex")
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        write_lexicon_artifact(entries, path)
+        build_ms = (time.perf_counter() - started) * 1000.0
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    lexicon = Lexicon(path)
+    build = {
+        "stage": "lexicon_build",
+        "lexicon_terms": size,
+        "transcript_words": None,
+        "repeats": 1,
+        "latency_ms": {"p50": round(build_ms, 2)},
+        "peak_memory_kb": round(peak / 1024.0, 1),
+        "artifact_bytes": os.path.getsize(path),
+        "throughput": {"value": round(size / (build_ms / 1000.0), 1), "unit": "terms/s"},
+    }
+    return lexicon, build, entries
+
+
+def extract_incrementally(phrases: List[str]) -> int:
+    session = ExtractorSession()
+    found = sum(len(session.append(phrase)) for phrase in phrases)
+    return found + len(session.close())
+
+
+def run_benchmarks(lexicon_sizes: List[int], transcript_words: List[int], max_repeats: int,
+                   max_seconds: float, seed: int, log: Callable[[str], None]) -> List[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="lexicon-bench-") as workdir:
+        for size in lexicon_sizes:
+            log(f"Lexicon with {size:,} terms: building...")
+            lexicon, build, entries = build_lexicon(size, seed, workdir)
+            install_lexicon(lexicon)
+            results.append(build)
+            log(f"  built in {build['latency_ms']['p50']:.0f} ms, peak {build['peak_memory_kb'] / 1024:.1f} MiB")
+
+            keys = list(entries)
+            terms = [term for _, term in keys]
+
+            # Azure entity mapping depends on the lexicon only (cold_ms includes fuzzy index builds)
+            azure_entities = synthetic_azure_entities(keys, AZURE_ENTITIES_PER_CALL, seed)
+            stats = measure(lambda: map_terms_from_azure(azure_entities), max_repeats, max_seconds)
+            results.append(stage_result("map_terms_from_azure", size, None, stats, len(azure_entities), "entities/s"))
+            log(f"  map_terms_from_azure: p50 {stats['latency_ms']['p50']:.2f} ms")
+
+            for words in transcript_words:
+                transcript = synthetic_transcript(terms, words, seed + words)
+
+                stats = measure(lambda: extract_medical_entities(transcript), max_repeats, max_seconds)
+                results.append(stage_result("extract_medical_entities", size, words, stats, words, "words/s"))
+
+                entities = extract_medical_entities(transcript)
+                stats = measure(lambda: convert_entities_to_mapped(entities), max_repeats, max_seconds)
+                results.append(stage_result("convert_entities_to_mapped", size, words, stats,
+                                            max(len(entities), 1), "entities/s"))
+
+                mapped = convert_entities_to_mapped(entities)
+                stats = measure(
+                    lambda: TranscriptionResponse(transcription=transcript, structured_data=mapped).model_dump(),
+                    max_repeats, max_seconds)
+                results.append(stage_result("response_model", size, words, stats, max(len(mapped), 1), "terms/s"))
+
+                log(f"  {words:>6,} words: extract p50 {results[-3]['latency_ms']['p50']:.2f} ms, "
+                    f"{len(entities)} entities")
+
+                # Live dictation: the same transcript arriving as phrases of PHRASE_WORDS words
+                phrase_words = transcript.split(" ")
+                phrases = [" ".join(phrase_words[i:i + PHRASE_WORDS]) + " "
+                           for i in range(0, len(phrase_words), PHRASE_WORDS)]
+                stats = measure(lambda: extract_incrementally(phrases), max_repeats, max_seconds)
+                results.append(stage_result("extractor_session", size, words, stats, words, "words/s"))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------------------------
+
+def result_key(result: dict) -> Tuple:
+    return result["stage"], result["lexicon_terms"], result["transcript_words"]
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> Tuple[List[dict], bool]:
+    """Match stages of two runs and flag p50 latency / peak memory growth beyond `threshold`"""
+    base_results = {result_key(r): r for r in baseline["results"]}
+    rows = []
+    regressed = False
+    for result in current["results"]:
+        base = base_results.get(result_key(result))
+        if base is None:
+            continue
+        row = {"stage": result["stage"], "lexicon_terms": result["lexicon_terms"],
+               "transcript_words": result["transcript_words"]}
+        for metric, old, new in (
+            ("p50_ms", base["latency_ms"]["p50"], result["latency_ms"]["p50"]),
+            ("peak_kb", base["peak_memory_kb"], result["peak_memory_kb"]),
+        ):
+            change = (new - old) / old if old else 0.0
+            row[metric] = (old, new, change)
+            if change > threshold:
+                row["regressed"] = True
+                regressed = True
+        rows.append(row)
+    return rows, regressed
+
+
+def print_comparison(rows: List[dict], threshold: float):
+    print(f"{'stage':<28}{'terms':>10}{'words':>8}{'p50 ms (old -> new)':>30}{'peak KiB (old -> new)':>34}")
+    for row in rows:
+        words = row["transcript_words"] if row["transcript_words"] is not None else "-"
+        cells = []
+        for metric in ("p50_ms", "peak_kb"):
+            old, new, change = row[metric]
+            flag = " !" if change > threshold else ""
+            cells.append(f"{old:>10.2f} -> {new:>10.2f} {change:+6.1%}{flag}")
+        print(f"{row['stage']:<28}{row['lexicon_terms']:>10,}{words:>8}{cells[0]:>30}{cells[1]:>34}")
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(float(v)) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the text-to-code pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the benchmarks and write a JSON baseline")
+    run.add_argument("--lexicon-sizes", type=parse_sizes, default=None,
+                     help="Comma-separated term counts (default 1000,10000,100000,1000000)")
+    run.add_argument("--transcript-words", type=parse_sizes, default=None,
+                     help="Comma-separated transcript lengths (default 100,1000,10000,50000)")
+    run.add_argument("--quick", action="store_true", help="Small sizes only, for a fast smoke run")
+    run.add_argument("--repeats", type=int, default=50, help="Max timed runs per stage")
+    run.add_argument("--max-seconds", type=float, default=3.0, help="Time budget per stage (at least 3 runs)")
+    run.add_argument("--seed", type=int, default=1234)
+    run.add_argument("--output", help="Write results to this JSON file")
+
+    cmp_parser = sub.add_parser("compare", help="Compare two result files and flag regressions")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--threshold", type=float, default=0.20, help="Allowed relative growth (0.20 = 20%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        rows, regressed = compare(baseline, current, args.threshold)
+        print_comparison(rows, args.threshold)
+        if regressed:
+            print(f"Regression: at least one stage grew by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("No regressions")
+        return
+
+    lexicon_sizes = args.lexicon_sizes or (QUICK_LEXICON_SIZES if args.quick else DEFAULT_LEXICON_SIZES)
+    transcript_words = args.transcript_words or (QUICK_TRANSCRIPT_WORDS if args.quick else DEFAULT_TRANSCRIPT_WORDS)
+    results = run_benchmarks(lexicon_sizes, transcript_words, args.repeats, args.max_seconds, args.seed, print)
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# file: load_test.py
+
+'''
+Load-test harness for the transcription API.
+Drives POST /api/transcribe/file at a fixed target request rate (open loop: requests are
+sent on schedule whether or not earlier ones have finished) and reports latency
+percentiles against the 200 ms response-time target from Test_queries_Q1.txt.
+
+Run the server with the offline recognizer so results reflect our own code, not Azure:
+    RECOGNIZER_BACKEND=stub python -m uvicorn app.main:app --port 8000
+    python Testing/load_test.py --file audio_files/output_converted.wav --rps 20 --duration 30
+
+Requires httpx (pip install httpx).
+'''
+
+import os
+import math
+import json
+import time
+import asyncio
+import argparse
+from typing import List, Optional
+
+import httpx
+
+TARGET_MS = 200.0  # Ideal response time from Testing/Test_queries_Q1.txt
+
+
+# Nearest-rank percentile of an ascending list
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), math.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+async def run_load(url: str, audio: bytes, filename: str, content_type: str, rps: float, duration: float,
+                   language: str, max_in_flight: int, bust_cache: bool, timeout: float) -> dict:
+    """Send requests at `rps` for `duration` seconds and collect per-request latency and status"""
+    latencies: List[float] = []
+    statuses = {}
+    errors = 0
+    dropped = 0
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def one_request(seq: int):
+            nonlocal errors
+            # Trailing bytes after the WAV data change the content hash (defeating the transcription
+            # cache) without changing the decoded audio
+            payload = audio + seq.to_bytes(8, "little") + os.urandom(8) if bust_cache else audio
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    url,
+                    files={"file": (filename, payload, content_type)},
+                    data={"language": language},
+                )
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - started) * 1000.0)
+                else:
+                    errors += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+                errors += 1
+            finally:
+                in_flight.release()
+
+        tasks = []
+        interval = 1.0 / rps
+        started = time.perf_counter()
+        total = int(rps * duration)
+        for seq in range(total):
+            # Open-loop schedule: request `seq` is due at seq * interval, regardless of earlier responses
+            delay = started + seq * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight.locked():
+                dropped += 1  # Client-side cap reached: the server is not keeping up with the target rate
+                continue
+            await in_flight.acquire()
+            tasks.append(asyncio.create_task(one_request(seq)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    sent = len(tasks)
+    report = {
+        "url": url,
+        "target_rps": rps,
+        "achieved_rps": round(sent / elapsed, 2) if elapsed else 0.0,
+        "duration_s": round(elapsed, 2),
+        "sent": sent,
+        "dropped": dropped,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / sent, 4) if sent else 0.0,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "latency_ms": {
+            "min": latencies[0] if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+        },
+        "target_ms": TARGET_MS,
+        "within_target": round(sum(1 for l in latencies if l < TARGET_MS) / len(latencies), 4) if latencies else None,
+    }
+    for key, value in report["latency_ms"].items():
+        if value is not None:
+            report["latency_ms"][key] = round(value, 2)
+    return report
+
+
+def print_report(report: dict):
+    latency = report["latency_ms"]
+    print(f"Target {report['target_rps']} rps -> achieved {report['achieved_rps']} rps over {report['duration_s']}s")
+    print(f"Requests: {report['sent']} sent, {report['succeeded']} ok, {report['errors']} errors, "
+          f"{report['dropped']} dropped (client in-flight cap)")
+    print(f"Statuses: {report['statuses']}")
+    for name in ("p50", "p95", "p99"):
+        value = latency[name]
+        if value is None:
+            print(f"  {name}: n/a")
+        else:
+            verdict = "OK" if value < TARGET_MS else "OVER"
+            print(f"  {name}: {value:8.2f} ms  [{verdict} vs {TARGET_MS:.0f} ms target]")
+    if report["within_target"] is not None:
+        print(f"  {report['within_target'] * 100:.1f}% of successful requests under {TARGET_MS:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive /api/transcribe/file at a target request rate")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/transcribe/file")
+    parser.add_argument("--file", required=True, help="Audio file to upload on every request")
+    parser.add_argument("--content-type", default=None, help="MIME type (guessed from the extension by default)")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test length in seconds")
+    parser.add_argument("--language", default="en-US")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Client-side cap on concurrent requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--no-bust-cache", action="store_true",
+                        help="Send identical bytes every time (measures transcription cache hits)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as f:
+        audio = f.read()
+    extension = os.path.splitext(args.file)[1].lower()
+    content_type = args.content_type or {
+        ".wav": "audio/wav", ".mp3": "audio/mpeg", ".webm": "audio/webm"
+    }.get(extension, "audio/wav")
+
+    report = asyncio.run(run_load(
+        args.url, audio, os.path.basename(args.file), content_type, args.rps, args.duration,
+        args.language, args.max_in_flight, not args.no_bust_cache, args.timeout,
+    ))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# file: startup_time.py
+
+'''
+Cold-start check for the API.
+Starts a fresh uvicorn worker, then polls /api/health (liveness) and /api/ready
+(readiness) and reports how long each took to answer, the per-phase startup timings
+the app measured itself, and whether startup stayed within the budget
+(settings.STARTUP_BUDGET_S unless --budget is given). Exits with status 1 when over budget,
+so it can gate a deployment pipeline.
+
+    RECOGNIZER_BACKEND=stub python Testing/startup_time.py --runs 3
+
+Requires httpx (pip install httpx).
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for(client: httpx.Client, url: str, started: float, deadline: float, status: int = 200) -> Optional[float]:
+    """Seconds from `started` until `url` answers with `status`, or None if the deadline passed"""
+    while time.monotonic() < deadline:
+        try:
+            if client.get(url).status_code == status:
+                return time.monotonic() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def fmt(seconds: Optional[float]) -> str:
+    return "n/a" if seconds is None else f"{seconds:.3f}s"
+
+
+def measure_once(port: int, timeout: float) -> dict:
+    """Start one worker, time liveness and readiness, collect its own startup report, stop it"""
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    started = time.monotonic()
+    server = subprocess.Popen(command, cwd=ROOT)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = started + timeout
+        with httpx.Client(timeout=2.0) as client:
+            live = wait_for(client, f"{base}/api/health", started, deadline)
+            ready = wait_for(client, f"{base}/api/ready", started, deadline)
+            report = client.get(f"{base}/api/ready").json() if ready is not None else None
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {"live_seconds": live, "ready_seconds": ready, "app_report": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API cold start (time to live and to ready)")
+    parser.add_argument("--runs", type=int, default=1, help="Cold starts to measure")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a run after this many seconds")
+    parser.add_argument("--budget", type=float, default=None, help="Seconds to ready (default: STARTUP_BUDGET_S)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    runs = []
+    for run in range(args.runs):
+        result = measure_once(args.port, args.timeout)
+        runs.append(result)
+        report = result["app_report"] or {}
+        phases = ", ".join(f"{name} {phase['seconds']}s" for name, phase in report.get("phases", {}).items())
+        print(f"Run {run + 1}: live after {fmt(result['live_seconds'])}, ready after {fmt(result['ready_seconds'])} "
+              f"(app measured {report.get('startup_seconds')}s; {phases or 'no phases reported'})")
+
+    ready_times = [r["ready_seconds"] for r in runs]
+    budget = args.budget if args.budget is not None else (runs[-1]["app_report"] or {}).get("budget_seconds")
+    worst = None if None in ready_times else max(ready_times)
+    within = worst is not None and budget is not None and worst <= budget
+    print(f"Worst time to ready: {fmt(worst)} vs budget {budget}s -> {'OK' if within else 'OVER'}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"budget_seconds": budget, "runs": runs}, f, indent=2)
+    sys.exit(0 if within else 1)
+
+
+if __name__ == "__main__":
+    main()
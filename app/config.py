@@ -1,31 +1,95 @@
 #  file: config.py
 '''
 This configuration module defines application settings for the FastAPI backend. 
-It loads environment variables (e.g., Azure credentials, file paths) using `pydantic-settings` 
-and ensures necessary directories like the upload path are created at runtime.
+It loads environment variables (e.g., Azure credentials, file paths) using `pydantic-settings`.
+Loading settings has no side effects; runtime directories are created by the app itself
+(and by the services that write into them), so CLIs and workers can import this cheaply.
 '''
 
 from pydantic_settings import BaseSettings
 from pathlib import Path
-import os
+from typing import Optional
 
 # Define a class for environment-based settings using Pydantic's BaseSettings
 class Settings(BaseSettings):
     AZURE_SPEECH_KEY: str                # Required: Azure Speech API key
     AZURE_SPEECH_REGION: str = "eastus"  # Optional: defaults to 'eastus' if not set
+    AZURE_SPEECH_ENDPOINT: str = ""      # Optional: full service URL overriding the region (e.g. a local stand-in)
 
     UPLOAD_DIR: str = "uploads"                                 # Directory where logs and uploaded files are stored
     MEDICAL_TERMS_PATH: str = "mock_data/medical_terms.xlsx"    # Path to Excel file containing medical code mappings
+    LEXICON_ARTIFACT_PATH: str = "mock_data/medical_terms.lex"  # Compiled, memory-mappable lexicon built from the workbook
+    TERM_INDEX_RELOAD_INTERVAL_S: float = 2.0                   # How often the term workbook's mtime is checked for hot reload
+
+    RECOGNIZER_BACKEND: str = "azure"                           # Speech recognizer: "azure", or "stub" for the offline stand-in
+    STUB_TRANSCRIPTS_PATH: str = ""                             # Stub: file with one scripted transcript per line (built-in scripts if empty)
+    STUB_LATENCY_MEDIAN_MS: float = 50.0                        # Stub: median simulated recognition latency per call
+    STUB_LATENCY_P99_MS: float = 150.0                          # Stub: 99th percentile latency (log-normal spread)
+    STUB_SECONDS_PER_AUDIO_SECOND: float = 0.0                  # Stub: extra latency per second of audio recognized
+    STUB_ERROR_RATE: float = 0.0                                # Stub: probability that a recognition call fails
+    STUB_STREAM_WORD_MS: int = 300                              # Stub: audio per revealed word in streaming partial results
+    STUB_SEED: Optional[int] = None                             # Stub: seed for reproducible latency/error draws
+
+    RECOGNITION_MAX_WORKERS: int = 16                           # Max recognitions in flight (and recognition pool threads) per worker process
+    LIVE_RECOGNITION_TIMEOUT_BASE_S: float = 5.0                # Fixed allowance for a live clip to finish recognizing
+    LIVE_RECOGNITION_TIMEOUT_FACTOR: float = 1.5                # Extra seconds allowed per second of live audio
+    RECOGNITION_SEGMENT_MAX_S: float = 20.0                     # Longest segment a recording is split into (cut at silences)
+    RECOGNITION_SEGMENT_PARALLELISM: int = 8                    # Segments of one recording recognized concurrently
+    RECOGNITION_ATTEMPT_TIMEOUT_S: float = 120.0                # A single segment recognition call is abandoned after this
+    RECOGNITION_MAX_ATTEMPTS: int = 3                           # Tries per segment for transient failures (1 disables retries)
+    RECOGNITION_RETRY_BASE_S: float = 0.2                       # Backoff before the first retry (doubles per retry, fully jittered)
+    RECOGNITION_RETRY_MAX_S: float = 2.0                        # Upper bound of the retry backoff
+    RECOGNITION_HEDGE_PERCENTILE: float = 95.0                  # Send a duplicate call once this latency percentile is exceeded (0 disables)
+    RECOGNITION_HEDGE_MIN_DELAY_S: float = 0.05                 # Never hedge a call sooner than this
+    RECOGNITION_HEDGE_MAX_RATIO: float = 0.1                    # Hedged calls allowed, as a fraction of all calls
+    RECOGNITION_BREAKER_WINDOW: int = 50                        # Recent attempts the circuit breaker looks at
+    RECOGNITION_BREAKER_MIN_CALLS: int = 20                     # Attempts needed in the window before the circuit can open
+    RECOGNITION_BREAKER_FAILURE_RATIO: float = 0.5              # Failure share in the window that opens the circuit
+    RECOGNITION_BREAKER_COOLDOWN_S: float = 15.0                # How long an open circuit fails fast before probing again
+    SPEECH_POOL_SIZE: int = 4                                   # Pre-connected recognizers kept per language (0 disables warming)
+    SPEECH_POOL_LANGUAGES: str = "en-US"                        # Comma-separated languages warmed at startup
+    SPEECH_POOL_IDLE_RECYCLE_S: float = 240.0                   # Warm connections unused this long are closed and reopened
+    SPEECH_POOL_MAINTENANCE_INTERVAL_S: float = 30.0            # How often idle/broken warm connections are checked
+    FFMPEG_MAX_CONCURRENCY: int = 4                             # Max ffmpeg conversion subprocesses running at once
+    PREPROCESS_TRIM_SILENCE: bool = True                        # Trim edge silence and shorten long pauses before recognition
+    PREPROCESS_EDGE_PAD_S: float = 0.25                         # Silence kept before the first and after the last speech
+    PREPROCESS_MAX_PAUSE_S: float = 0.8                         # Longer pauses are shortened to this (keep above the segmenter's 0.4s)
+
+    ADMISSION_MAX_CONCURRENT: int = 16                          # Admitted work running at once: single files, batch items, uploads being received
+    ADMISSION_MAX_INFLIGHT_MB: float = 200.0                    # Bytes held by admitted work (by Content-Length while an upload is received)
+    ADMISSION_QUEUE_SIZE: int = 32                              # Requests allowed to wait for a slot; more are refused with 429
+    ADMISSION_MAX_WAIT_S: float = 10.0                          # Longest wait for a slot before answering 503
+    ADMISSION_DEFAULT_PRIORITY: str = "routine"                 # Priority when none is given: "stat", "urgent" or "routine"
+
+    BATCH_MAX_CONCURRENCY: int = 4                              # Files of one batch request transcribed concurrently
+    BATCH_MAX_FILES: int = 1000                                 # Most audio files accepted in one batch (after unzipping)
+    BATCH_MAX_UPLOAD_MB: int = 20                               # Size limit of a batch request body (parts are spooled to disk)
+
+    JOBS_DB_PATH: str = "uploads/jobs.sqlite3"                  # SQLite database backing the transcription job queue
+    JOBS_WORKERS: int = 2                                       # Background jobs processed concurrently per process (0 disables)
+    JOBS_MAX_FILE_MB: int = 200                                 # Size limit of audio submitted as a job
+    JOBS_MAX_ATTEMPTS: int = 3                                  # Interrupted jobs are retried on restart up to this many attempts
+    JOBS_POLL_INTERVAL_S: float = 1.0                           # How often idle workers and event streams re-check the queue
+    JOBS_HEARTBEAT_INTERVAL_S: float = 10.0                     # How often a process renews the leases of the jobs it runs
+    JOBS_LEASE_S: float = 60.0                                  # A running job whose lease is not renewed this long is requeued
+    JOBS_RETENTION_DAYS: float = 7.0                            # Finished jobs older than this are pruned at startup
+
+    EXPORT_MAX_UPLOAD_MB: int = 500                             # Size limit of a results file posted to /api/export
+
+    TRANSCRIPTION_CACHE_ENABLED: bool = True                    # Reuse transcriptions of byte-identical re-submitted audio
+    TRANSCRIPTION_CACHE_MEMORY_ENTRIES: int = 256               # Results kept in the in-memory LRU tier
+    TRANSCRIPTION_CACHE_DISK_MAX_MB: float = 256.0              # Size bound of the on-disk tier under UPLOAD_DIR (0 disables it)
+
+    PROFILE_SAMPLE_RATE: float = 0.0                            # Fraction of /api/transcribe/file requests profiled with cProfile
+    PROFILE_HEADER_ENABLED: bool = False                        # Allow clients to request a profile with the X-Profile: 1 header
+    PROFILE_TOKEN: str = ""                                     # If set, X-Profile requests must also send it as X-Profile-Token
+    PROFILE_MAX_FILES: int = 50                                 # Newest profiles kept under UPLOAD_DIR/profiles; older ones are deleted
+
+    STARTUP_BUDGET_S: float = 10.0                              # Target time from import to ready; exceeding it logs a warning
 
     class Config:
         # Specify the location of the .env file (two levels up from this file)
         env_file = Path(__file__).resolve().parent.parent / ".env"
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Ensure the upload directory exists at runtime (created if not found)
-        os.makedirs(self.UPLOAD_DIR, exist_ok=True)
-        print(f"Upload directory created at: {self.UPLOAD_DIR}")
-
 # Create a singleton instance of the settings to be used across the app
 settings = Settings()
@@ -2,20 +2,36 @@
 '''
 This is the main entry point of the FastAPI backend for the Medical Voice Dictation Processor. 
 It initializes the FastAPI app, configures middleware (e.g., CORS), sets up routes (API and static content), 
-provides health check and Azure configuration test endpoints, and configures logging.
+provides health (liveness), readiness, metrics and Azure configuration test endpoints, and configures logging.
+Slow preparation (lexicon, recognizer warm-up, job recovery) runs as background startup phases.
 '''
 
+# Imported first so the measured startup time includes loading FastAPI and the services
+from app.services.startup import is_ready, phase_started, start_phases, startup_status, stop_phases
+
 # Import necessary modules from FastAPI and Python standard libraries
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+import os
+import time
+import asyncio
 import logging
 
 # Import internal modules and settings
-from app.routers import transcription
+from app.routers import transcription, jobs, export
 from app.config import settings
+from app.services.term_index import get_term_index, term_index_status
+from app.services.recognition_executor import recognition_stats, shutdown_executor
+from app.services.transcription_cache import get_transcription_cache, transcription_cache_status
+from app.services.recognizer_backend import get_recognizer_backend, recognizer_backend_status
+from app.services.job_queue import start_job_workers, stop_job_workers, job_queue_status
+from app.services.audio_convert import conversion_stats
+from app.services.admission import admission_status, get_admission_controller, parse_priority
+from app.services.resilience import resilience_status
+from app.services.metrics import REQUEST_SECONDS, register_collector, render_prometheus
 
 # Initialize FastAPI app with metadata and tags for documentation
 app = FastAPI(
@@ -47,12 +63,169 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Upload size limits per endpoint, checked against Content-Length before the body is read
+UPLOAD_SIZE_LIMITS = {
+    "/api/transcribe/file": transcription.MAX_FILE_SIZE_MB * 1024 * 1024,
+    "/api/transcribe/batch": settings.BATCH_MAX_UPLOAD_MB * 1024 * 1024,
+    "/api/jobs": settings.JOBS_MAX_FILE_MB * 1024 * 1024,
+    "/api/export": settings.EXPORT_MAX_UPLOAD_MB * 1024 * 1024,
+}
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Allowance for multipart boundaries and form fields
+
+# Every upload endpoint is admitted before its body is read, charged by Content-Length (see services/admission.py)
+ADMITTED_UPLOADS = set(UPLOAD_SIZE_LIMITS)
+
+# Hold an admission slot and in-flight byte budget from before the body is read until the response
+# is ready, so queued requests do not spool their uploads meanwhile. The priority comes from X-Priority.
+# For /file this spans the whole transcription; for /batch, /jobs and /export it spans receiving and
+# spooling the upload (batch items are then admitted one by one as they run).
+@app.middleware("http")
+async def admit_uploads(request: Request, call_next):
+    if request.method != "POST" or request.url.path not in ADMITTED_UPLOADS:
+        return await call_next(request)
+    try:
+        priority = parse_priority(request.headers.get("X-Priority"))
+        async with get_admission_controller().admit(int(request.headers.get("content-length") or 0), priority):
+            return await call_next(request)
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers=e.headers)
+
+# Reject oversized uploads up front so they never reach multipart parsing. Uploads without a
+# Content-Length (chunked transfer encoding) are refused with 411, since their size is only
+# known once Starlette has spooled the whole body.
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    limit = UPLOAD_SIZE_LIMITS.get(request.url.path)
+    content_length = request.headers.get("content-length", "")
+    if limit is not None and request.method == "POST" and not content_length.isdigit():
+        return JSONResponse(status_code=411, content={"detail": "Uploads must send a Content-Length header"})
+    if limit is not None and content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File size exceeds {limit // (1024 * 1024)}MB limit"}
+        )
+    return await call_next(request)
+
+# Time every request into http_request_duration_seconds, labelled by route template (not raw path)
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            getattr(route, "path", "unmatched"), request.method, str(status),
+        )
+
+# Gauges and counters read from the services' own status reports when /api/metrics is scraped.
+# Each status source is its own collector, so one failing read (e.g. a locked jobs database)
+# drops only its block and is counted in collector_errors_total.
+def collect_recognition_metrics():
+    recognition = recognition_stats()
+    yield ("recognition_pool_active", "gauge", "Recognitions running in the recognition pool",
+           [({}, recognition["active"])])
+    yield ("recognition_pool_queued", "gauge", "Recognitions waiting for a recognition pool worker",
+           [({}, recognition["queued"])])
+    yield ("recognition_pool_completed_total", "counter", "Recognitions completed by the recognition pool",
+           [({}, recognition["completed"])])
+    yield ("recognitions_in_flight", "gauge", "Recognitions holding a recognition slot",
+           [({}, recognition["recognitions_active"])])
+    yield ("recognitions_waiting", "gauge", "Recognitions waiting for a recognition slot",
+           [({}, recognition["recognitions_waiting"])])
+
+def collect_resilience_metrics():
+    resilience = resilience_status()
+    if resilience.get("breaker"):
+        yield ("recognizer_circuit_open", "gauge", "1 while the recognizer circuit breaker is open or probing",
+               [({}, int(resilience["breaker"]["state"] != "closed"))])
+        yield ("recognizer_circuit_opened_total", "counter", "Times the recognizer circuit breaker opened",
+               [({}, resilience["breaker"]["opened"])])
+        yield ("recognizer_calls_total", "counter", "Segment recognition calls, attempts and their failures, retries and hedges",
+               [({"kind": kind}, resilience[kind])
+                for kind in ("calls", "attempts", "failures", "retries", "hedges", "hedges_won", "rejected")])
+
+def collect_admission_metrics():
+    admission = admission_status()
+    yield ("admission_active", "gauge", "Admitted transcriptions running", [({}, admission["active"])])
+    yield ("admission_inflight_bytes", "gauge", "Audio bytes held by admitted transcriptions",
+           [({}, admission["inflight_bytes"])])
+    yield ("admission_queued", "gauge", "Transcription requests waiting for admission, by priority",
+           [({"priority": priority}, count) for priority, count in admission["queued_by_priority"].items()])
+    yield ("admission_decisions_total", "counter", "Admission outcomes (admitted, queue_full, timeout, displaced) by priority",
+           [({"priority": priority, "outcome": outcome}, count)
+            for priority, outcomes in admission["outcomes"].items() for outcome, count in outcomes.items()])
+
+def collect_audio_decode_metrics():
+    ffmpeg = conversion_stats()
+    yield ("ffmpeg_conversions_active", "gauge", "ffmpeg conversions running", [({}, ffmpeg["active"])])
+    yield ("ffmpeg_conversions_waiting", "gauge", "ffmpeg conversions waiting for a slot", [({}, ffmpeg["waiting"])])
+    yield ("audio_decodes_total", "counter", "Uploads decoded, by path (ffmpeg, passthrough) and outcome",
+           [({"path": "ffmpeg", "outcome": "ok"}, ffmpeg["completed"]),
+            ({"path": "ffmpeg", "outcome": "failed"}, ffmpeg["failed"]),
+            ({"path": "passthrough", "outcome": "ok"}, ffmpeg["passthrough"])])
+
+def collect_cache_metrics():
+    cache = transcription_cache_status()
+    if cache.get("enabled"):
+        yield ("transcription_cache_lookups_total", "counter", "Transcription cache lookups by result",
+               [({"result": "memory_hit"}, cache["memory_hits"]), ({"result": "disk_hit"}, cache["disk_hits"]),
+                ({"result": "miss"}, cache["misses"])])
+        yield ("transcription_cache_evictions_total", "counter", "Transcription cache evictions by tier",
+               [({"tier": "memory"}, cache["memory_evictions"]), ({"tier": "disk"}, cache["disk_evictions"])])
+        yield ("transcription_cache_memory_entries", "gauge", "Entries in the in-memory cache tier",
+               [({}, cache["memory_entries"])])
+        yield ("transcription_cache_disk_bytes", "gauge", "Bytes used by the on-disk cache tier",
+               [({}, cache["disk_bytes"])])
+
+def collect_job_metrics():
+    jobs_status = job_queue_status()
+    yield ("jobs", "gauge", "Queued transcription jobs by state",
+           [({"status": state}, count) for state, count in jobs_status.get("jobs", {}).items()])
+    yield ("job_workers", "gauge", "Running background job workers", [({}, jobs_status["workers"])])
+
+def collect_term_index_metrics():
+    index = term_index_status()
+    yield ("term_index_terms", "gauge", "Terms in the live term index", [({}, index["term_count"])])
+    yield ("term_index_version", "gauge", "Version of the live term index", [({}, index["version"])])
+
+def collect_startup_metrics():
+    startup = startup_status()
+    yield ("app_ready", "gauge", "1 once every startup phase has finished", [({}, int(startup["ready"]))])
+    yield ("app_startup_seconds", "gauge", "Time from import to ready",
+           [({}, startup["startup_seconds"])])
+    yield ("app_startup_phase_seconds", "gauge", "Duration of each startup phase",
+           [({"phase": name}, phase["seconds"]) for name, phase in startup["phases"].items()])
+
+def collect_speech_pool_metrics():
+    speech_pool = recognizer_backend_status().get("speech_pool")
+    if speech_pool:
+        yield ("speech_pool_warm", "gauge", "Pre-connected recognizers waiting per language",
+               [({"language": language}, counts["warm"]) for language, counts in speech_pool["languages"].items()])
+        yield ("speech_pool_acquires_total", "counter", "Recognizer acquisitions by warm hit or cold start",
+               [({"result": "warm"}, speech_pool.get("warm_hits")), ({"result": "cold"}, speech_pool.get("cold_starts"))])
+
+for collector in (collect_recognition_metrics, collect_resilience_metrics, collect_admission_metrics,
+                  collect_audio_decode_metrics, collect_cache_metrics, collect_job_metrics,
+                  collect_term_index_metrics, collect_startup_metrics, collect_speech_pool_metrics):
+    register_collector(collector)
+
 # Define the path to the directory where static files (HTML, CSS, JS) are stored
 static_dir = Path(__file__).parent / "static"
 
 # Include the transcription router that defines endpoints related to audio transcription
 app.include_router(transcription.router, prefix="/api")
 
+# Include the jobs router for asynchronous (queued) transcription of long recordings
+app.include_router(jobs.router, prefix="/api")
+
+# Include the export router for bulk CSV / Parquet / XLSX export of structured results
+app.include_router(export.router, prefix="/api")
+
 # Mount the static directory to serve static files under the "/static" path
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
@@ -73,7 +246,47 @@ async def serve_index():
         }
     )
 
-# Simple health check endpoint to verify backend is running and properly configured
+# Load the term lexicon (memory-mapped artifact; the workbook is parsed only if it changed)
+async def load_term_index():
+    await asyncio.to_thread(get_term_index)
+
+# Open the transcription cache off the event loop (sizing the disk tier scans its directory)
+async def open_transcription_cache():
+    await asyncio.to_thread(get_transcription_cache)
+
+# Import the recognizer backend off the event loop, then prepare it (for Azure: pre-open connections)
+async def start_recognizer_backend():
+    backend = await asyncio.to_thread(get_recognizer_backend)
+    await backend.startup()
+
+# Slow preparation runs after the server starts listening; /api/ready reports when it is done
+@app.on_event("startup")
+async def begin_startup():
+    start_phases([
+        ("term_index", load_term_index),
+        ("transcription_cache", open_transcription_cache),
+        ("recognizer", start_recognizer_backend),
+        ("jobs", start_job_workers),    # Requeue jobs interrupted by the last shutdown and start the workers
+    ])
+
+# Stop unfinished startup work, then the job workers; unfinished jobs are picked up again on the next startup
+@app.on_event("shutdown")
+async def stop_jobs():
+    await stop_phases()
+    await stop_job_workers()
+
+# Release recognizer backend resources (for Azure: close warm connections) on shutdown
+@app.on_event("shutdown")
+async def stop_recognizer_backend():
+    if phase_started("recognizer"):
+        await get_recognizer_backend().shutdown()
+
+# Let running recognitions finish and release the recognition pool on shutdown
+@app.on_event("shutdown")
+async def stop_recognition_pool():
+    shutdown_executor()
+
+# Liveness: answers as soon as the process is up, before startup phases have finished
 @app.get("/api/health")
 async def health_check():
     return {
@@ -81,9 +294,29 @@ async def health_check():
         "version": "1.0.0",
         "azure_configured": bool(settings.AZURE_SPEECH_KEY),    # Check if Azure Speech Key is set
         "upload_dir": settings.UPLOAD_DIR,                      # Show the directory for uploaded files
-        "medical_terms_path": settings.MEDICAL_TERMS_PATH       # Show the path to the Excel term mapping
+        "medical_terms_path": settings.MEDICAL_TERMS_PATH,      # Show the path to the Excel term mapping
+        "term_index": term_index_status(),                      # Version and build time of the in-memory term index
+        "recognition": recognition_stats(),                     # Recognition pool size and queue depth
+        "admission": admission_status(),                        # In-flight transcriptions, bytes and admission queue
+        "resilience": resilience_status(),                      # Circuit breaker state, retries and hedged calls
+        "recognizer": recognizer_backend_status(),              # Active recognizer backend (and Azure connection pool)
+        "transcription_cache": transcription_cache_status(),    # Cache hit/miss counts, evictions and tier sizes
+        "jobs": await asyncio.to_thread(job_queue_status),      # Job workers and jobs per state (SQLite query)
+        "startup": startup_status()                             # Readiness and startup phase timings
     }
 
+# Readiness: 200 once the lexicon is loaded, the recognizer is warm and job workers run; 503 until then
+@app.get("/api/ready")
+async def readiness_check():
+    status = startup_status()
+    return JSONResponse(status_code=200 if is_ready() else 503, content=status)
+
+# Prometheus scrape endpoint: per-stage latency histograms plus cache, queue and concurrency gauges
+# (rendered in a worker thread: collectors such as the job counts query SQLite)
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(await asyncio.to_thread(render_prometheus), media_type="text/plain; version=0.0.4")
+
 # Endpoint to verify that Azure Speech credentials are correctly loaded and accessible
 @app.post("/api/test-azure-config")
 async def test_azure_config():
@@ -99,7 +332,8 @@ async def test_azure_config():
         "key_exists": bool(settings.AZURE_SPEECH_KEY)
     }
 
-# Configure logging to log both to file and console
+# Configure logging to log both to file and console (the log file lives in the upload directory)
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -38,6 +38,12 @@ class TranscriptionResponse(BaseModel):
     transcription: str  # Full transcription from the audio
     structured_data: List[MappedTerm]  # List of structured medical terms extracted
 
+class EntitySpan(BaseModel):
+    """Location of a matched term within the transcription"""
+    matched_text: str  # Text as it appears in the (lowercased) transcription
+    start: int  # Start character offset of the match
+    end: int    # End character offset of the match (exclusive)
+
 class MedicalEntity(BaseModel):
     """Represents a structured medical entity extracted from transcription"""
     text: str  # Raw entity text
@@ -45,3 +51,5 @@ class MedicalEntity(BaseModel):
     code: Optional[str] = None  # Internal or standard code if found
     standard_name: Optional[str] = None  # Human-readable canonical name
     confidence: float  # Confidence score in extraction or mapping
+    span: Optional[EntitySpan] = None  # First occurrence of the entity in the text
+    spans: List[EntitySpan] = []  # Every occurrence of the entity in the text
@@ -0,0 +1,112 @@
+# file: export.py
+'''
+This module defines the FastAPI routes for bulk export of structured results.
+GET /api/export streams the structured terms of stored (succeeded) jobs, and POST /api/export
+converts an uploaded results file (batch NDJSON or response JSON) - both to CSV, Parquet or
+XLSX, written chunk by chunk (see services/exporter.py) so large exports use constant memory.
+'''
+
+import os
+import re
+import asyncio
+import tempfile
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Iterator, List, Optional
+import logging
+
+from app.config import settings
+from app.services.uploads import remove_if_exists, save_upload
+from app.services.exporter import EXPORT_FORMATS, Row, open_records, rows_from_jobs, rows_from_records, stream_export
+
+# Initialize FastAPI router for export endpoints
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+)
+
+logger = logging.getLogger(__name__)
+
+def check_export_format(export_format: str):
+    """Reject unknown formats, and Parquet when pyarrow is not installed, before any work starts"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format; use one of {', '.join(EXPORT_FORMATS)}")
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export is not available on this server (pyarrow missing)")
+
+def abort_on_error(chunks: Iterator[bytes], name: str) -> Iterator[bytes]:
+    """
+    Pass export bytes through, logging a failure that happens once the response has started.
+    The error is re-raised so the server drops the connection without the final chunk: the
+    client sees an incomplete transfer instead of a file that merely looks short.
+    """
+    try:
+        yield from chunks
+    except Exception:
+        logger.error(f"Export {name} aborted mid-stream", exc_info=True)
+        raise
+
+def export_response(rows: Iterator[Row], export_format: str, name: str,
+                    background: Optional[BackgroundTask] = None) -> StreamingResponse:
+    """Stream `rows` as a downloadable file; the writer runs in the threadpool as the client reads"""
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        abort_on_error(stream_export(rows, export_format), name),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+        background=background,
+    )
+
+@router.get("")
+async def export_jobs(
+    format: str = Query("csv", description="csv, parquet or xlsx"),
+    job_id: Optional[List[str]] = Query(None, description="Only these jobs (repeatable); all succeeded jobs by default"),
+    ):
+    """Structured terms of succeeded jobs, one row per term, in completion order"""
+    check_export_format(format.lower())
+    return export_response(rows_from_jobs(job_id), format.lower(), "job_results")
+
+@router.post("")
+async def export_results_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form("csv"),
+    ):
+    """
+    Convert a results file to a spreadsheet: NDJSON output of /api/transcribe/batch, or a JSON
+    response (or list of responses) from /api/transcribe/file or /api/jobs/{id}.
+    A file whose first record does not parse is refused with 400; a malformed record further
+    in aborts the download (see abort_on_error).
+    """
+    export_format = (format or "csv").lower()
+    check_export_format(export_format)
+
+    # Spool the upload to disk first: the export is written while the response streams,
+    # after the request's own upload file has been closed
+    handle, path = tempfile.mkstemp(prefix="export-", suffix=".json", dir=settings.UPLOAD_DIR)
+    os.close(handle)
+    try:
+        await save_upload(file, path, settings.EXPORT_MAX_UPLOAD_MB * 1024 * 1024)
+        # Decode the first record now, so a file that is not JSON/NDJSON gets a 400, not a broken download
+        records = await asyncio.to_thread(open_records, path)
+    except ValueError as e:
+        remove_if_exists(path)
+        raise HTTPException(status_code=400, detail=f"Results file is not valid JSON or NDJSON: {e}")
+    except BaseException:
+        remove_if_exists(path)
+        raise
+
+    # Used for row labels and the download name, so keep it to a header-safe character set
+    source = re.sub(r"[^A-Za-z0-9_.-]", "_", os.path.splitext(os.path.basename(file.filename or ""))[0]) or "results"
+
+    def rows() -> Iterator[Row]:
+        try:
+            yield from rows_from_records(records, source)
+        finally:
+            remove_if_exists(path)  # Also when the export is aborted, which skips the background task
+
+    # The spooled file is removed once the response has been sent (or the client went away)
+    return export_response(rows(), export_format, f"{source}_export", BackgroundTask(remove_if_exists, path))
@@ -0,0 +1,108 @@
+# file: jobs.py
+'''
+This module defines the FastAPI routes for asynchronous transcription jobs.
+A job is submitted with an audio upload and answered immediately with its id; the audio
+is transcribed in the background by the job queue's workers (see services/job_queue.py).
+Clients poll the job for its status and result, or follow it as Server-Sent Events.
+'''
+
+import asyncio
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import logging
+
+from app.config import settings
+from app.services.serialization import FastJSONResponse, dumps
+from app.services.uploads import SUPPORTED_MIME_TYPES, save_upload
+from app.services.job_queue import (
+    TERMINAL_STATES, get_job_store, job_view, new_job_id, subscribe, unsubscribe, wake_workers
+)
+
+# Initialize FastAPI router for job endpoints
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+logger = logging.getLogger(__name__)
+
+SSE_KEEPALIVE_S = 15.0  # Comment line sent on idle streams so proxies keep the connection open
+
+@router.post("", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    language: Optional[str] = Form("en-US"),
+    include_entities: Optional[bool] = Form(False)
+    ):
+    """
+    Queue an audio file for transcription and return the job id at once.
+    Accepts the same formats as /api/transcribe/file, up to settings.JOBS_MAX_FILE_MB.
+    """
+    if file.content_type not in SUPPORTED_MIME_TYPES:
+        raise HTTPException(status_code=400, detail="Only MP3, WAV, and WEBM files are supported")
+
+    store = get_job_store()
+    job_id = new_job_id()
+    size = await save_upload(file, store.payload_path(job_id), settings.JOBS_MAX_FILE_MB * 1024 * 1024)
+    job = await asyncio.to_thread(store.submit, job_id, file.filename, language, include_entities, size)
+    wake_workers()
+    logger.info(f"Queued job {job_id} for {file.filename} ({size} bytes)")
+
+    return FastJSONResponse(status_code=202, content={
+        **job_view(job),
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events",
+    })
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Current status, progress and (once finished) result or error of a job"""
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(content=job_view(job))
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of a job: a "progress" event whenever its state or progress changes,
+    then a final "succeeded" (with the result) or "failed" event, after which the stream ends.
+    If the job is deleted (pruned) while the stream is open, a final "gone" event ends it instead.
+    """
+    store = get_job_store()
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        changed = subscribe(job_id)
+        last_sent = None
+        idle = 0.0
+        try:
+            while True:
+                job = await asyncio.to_thread(store.get, job_id)
+                if job is None:
+                    yield f"event: gone\ndata: {dumps({'job_id': job_id, 'detail': 'Job no longer exists'}).decode()}\n\n"
+                    return
+                view = job_view(job)
+                if view != last_sent:
+                    name = view["status"] if view["status"] in TERMINAL_STATES else "progress"
+                    yield f"event: {name}\ndata: {dumps(view).decode()}\n\n"
+                    last_sent, idle = view, 0.0
+                    if name != "progress":
+                        return
+                elif idle >= SSE_KEEPALIVE_S:
+                    yield ": keep-alive\n\n"
+                    idle = 0.0
+                if await request.is_disconnected():
+                    return
+                # Woken by in-process workers; the timeout also picks up jobs run by other processes
+                try:
+                    await asyncio.wait_for(changed.wait(), settings.JOBS_POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    idle += settings.JOBS_POLL_INTERVAL_S
+                changed.clear()
+        finally:
+            unsubscribe(job_id, changed)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
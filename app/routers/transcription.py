@@ -2,21 +2,35 @@
 '''
 This module defines the FastAPI routes for handling medical audio file transcription. 
 It supports uploading audio files (MP3, WAV, WEBM), handles format conversion, and integrates with Azure Speech-to-Text. 
-It also extracts structured medical entities either via Azure or fallback keyword extraction.
+It also extracts structured medical entities either via Azure or fallback keyword extraction,
+admits work through the priority-aware admission controller (see services/admission.py),
+offers a batch endpoint (many files or a zip archive) that streams each result back as NDJSON as soon as it is ready,
+and offers a WebSocket endpoint that streams interim and final results while the doctor is still speaking.
 '''
 
 import os
+import time
+import shutil
+import asyncio
+import zipfile
 import tempfile
-import ffmpeg
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Form
-from fastapi.responses import JSONResponse
-from typing import Optional, List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Callable, Optional, List, Tuple
 import logging
 
-from app.services.azure_speech import transcribe_audio_file
-from app.services.term_mapper import map_terms_from_azure
-from app.models.schemas import TranscriptionResponse, MappedTerm, MedicalEntity
-from app.services.entity_extractor import extract_medical_entities
+from app.config import settings
+from app.services.recognizer_backend import get_recognizer_backend
+from app.services.audio_convert import detect_audio_format
+from app.services.pipeline import recognize_upload, build_response, convert_entities_to_mapped
+from app.services.metrics import stage_timer
+from app.services.admission import get_admission_controller, parse_priority
+from app.services.serialization import FastJSONResponse, dumps_line
+from app.services.profiler import request_profiler, request_id_from, should_profile
+from app.models.schemas import TranscriptionResponse
+from app.services.entity_extractor import ExtractorSession
+from app.services.uploads import SUPPORTED_MIME_TYPES, read_upload_limited, save_upload
 
 # Initialize FastAPI router for transcription-related endpoints
 router = APIRouter(
@@ -28,44 +42,11 @@ logger = logging.getLogger(__name__)
 
 # File size and type validation constants
 MAX_FILE_SIZE_MB = 10
-SUPPORTED_MIME_TYPES = {
-    "audio/mpeg",
-    "audio/mp3", 
-    "audio/wav",
-    "audio/x-wav",
-    "audio/wave",
-    "audio/webm",  
-    "audio/webm;codecs=opus"  
-}
-
-def convert_webm_to_wav(webm_file_path: str) -> str:
-    """Convert a webm file to wav using ffmpeg"""
-    try:
-        output_path = f"{webm_file_path}.wav"
-        ffmpeg.input(webm_file_path).output(output_path).run()
-        return output_path
-    except Exception as e:
-        logger.error(f"Error converting webm to wav: {e}")
-        raise HTTPException(status_code=400, detail="Error converting webm to wav")
-
-def convert_entities_to_mapped(entities: List[MedicalEntity]) -> List[MappedTerm]:
-    """
-    Convert keyword-extracted MedicalEntity objects to MappedTerm objects.
-    Adds fallback code and standard name if not provided.
-    """
-    return [
-        MappedTerm(
-            text=e.text,
-            type=e.type,
-            code=e.code if e.code else f"UNK-{e.type[:3].upper()}",
-            standard_name=e.standard_name if e.standard_name else e.text.title(),
-            confidence=e.confidence
-        ) for e in entities
-    ]
+ZIP_MIME_TYPES = {"application/zip", "application/x-zip-compressed"}
 
 @router.post("/file", response_model=TranscriptionResponse)
 async def transcribe_file(
-    background_tasks: BackgroundTasks,
+    request: Request,
     file: UploadFile = File(...),
     language: Optional[str] = Form("en-US"),
     include_entities: Optional[bool] = Form(False)
@@ -74,67 +55,49 @@ async def transcribe_file(
     Endpoint to transcribe an uploaded audio file and optionally extract structured medical data.
     Validates file type/size, converts formats if needed, calls Azure transcription, 
     and extracts medical terms from result.
+    The request is admitted before its upload is read (main.admit_uploads), at the priority of its
+    X-Priority header (stat, urgent or routine); under load it may wait for admission or be refused
+    with 429/503 and a Retry-After header.
+    When PROFILE_HEADER_ENABLED is on, send `X-Profile: 1` (plus `X-Profile-Token` if PROFILE_TOKEN
+    is set) to capture a cProfile profile of the request under UPLOAD_DIR/profiles.
     """
     # Validate file type
     if file.content_type not in SUPPORTED_MIME_TYPES:
         raise HTTPException(status_code=400, detail="Only MP3, WAV, and WEBM files are supported")
 
+    return await run_file_transcription(request, file, language, include_entities)
+
+async def run_file_transcription(request: Request, file: UploadFile, language: str, include_entities: bool):
+    """Read, transcribe and serialize one admitted /file request"""
+    request_id = request_id_from(request.headers)
     try:
-        # Save the uploaded file to a temporary location on disk
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[-1]) as tmp:
-            content = await file.read()              # Read file content from the upload
-            tmp.write(content)                       # Write content to temporary file
-            tmp.flush()                              # Ensure all content is written
-            os.fsync(tmp.fileno())                   # Force write to disk (especially useful on some systems)
-            file_path = tmp.name                     # Store temp file path for further use
-
-        # Ensure temp file is cleaned up after the request finishes
-        background_tasks.add_task(os.unlink, file_path)
-
-        logger.info(f"Transcribing file: {file.filename}, saved to: {file_path}")
-
-        # Check if file exceeds max size
-        if os.path.getsize(file_path) > MAX_FILE_SIZE_MB * 1024 * 1024:
-            raise HTTPException(status_code=413, detail="File size exceeds 10MB limit")
-
-        # Convert WebM files to WAV if necessary
-        if file.content_type == "audio/webm" or file.content_type == "audio/webm;codecs=opus":
-            file_path = convert_webm_to_wav(file_path)
-            logger.info(f"Converted webm file to wav: {file_path}")
-
-        # Transcribe audio using Azure Speech-to-Text
-        transcription_result = await transcribe_audio_file(file_path, language)
-        transcription = transcription_result.get("transcription", "")
-        azure_entities = transcription_result.get("entities", [])
-
-        # Map Azure entities to standard format, or fallback to keyword-based extraction
-        if azure_entities:
-            structured_data = map_terms_from_azure(azure_entities)
-        else:
-            # Fallback: extract medical entities using in-house NLP extractor
-            fallback_entities = extract_medical_entities(transcription)
-            structured_data = convert_entities_to_mapped(fallback_entities)
-            logger.info(f"Fallback extracted entities: {[e.text for e in fallback_entities]}")
-
-        # Compose response with transcription and structured entities
-        response = TranscriptionResponse(
-            transcription=transcription,
-            structured_data=structured_data  # Already a list of MappedTerm
-        )
+        # Opt-in (header) or sampled profiling of the whole pipeline for this request
+        with request_profiler(request_id, should_profile(request.headers)) as profile_path:
+            # Read the upload in chunks, enforcing the size limit as the bytes arrive (no temp file, no fsync)
+            with stage_timer("read_upload"):
+                content = await read_upload_limited(file, MAX_FILE_SIZE_MB * 1024 * 1024)
+            logger.info(f"Transcribing file: {file.filename} ({len(content)} bytes)")
 
-        if include_entities:
-            extended_response = response.model_dump()
-            extended_response["azure_entities"] = azure_entities
-            extended_response["source"] = "azure" if azure_entities else "keyword_extractor"
-            return JSONResponse(content=extended_response)
+            # Cache lookup, decoding, recognition and term mapping (shared with the batch endpoint)
+            transcription_result = await recognize_upload(content, language, file.filename)
+            body = build_response(transcription_result, include_entities)
+            with stage_timer("serialization"):
+                response = FastJSONResponse(content=body)
 
-        # ✅ Ensure frontend receives proper JSON
-        return JSONResponse(content=response.model_dump())
+        # The request id prefixes the profile file (<request id>-<suffix>.prof) when one was captured
+        response.headers["X-Request-ID"] = request_id
+        # Silence trimmed by pre-processing (see services/audio_preprocess.py)
+        audio = transcription_result.get("audio")
+        if audio is not None:
+            response.headers["X-Audio-Removed-Seconds"] = f"{audio['removed_seconds']:.3f}"
+        if profile_path is not None:
+            response.headers["X-Profiled"] = "1"
+            response.headers["X-Profile-File"] = os.path.basename(profile_path)
+        return response
 
-    # Handle missing temp file error
-    except FileNotFoundError as e:
-        logger.error(f"Temporary file error: {e}")
-        raise HTTPException(status_code=404, detail="Temporary file not found")
+    # Propagate deliberate HTTP errors (e.g. 413 for oversized uploads) unchanged
+    except HTTPException:
+        raise
 
     # Handle general errors in transcription pipeline
     except Exception as e:
@@ -143,3 +106,244 @@ async def transcribe_file(
             status_code=500,
             detail="Transcription failed due to an internal error"
         )
+
+
+# Batch item: display name plus a loader returning its audio bytes (raising HTTPException if unusable).
+# Loaders read from disk, so they are called in a worker thread.
+BatchItem = Tuple[str, Callable[[], bytes]]
+
+class BatchSpool:
+    """
+    Temporary directory under UPLOAD_DIR holding the uploaded parts of one batch request, plus the
+    zip archives opened from it, until the batch's results have streamed. close() removes them all.
+    """
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="batch-", dir=settings.UPLOAD_DIR)
+        self.archives: List[zipfile.ZipFile] = []
+
+    def part_path(self, position: int) -> str:
+        return os.path.join(self.directory, f"part-{position}")
+
+    def open_archive(self, path: str) -> zipfile.ZipFile:
+        archive = zipfile.ZipFile(path)
+        self.archives.append(archive)
+        return archive
+
+    def close(self):
+        for archive in self.archives:
+            archive.close()
+        self.archives.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def read_head(path: str, size: int = 4) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(size)
+
+def spooled_file_loader(path: str) -> Callable[[], bytes]:
+    def load() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    return load
+
+def zip_member_loader(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int) -> Callable[[], bytes]:
+    """Read one archive member on demand, refusing oversized or non-audio members"""
+    def load() -> bytes:
+        if info.file_size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File size exceeds {max_bytes // (1024 * 1024)}MB limit")
+        with archive.open(info) as member:
+            content = member.read(max_bytes + 1)  # Never trust the declared size alone
+        if len(content) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File size exceeds {max_bytes // (1024 * 1024)}MB limit")
+        if detect_audio_format(content) == "unknown":
+            raise HTTPException(status_code=400, detail="Unsupported audio format")
+        return content
+    return load
+
+def rejected_item(status_code: int, detail: str) -> Callable[[], bytes]:
+    def load() -> bytes:
+        raise HTTPException(status_code=status_code, detail=detail)
+    return load
+
+async def collect_batch_items(files: List[UploadFile], spool: BatchSpool) -> List[BatchItem]:
+    """
+    Spool the uploaded parts to disk (the form is closed before the streamed response starts) and
+    expand zip archives into their audio members. Nothing is held in memory: each item's audio is
+    read from its spooled file, or decompressed from its archive, only when its turn comes.
+    Per-file problems become error items so one bad file does not fail the whole batch.
+    """
+    max_file_bytes = MAX_FILE_SIZE_MB * 1024 * 1024
+    items: List[BatchItem] = []
+    for position, file in enumerate(files):
+        path = spool.part_path(position)
+        size = await save_upload(file, path, settings.BATCH_MAX_UPLOAD_MB * 1024 * 1024)
+        if file.content_type in ZIP_MIME_TYPES or await asyncio.to_thread(read_head, path) == b"PK\x03\x04":
+            try:
+                # Reads the archive's central directory from disk
+                archive = await asyncio.to_thread(spool.open_archive, path)
+            except zipfile.BadZipFile:
+                items.append((file.filename, rejected_item(400, "Invalid zip archive")))
+                continue
+            for info in archive.infolist():
+                name = info.filename.rsplit("/", 1)[-1]
+                if info.is_dir() or info.filename.startswith("__MACOSX/") or name.startswith("."):
+                    continue
+                items.append((f"{file.filename}/{info.filename}", zip_member_loader(archive, info, max_file_bytes)))
+        elif file.content_type not in SUPPORTED_MIME_TYPES:
+            items.append((file.filename, rejected_item(400, "Only MP3, WAV, and WEBM files are supported")))
+        elif size > max_file_bytes:
+            items.append((file.filename, rejected_item(413, f"File size exceeds {MAX_FILE_SIZE_MB}MB limit")))
+        else:
+            items.append((file.filename, spooled_file_loader(path)))
+    return items
+
+async def stream_batch_results(items: List[BatchItem], language: str, include_entities: bool,
+                               priority: str = "routine", spool: Optional[BatchSpool] = None):
+    """
+    Transcribe batch items with at most settings.BATCH_MAX_CONCURRENCY in flight and yield one
+    NDJSON line per item in completion order, followed by a summary line.
+    Each item is admitted separately at the batch's priority; refused items become error lines
+    carrying retry_after_s. The batch's spooled uploads are removed when the stream ends.
+    """
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def run(index: int, filename: str, load: Callable[[], bytes]) -> dict:
+        async with limit:
+            try:
+                content = await asyncio.to_thread(load)
+                async with get_admission_controller().admit(len(content), priority):
+                    transcription_result = await recognize_upload(content, language, filename)
+                body = build_response(transcription_result, include_entities)
+                audio = transcription_result.get("audio") or {}
+                return {"index": index, "filename": filename, "status": "ok",
+                        "audio_removed_seconds": audio.get("removed_seconds"), **body}
+            except HTTPException as e:
+                error = {"index": index, "filename": filename, "status": "error",
+                         "status_code": e.status_code, "detail": e.detail}
+                if e.headers and "Retry-After" in e.headers:
+                    error["retry_after_s"] = int(e.headers["Retry-After"])
+                return error
+            except Exception:
+                logger.error(f"Batch transcription failed for {filename}", exc_info=True)
+                return {"index": index, "filename": filename, "status": "error",
+                        "status_code": 500, "detail": "Transcription failed due to an internal error"}
+
+    tasks = [asyncio.create_task(run(index, filename, load)) for index, (filename, load) in enumerate(items)]
+    succeeded = 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            succeeded += result["status"] == "ok"
+            yield dumps_line(result)
+        yield dumps_line({"summary": {
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }})
+    finally:
+        # Client went away (or the stream ended): stop any work still queued
+        for task in tasks:
+            task.cancel()
+        # Removed synchronously: awaiting here could itself be cancelled when the client disconnects
+        if spool is not None:
+            spool.close()
+
+@router.post("/batch")
+async def transcribe_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    language: Optional[str] = Form("en-US"),
+    include_entities: Optional[bool] = Form(False),
+    priority: Optional[str] = Form(None)
+    ):
+    """
+    Transcribe many audio files (or zip archives of them) in one request.
+    Files are fanned out across the recognition pipeline and each TranscriptionResponse is
+    streamed back as a line of NDJSON as soon as it finishes, tagged with its index and filename.
+    """
+    priority = parse_priority(priority or request.headers.get("X-Priority"))
+    spool = await asyncio.to_thread(BatchSpool)
+    try:
+        items = await collect_batch_items(files, spool)
+        if not items:
+            raise HTTPException(status_code=400, detail="No audio files in batch")
+        if len(items) > settings.BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Batch exceeds {settings.BATCH_MAX_FILES} files")
+    except BaseException:
+        await asyncio.to_thread(spool.close)
+        raise
+
+    logger.info(f"Transcribing batch of {len(items)} file(s)")
+    # The stream removes the spool when it ends; the background task covers a stream that never started
+    return StreamingResponse(
+        stream_batch_results(items, language, include_entities, priority, spool),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(asyncio.to_thread, spool.close)
+    )
+
+
+@router.websocket("/stream")
+async def transcribe_stream(websocket: WebSocket, language: str = "en-US"):
+    """
+    Streaming dictation over a WebSocket.
+    The client sends binary frames of 16 kHz, 16-bit mono PCM as they are captured and a text
+    "stop" message when done. The server replies with JSON messages: "partial" interim hypotheses,
+    "final" phrases with the medical terms they completed (including terms spanning phrases), and a
+    closing "done" with the full transcription and all of its structured terms.
+    """
+    await websocket.accept()
+    session = get_recognizer_backend().streaming_session(language)
+    try:
+        await session.start()
+    except Exception:
+        logger.error("Failed to start streaming recognition", exc_info=True)
+        await websocket.send_json({"type": "error", "detail": "Failed to start recognition"})
+        await websocket.close(code=1011)
+        return
+
+    # Feed incoming audio frames into the recognizer until the client stops or disconnects
+    async def receive_audio():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    session.write(message["bytes"])
+                elif (message.get("text") or "").strip().lower() == "stop":
+                    break
+        finally:
+            session.close_input()
+
+    receiver = asyncio.create_task(receive_audio())
+    phrases = []
+    # Incremental extraction over the whole dictation: terms spanning two phrases are found and
+    # each phrase only costs a scan of its own text
+    extractor = ExtractorSession()
+    try:
+        # Relay recognition events as they happen, attaching the terms each final phrase completed
+        async for event in session.iter_events(settings.LIVE_RECOGNITION_TIMEOUT_BASE_S):
+            if event["type"] == "final":
+                phrases.append(event["text"])
+                # The trailing separator ends the phrase's last word now, so its terms are not held back
+                entities = extractor.append(event["text"] + " ")
+                event["structured_data"] = [term.model_dump() for term in convert_entities_to_mapped(entities)]
+                event["entities"] = [entity.model_dump() for entity in entities]  # Spans offset in the full transcription
+            await websocket.send_json(event)
+
+        extractor.close()
+        await websocket.send_json({
+            "type": "done",
+            "transcription": " ".join(phrases),
+            "structured_data": [term.model_dump() for term in convert_entities_to_mapped(extractor.entities())],
+        })
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Streaming client disconnected")
+    except Exception:
+        logger.error("Streaming transcription failed", exc_info=True)
+    finally:
+        receiver.cancel()
+        await session.stop()
@@ -0,0 +1,204 @@
+# file: admission.py
+
+'''
+Admission control for the transcription endpoints.
+Every transcription holds a slot (bounded by settings.ADMISSION_MAX_CONCURRENT) and its
+audio size in bytes (bounded by settings.ADMISSION_MAX_INFLIGHT_MB) while it runs, so peaks
+cannot exhaust memory or the recognizer's concurrency. Requests that do not fit wait in a
+bounded queue ordered by priority class (stat before urgent before routine, first come
+first served within a class). When the queue is full the request is refused at once with
+429, and a request still waiting after settings.ADMISSION_MAX_WAIT_S gets 503; both carry
+a Retry-After estimated from recent service times. A full queue gives way to higher
+priorities: the newest waiter of the lowest class is turned away (503) to make room.
+Upload endpoints (/api/transcribe/file and /batch, /api/jobs, /api/export) are admitted by a
+middleware before their body is read, charged their Content-Length: a single file for its whole
+transcription, the others while their upload is received and spooled. Batch items are then
+admitted one by one at their size as they run.
+'''
+
+import math
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.metrics import ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first (lower rank is served first)
+PRIORITIES = {"stat": 0, "urgent": 1, "routine": 2}
+
+RETRY_AFTER_MAX_S = 60       # Upper bound of the Retry-After hint
+HOLD_TIME_SMOOTHING = 0.2    # Weight of the newest observation in the average service time
+
+
+def parse_priority(value: Optional[str]) -> str:
+    """Normalize a priority given in a form field or X-Priority header (400 if unknown)"""
+    if value is None or not value.strip():
+        return settings.ADMISSION_DEFAULT_PRIORITY
+    priority = value.strip().lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority '{value}'; use one of {', '.join(PRIORITIES)}")
+    return priority
+
+
+class _Waiter:
+    __slots__ = ("priority", "nbytes", "future")
+
+    def __init__(self, priority: str, nbytes: int, future: asyncio.Future):
+        self.priority = priority
+        self.nbytes = nbytes
+        self.future = future
+
+
+class AdmissionController:
+    """Concurrency and in-flight byte limits with a bounded, priority-ordered wait queue"""
+
+    def __init__(self, max_concurrent: int, max_bytes: int, queue_size: int, max_wait_s: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_bytes = max(1, max_bytes)
+        self.queue_size = max(0, queue_size)
+        self.max_wait_s = max_wait_s
+        self._active = 0
+        self._bytes = 0
+        self._queue: List[Tuple[int, int, _Waiter]] = []  # Heap of (rank, arrival, waiter)
+        self._arrivals = itertools.count()
+        self._hold_seconds = 1.0  # Smoothed time a request holds its slot
+        self._outcomes: Dict[Tuple[str, str], int] = {}
+
+    def _fits(self, nbytes: int) -> bool:
+        return self._active < self.max_concurrent and self._bytes + nbytes <= self.max_bytes
+
+    def _take(self, nbytes: int):
+        self._active += 1
+        self._bytes += nbytes
+
+    def _count(self, priority: str, outcome: str):
+        self._outcomes[(priority, outcome)] = self._outcomes.get((priority, outcome), 0) + 1
+
+    def retry_after(self) -> int:
+        """Seconds until a retry is likely to be admitted: the queue ahead drained at the current pace"""
+        estimate = self._hold_seconds * (len(self._queue) + 1) / self.max_concurrent
+        return min(max(math.ceil(estimate), 1), RETRY_AFTER_MAX_S)
+
+    def _rejection(self, status_code: int, priority: str, outcome: str, detail: str) -> HTTPException:
+        self._count(priority, outcome)
+        return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    def _grant_waiters(self):
+        """Admit queued requests in priority order while they fit (the head of the queue is never skipped)"""
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.future.done():  # Timed out or cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if not self._fits(waiter.nbytes):
+                return
+            heapq.heappop(self._queue)
+            self._take(waiter.nbytes)
+            waiter.future.set_result(None)
+
+    def _remove(self, waiter: _Waiter):
+        self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+        heapq.heapify(self._queue)
+
+    async def _wait(self, nbytes: int, priority: str):
+        rank = PRIORITIES[priority]
+        if len(self._queue) >= self.queue_size:
+            # Full: make room by turning away the newest waiter of a lower class, if there is one
+            victim = max(self._queue, key=lambda entry: (entry[0], entry[1]), default=None)
+            if victim is None or victim[0] <= rank:
+                raise self._rejection(429, priority, "queue_full", "Server busy: admission queue is full")
+            self._remove(victim[2])
+            victim[2].future.set_exception(self._rejection(
+                503, victim[2].priority, "displaced", "Server busy: request displaced by higher-priority work"))
+
+        waiter = _Waiter(priority, nbytes, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (rank, next(self._arrivals), waiter))
+        try:
+            await asyncio.wait_for(waiter.future, self.max_wait_s)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            raise self._rejection(503, priority, "timeout",
+                                  f"Server busy: not admitted within {self.max_wait_s:.0f}s")
+        except asyncio.CancelledError:
+            # Client went away: give back a slot granted in the meantime, or leave the queue
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self._release(nbytes, 0.0)
+            else:
+                self._remove(waiter)
+            raise
+
+    def _release(self, nbytes: int, held_seconds: float):
+        self._active -= 1
+        self._bytes -= nbytes
+        if held_seconds > 0:
+            self._hold_seconds += HOLD_TIME_SMOOTHING * (held_seconds - self._hold_seconds)
+        self._grant_waiters()
+
+    @asynccontextmanager
+    async def admit(self, nbytes: int, priority: str):
+        """
+        Hold a slot and `nbytes` of the in-flight budget for the enclosed block, waiting in
+        the queue if needed. Raises HTTPException 429/503 (with Retry-After) when refused.
+        """
+        # A request larger than the whole budget may still run, but only on its own
+        nbytes = min(max(nbytes, 0), self.max_bytes)
+        queued_at = time.perf_counter()
+        ahead = self._queue and self._queue[0][0] <= PRIORITIES[priority]
+        if not ahead and self._fits(nbytes):
+            self._take(nbytes)
+        else:
+            await self._wait(nbytes, priority)
+        started = time.perf_counter()
+        ADMISSION_WAIT_SECONDS.observe(started - queued_at, priority)
+        self._count(priority, "admitted")
+        try:
+            yield
+        finally:
+            self._release(nbytes, time.perf_counter() - started)
+
+    def status(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "inflight_bytes": self._bytes,
+            "max_inflight_bytes": self.max_bytes,
+            "queued": len(self._queue),
+            "queue_size": self.queue_size,
+            "queued_by_priority": {
+                priority: sum(1 for entry in self._queue if entry[2].priority == priority) for priority in PRIORITIES
+            },
+            "avg_hold_seconds": round(self._hold_seconds, 3),
+            "outcomes": {
+                priority: {outcome: count for (p, outcome), count in self._outcomes.items() if p == priority}
+                for priority in PRIORITIES
+            },
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller built from settings (used from the event loop only)"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+            max_bytes=int(settings.ADMISSION_MAX_INFLIGHT_MB * 1024 * 1024),
+            queue_size=settings.ADMISSION_QUEUE_SIZE,
+            max_wait_s=settings.ADMISSION_MAX_WAIT_S,
+        )
+    return _controller
+
+
+def admission_status() -> dict:
+    return get_admission_controller().status()
@@ -0,0 +1,137 @@
+# file: audio_convert.py
+
+'''
+Decodes uploaded audio into the 16-bit mono PCM the recognizer consumes.
+The real container format is detected from magic bytes (the declared MIME type is
+not trusted). 16-bit PCM WAV is decoded in memory with no conversion (any sample rate or
+channel count: downmixing and resampling are done in NumPy by audio_preprocess.py);
+everything else is piped through an ffmpeg subprocess (stdin -> stdout, no files on
+disk) without blocking the event loop, under a concurrency cap.
+'''
+
+import io
+import asyncio
+import logging
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.audio_segmenter import TARGET_SAMPLE_RATE, read_wav_pcm
+
+logger = logging.getLogger(__name__)
+
+_ffmpeg_slots: Optional[asyncio.Semaphore] = None
+_conversions = {"waiting": 0, "active": 0, "completed": 0, "failed": 0, "passthrough": 0}
+
+
+def detect_audio_format(data: bytes) -> str:
+    """Identify the container/codec of an audio payload from its leading bytes"""
+    head = data[:16]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"  # Matroska/WebM EBML header
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+        return "mp3"  # ID3 tag or MPEG audio frame sync
+    return "unknown"
+
+
+def wav_pcm_format(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Return (sample_rate, channels) if the WAV payload is 16-bit integer PCM (which NumPy
+    decodes directly), otherwise None. Only the RIFF chunk headers are inspected.
+    """
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, chunk_size = data[pos:pos + 4], struct.unpack_from("<I", data, pos + 4)[0]
+        if chunk_id == b"fmt " and chunk_size >= 16:
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", data, pos + 8)
+            if audio_format == 1 and bits == 16 and sample_rate > 0:
+                return sample_rate, channels
+            return None
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _get_ffmpeg_slots() -> asyncio.Semaphore:
+    global _ffmpeg_slots
+    if _ffmpeg_slots is None:
+        _ffmpeg_slots = asyncio.Semaphore(settings.FFMPEG_MAX_CONCURRENCY)
+    return _ffmpeg_slots
+
+
+async def convert_to_pcm(audio_bytes: bytes) -> np.ndarray:
+    """
+    Decode any ffmpeg-readable payload to 16 kHz mono 16-bit PCM through a non-blocking subprocess.
+    Input ffmpeg cannot decode is a client error (400); an ffmpeg that cannot be started or fails
+    unexpectedly is a server error (500), logged as such.
+    """
+    _conversions["waiting"] += 1
+    async with _get_ffmpeg_slots():
+        _conversions["waiting"] -= 1
+        _conversions["active"] += 1
+        try:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    "ffmpeg", "-hide_banner", "-loglevel", "error",
+                    "-i", "pipe:0",
+                    "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE),
+                    "pipe:1",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            except OSError as e:
+                # Missing or unlaunchable binary: a misconfigured host, not bad input
+                _conversions["failed"] += 1
+                logger.error(f"Could not start ffmpeg (is it installed and on PATH?): {e}")
+                raise HTTPException(status_code=500, detail="Audio conversion is unavailable on this server")
+            try:
+                pcm, errors = await process.communicate(audio_bytes)
+            except Exception as e:
+                _conversions["failed"] += 1
+                logger.error(f"Error converting audio to PCM: {e}", exc_info=True)
+                raise HTTPException(status_code=500, detail="Audio conversion failed due to an internal error")
+        finally:
+            _conversions["active"] -= 1
+
+    if process.returncode != 0:
+        _conversions["failed"] += 1
+        logger.error(f"ffmpeg failed ({process.returncode}): {errors.decode(errors='replace').strip()}")
+        raise HTTPException(status_code=400, detail="Error converting audio to wav")
+    _conversions["completed"] += 1
+    return np.frombuffer(pcm, dtype="<i2")
+
+
+async def decode_audio(audio_bytes: bytes) -> Tuple[np.ndarray, int, str]:
+    """
+    Return (mono int16 samples, sample rate, detected format) for an upload.
+    16-bit PCM WAV skips ffmpeg entirely (multi-channel audio is downmixed; the native
+    rate is returned and resampled later if needed); other formats are converted.
+    """
+    audio_format = detect_audio_format(audio_bytes)
+    if audio_format == "wav" and wav_pcm_format(audio_bytes) is not None:
+        try:
+            samples, sample_rate = read_wav_pcm(io.BytesIO(audio_bytes))
+            _conversions["passthrough"] += 1
+            return samples, sample_rate, audio_format
+        except Exception as e:
+            logger.info(f"WAV payload could not be read directly ({e}); converting with ffmpeg")
+
+    samples = await convert_to_pcm(audio_bytes)
+    logger.info(f"Converted {audio_format} audio to PCM ({len(samples) / TARGET_SAMPLE_RATE:.1f}s)")
+    return samples, TARGET_SAMPLE_RATE, audio_format
+
+
+def conversion_stats() -> dict:
+    """ffmpeg conversions waiting for a slot / running, plus totals, for health and metrics"""
+    return {"max_concurrency": settings.FFMPEG_MAX_CONCURRENCY, **_conversions}
@@ -0,0 +1,175 @@
+# file: audio_preprocess.py
+
+'''
+Pre-processing of decoded audio before recognition, in vectorized NumPy:
+resampling to the 16 kHz the recognizer expects (windowed-sinc low-pass, then
+interpolation) and an energy-based voice activity detector that trims leading and
+trailing silence and shortens long pauses. Less audio is sent and billed, and
+recognition finishes sooner. Speech is never cut: only the inner part of silent
+stretches is removed, leaving padding around every voiced region, and pauses stay
+long enough for the silence-based segmenter to cut at. When the detector finds no
+voiced frame at all (e.g. very quiet speech), the audio is sent untrimmed rather
+than dropped.
+The kept regions are recorded so offsets reported on the trimmed audio can be mapped
+back to the original recording's timeline.
+'''
+
+import logging
+from functools import lru_cache
+
+import numpy as np
+
+from app.config import settings
+from app.services.audio_segmenter import TARGET_SAMPLE_RATE, frame_energies
+
+logger = logging.getLogger(__name__)
+
+# Sample rates the recognizer accepts without resampling
+NATIVE_SAMPLE_RATES = {8000, 16000}
+
+RESAMPLE_TAPS = 63           # Length of the anti-aliasing filter applied before downsampling
+VAD_FRAME_MS = 20            # Analysis frame of the voice activity detector
+VAD_MIN_ENERGY = 100.0       # Frames quieter than this RMS (about -50 dBFS) are always silence
+VAD_LOUD_RATIO = 0.1         # ... and frames 20 dB below the loud (95th percentile) level too
+
+
+@lru_cache(maxsize=16)
+def _lowpass_taps(cutoff: float, taps: int) -> np.ndarray:
+    """Hamming-windowed sinc low-pass filter; `cutoff` in cycles per input sample"""
+    n = np.arange(taps) - (taps - 1) / 2.0
+    h = 2.0 * cutoff * np.sinc(2.0 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Resample int16 mono audio to `target_rate`, low-pass filtering first when downsampling"""
+    if sample_rate == target_rate or len(samples) == 0:
+        return samples
+    signal = samples.astype(np.float32)
+    if target_rate < sample_rate:
+        # Keep content below 90% of the new Nyquist frequency so nothing folds back
+        signal = np.convolve(signal, _lowpass_taps(0.45 * target_rate / sample_rate, RESAMPLE_TAPS), mode="same")
+    n_out = int(round(len(signal) * target_rate / sample_rate))
+    positions = np.arange(n_out, dtype=np.float64) * (sample_rate / target_rate)
+    resampled = np.interp(positions, np.arange(len(signal), dtype=np.float64), signal)
+    return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+
+
+class PreprocessedAudio:
+    """
+    Recognizer-ready samples plus the map from their timeline to the original one.
+    `kept` holds one row per kept region: (start in the processed audio, start in the
+    original audio, length), all in samples at `sample_rate`.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int, original_seconds: float, kept: np.ndarray):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.original_seconds = original_seconds
+        self.kept = kept
+
+    @property
+    def processed_seconds(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def removed_seconds(self) -> float:
+        return max(0.0, self.original_seconds - self.processed_seconds)
+
+    def to_original_ms(self, offset_ms: int) -> int:
+        """Map an offset in the processed audio to the same instant in the original recording"""
+        if len(self.kept) == 0:
+            return offset_ms
+        position = offset_ms * self.sample_rate / 1000.0
+        region = max(0, int(np.searchsorted(self.kept[:, 0], position, side="right")) - 1)
+        out_start, in_start, _ = self.kept[region]
+        return int(round((in_start + position - out_start) * 1000.0 / self.sample_rate))
+
+    def summary(self) -> dict:
+        return {
+            "original_seconds": round(self.original_seconds, 3),
+            "processed_seconds": round(self.processed_seconds, 3),
+            "removed_seconds": round(self.removed_seconds, 3),
+        }
+
+
+def voice_regions(samples: np.ndarray, sample_rate: int, edge_pad_s: float, max_pause_s: float) -> np.ndarray:
+    """
+    (start, end) sample ranges to keep. Silence before the first and after the last voiced
+    frame is cut down to `edge_pad_s`; inner silences longer than `max_pause_s` are cut
+    down to `max_pause_s` (half kept on each side). An all-silent recording keeps nothing
+    (preprocess_audio then falls back to the untrimmed audio).
+    """
+    total = len(samples)
+    frame_len = max(1, sample_rate * VAD_FRAME_MS // 1000)
+    energies = frame_energies(samples, frame_len)
+    if len(energies) < 2:
+        return np.array([[0, total]], dtype=np.int64)
+
+    # Adaptive threshold: above the noise floor, but never so high that quiet speech counts as silence
+    noise_floor, loud = np.percentile(energies, [10, 95])
+    threshold = max(min(noise_floor * 3.0, loud * VAD_LOUD_RATIO), VAD_MIN_ENERGY)
+    voiced = energies >= threshold
+    if not voiced.any():
+        return np.zeros((0, 2), dtype=np.int64)
+
+    # Silent runs as [start, end) frame ranges
+    padded = np.concatenate(([False], ~voiced, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+
+    pad = int(round(edge_pad_s * 1000 / VAD_FRAME_MS))
+    half_pause = int(round(max_pause_s * 1000 / VAD_FRAME_MS / 2))
+    n_frames = len(energies)
+    leading = run_starts == 0
+    trailing = run_ends == n_frames
+
+    # Frames removed from each silent run (empty when the run is short enough to keep whole)
+    cut_starts = np.where(leading, 0, np.where(trailing, run_starts + pad, run_starts + half_pause))
+    cut_ends = np.where(trailing, n_frames, np.where(leading, run_ends - pad, run_ends - half_pause))
+    cuts = cut_ends > cut_starts
+    cut_starts, cut_ends = cut_starts[cuts] * frame_len, cut_ends[cuts] * frame_len
+    # A trailing cut also drops the partial frame left over at the end of the recording
+    if len(cut_ends) and cut_ends[-1] == n_frames * frame_len:
+        cut_ends[-1] = total
+
+    # Kept regions are the gaps between cuts
+    starts = np.concatenate(([0], cut_ends))
+    ends = np.concatenate((cut_starts, [total]))
+    keep = ends > starts
+    return np.stack((starts[keep], ends[keep]), axis=1).astype(np.int64)
+
+
+def preprocess_audio(samples: np.ndarray, sample_rate: int) -> PreprocessedAudio:
+    """
+    Bring decoded mono audio to a recognizer sample rate (16 kHz unless already 8/16 kHz)
+    and, if settings.PREPROCESS_TRIM_SILENCE, trim silence with the voice activity detector.
+    """
+    original_seconds = len(samples) / sample_rate if sample_rate else 0.0
+    if sample_rate not in NATIVE_SAMPLE_RATES:
+        samples = resample(samples, sample_rate, TARGET_SAMPLE_RATE)
+        sample_rate = TARGET_SAMPLE_RATE
+
+    if not settings.PREPROCESS_TRIM_SILENCE or len(samples) == 0:
+        kept = np.array([[0, 0, len(samples)]], dtype=np.int64)
+        return PreprocessedAudio(samples, sample_rate, original_seconds, kept)
+
+    regions = voice_regions(samples, sample_rate, settings.PREPROCESS_EDGE_PAD_S, settings.PREPROCESS_MAX_PAUSE_S)
+    if len(regions) == 0:
+        # Nothing reached the VAD threshold; a false negative would silently lose the transcript
+        logger.warning(f"Voice activity detector found no speech in {original_seconds:.2f}s of audio; "
+                       f"sending it untrimmed")
+        regions = np.array([[0, len(samples)]], dtype=np.int64)
+    lengths = regions[:, 1] - regions[:, 0]
+    out_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    kept = np.stack((out_starts, regions[:, 0], lengths), axis=1).astype(np.int64)
+    if len(regions) == 1 and lengths[0] == len(samples):
+        trimmed = samples
+    else:
+        trimmed = np.concatenate([samples[start:end] for start, end in regions])
+
+    processed = PreprocessedAudio(trimmed, sample_rate, original_seconds, kept)
+    if processed.removed_seconds >= 0.01:
+        logger.info(f"Pre-processing removed {processed.removed_seconds:.2f}s of "
+                    f"{original_seconds:.2f}s of audio ({len(regions)} voiced region(s))")
+    return processed
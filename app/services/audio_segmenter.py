@@ -0,0 +1,95 @@
+# file: audio_segmenter.py
+
+'''
+Splits long PCM recordings into segments at silence boundaries so they can be
+recognized concurrently. Frame energies are computed with NumPy; cuts are placed
+in the middle of sufficiently long pauses, and segments that would exceed the
+maximum length are force-split at their quietest frame.
+'''
+
+import wave
+from typing import BinaryIO, List, Tuple, Union
+
+import numpy as np
+
+# Sample format expected by the recognizer push streams: 16 kHz, 16-bit, mono PCM
+TARGET_SAMPLE_RATE = 16000
+
+
+def read_wav_pcm(source: Union[str, BinaryIO]) -> Tuple[np.ndarray, int]:
+    """
+    Read a 16-bit PCM WAV file (a path or an in-memory file object) into mono int16 samples.
+    Multi-channel audio is downmixed by averaging the channels.
+    """
+    with wave.open(source, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV audio is supported")
+        channels = wav.getnchannels()
+        sample_rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+def frame_energies(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS energy of consecutive, non-overlapping frames (the last partial frame is dropped)"""
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0)
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def split_on_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    max_segment_s: float = 20.0,
+    min_silence_s: float = 0.4,
+    frame_ms: int = 20,
+) -> List[Tuple[int, int]]:
+    """
+    Return (start_sample, end_sample) ranges covering the whole recording in order.
+    Segments end inside pauses of at least `min_silence_s` and are packed up to
+    `max_segment_s`; a stretch with no usable pause is cut at its quietest frame.
+    """
+    total = len(samples)
+    max_len = int(max_segment_s * sample_rate)
+    if total <= max_len:
+        return [(0, total)] if total else []
+
+    frame_len = max(1, sample_rate * frame_ms // 1000)
+    energies = frame_energies(samples, frame_len)
+    if len(energies) == 0:
+        return [(0, total)]
+
+    # Adaptive silence threshold: a multiple of the noise floor, never below a small absolute level
+    noise_floor = np.percentile(energies, 10)
+    threshold = max(noise_floor * 3.0, 100.0)
+    silent = energies < threshold
+
+    # Candidate cut points: the middle of every silent run long enough to be a pause
+    min_run = max(1, int(min_silence_s * 1000 / frame_ms))
+    padded = np.concatenate(([False], silent, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+    long_runs = (run_ends - run_starts) >= min_run
+    cuts = ((run_starts[long_runs] + run_ends[long_runs]) // 2) * frame_len
+
+    # Greedily pack: extend each segment to the furthest pause that keeps it under max_len
+    segments = []
+    start = 0
+    while total - start > max_len:
+        limit = start + max_len
+        usable = cuts[(cuts > start) & (cuts <= limit)]
+        if len(usable):
+            end = int(usable[-1])
+        else:
+            # No pause in range: cut at the quietest frame of the window's second half
+            lo = (start + max_len // 2) // frame_len
+            hi = min(limit // frame_len, len(energies))
+            end = int(lo + np.argmin(energies[lo:hi])) * frame_len if hi > lo else limit
+        segments.append((start, end))
+        start = end
+    segments.append((start, total))
+    return segments
@@ -1,128 +1,230 @@
 #  file: azure_speech.py
 '''
-This file contains functions to transcribe audio using Azure Cognitive Services Speech-to-Text API.
-It provides both file-based transcription and live audio byte stream transcription capabilities.
+This file contains the Azure Cognitive Services Speech-to-Text recognizer backend.
+It provides segment recognition for file-based transcription (see pipeline.transcribe_pcm),
+live audio byte stream transcription, and a streaming session that recognizes audio while
+it is still arriving and reports interim results. transcribe_audio_file and
+transcribe_live_audio_bytes remain as thin public wrappers over the pipeline and
+recognize_continuous for callers outside the HTTP routes.
 '''
 
 import asyncio
 import azure.cognitiveservices.speech as speechsdk
 from app.config import settings
+from app.services.recognition_executor import recognition_slot, run_recognition
+from app.services.recognizer_backend import RecognitionError, RecognizerBackend, StreamingSession
+from app.services.speech_pool import acquire_recognizer, start_speech_pool, stop_speech_pool, speech_pool_status
+from app.services.audio_segmenter import TARGET_SAMPLE_RATE, read_wav_pcm
+from app.services.pipeline import transcribe_audio
 from fastapi import HTTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Default push stream format: 16 kHz, 16-bit, mono PCM => 32,000 bytes per second of audio
+PCM_BYTES_PER_SECOND = TARGET_SAMPLE_RATE * 2
+
+async def recognize_continuous(recognizer, timeout: float) -> dict:
+    """
+    Run continuous recognition until the recognizer reports the session is over.
+    Completion is driven by the `session_stopped` / `canceled` events through an asyncio
+    future instead of a fixed sleep; `timeout` only bounds how long we are willing to wait.
+    Returns the recognized results in order and whether the session finished on its own.
+    Callers hold a recognition_slot() around this (and the recognizer's creation), which is
+    what bounds the number of recognitions in flight.
+    """
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    results = []
+
+    def finish(error=None):
+        if not done.done():
+            if error is not None:
+                done.set_exception(error)
+            else:
+                done.set_result(None)
+
+    # Event handlers run on SDK threads, so completion is handed back to the loop thread-safely
+    def recognized_handler(evt):
+        if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
+            results.append(evt.result)
+
+    def canceled_handler(evt):
+        details = evt.cancellation_details
+        if details.reason == speechsdk.CancellationReason.Error:
+            logger.error(f"Azure Error: {details.error_details}")
+            loop.call_soon_threadsafe(finish, RecognitionError(f"Recognition canceled: {details.error_details}"))
+        else:
+            loop.call_soon_threadsafe(finish)  # End of stream: the audio has been fully recognized
+
+    recognizer.recognized.connect(recognized_handler)
+    recognizer.canceled.connect(canceled_handler)
+    recognizer.session_stopped.connect(lambda evt: loop.call_soon_threadsafe(finish))
+
+    await run_recognition(lambda: recognizer.start_continuous_recognition_async().get())
+    completed = True
+    try:
+        await asyncio.wait_for(done, timeout)
+    except asyncio.TimeoutError:
+        completed = False
+        logger.warning(f"Recognition did not finish within {timeout:.1f}s; returning partial results")
+    finally:
+        await run_recognition(lambda: recognizer.stop_continuous_recognition_async().get())
+
+    return {"results": results, "completed": completed}
+
+
+# Create a recognizer fed from a push stream with the given PCM sample rate (16-bit mono).
+# Configs are shared per language and 16 kHz recognizers come pre-connected from the speech pool.
+def create_push_recognizer(language: str, sample_rate: int = TARGET_SAMPLE_RATE):
+    return acquire_recognizer(language, sample_rate)
+
+
+async def recognize_pcm_segment(pcm: bytes, sample_rate: int, language: str) -> list:
+    """
+    Recognize one segment of 16-bit mono PCM with continuous recognition, so every
+    utterance in the segment is returned (not just the first one as with recognize_once).
+    Returns [{"text", "offset", "duration"}] with offsets in 100 ns ticks relative to the segment.
+    """
+    audio_seconds = len(pcm) / (sample_rate * 2)
+    timeout = settings.LIVE_RECOGNITION_TIMEOUT_BASE_S + audio_seconds * settings.LIVE_RECOGNITION_TIMEOUT_FACTOR
+    # Take a slot before a (warm) recognizer, so waiting recognitions do not hold pooled connections
+    async with recognition_slot():
+        recognizer, stream = create_push_recognizer(language, sample_rate)
+        stream.write(pcm)
+        stream.close()
+        outcome = await recognize_continuous(recognizer, timeout)
+    if not outcome["completed"]:
+        raise RecognitionError(f"Segment recognition timed out after {timeout:.1f}s")
+    return [
+        {"text": r.text, "offset": r.offset, "duration": r.duration}
+        for r in outcome["results"] if r.text
+    ]
+
+
 async def transcribe_audio_file(file_path: str, language: str = "en-US") -> dict:
     """
-    Transcribes an audio file from disk using Azure Speech-to-Text service.
-    Supports common audio formats and returns the recognized transcription text along with any extracted entities.
+    Transcribes a 16-bit PCM WAV file from disk using the configured recognizer backend.
+    See pipeline.transcribe_audio for how the audio is pre-processed and long recordings handled.
     """
-    # Only support certain audio file extensions
-    if not file_path.lower().endswith((".wav", ".mp3", ".mp4")):
+    # Only support PCM WAV here; other formats are converted by the caller first
+    if not file_path.lower().endswith(".wav"):
         raise HTTPException(status_code=400, detail="Unsupported audio format")
 
-    # Setup Azure Speech configuration with subscription key and region
-    speech_config = speechsdk.SpeechConfig(
-        subscription=settings.AZURE_SPEECH_KEY,
-        region=settings.AZURE_SPEECH_REGION
-    )
-    speech_config.speech_recognition_language = language
-
-    # Configure audio input from the given file path
     try:
-        audio_config = speechsdk.audio.AudioConfig(filename=file_path)
+        samples, sample_rate = read_wav_pcm(file_path)
     except Exception as e:
         logger.error(f"Invalid audio file: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid audio file: {e}")
+    return await transcribe_audio(samples, sample_rate, language)
 
-    # Initialize the speech recognizer with config and audio source
-    try:
-        recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config,
-            audio_config=audio_config
-        )
-    except Exception as e:
-        logger.error(f"Failed to initialize recognizer: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to initialize recognizer: {str(e)}")
 
-    # Perform synchronous recognition
+async def transcribe_live_audio_bytes(audio_bytes: bytes, language: str = "en-US") -> dict:
+    """
+    Transcribes live audio streamed as raw bytes (16 kHz, 16-bit mono PCM) using Azure Speech-to-Text service.
+    Finishes as soon as the recognizer has consumed the whole stream, bounded by a timeout
+    that scales with the audio duration, and returns the combined transcription text.
+    """
     try:
-        result = recognizer.recognize_once()  # Blocking call
-
-        # Handle recognized speech
-        if result.reason == speechsdk.ResultReason.RecognizedSpeech:
-            transcription_text = result.text.strip()
-            return {
-                "transcription": transcription_text,
-                "entities": []  # No extra entity extraction implemented here
-            }
-
-        # Handle no speech matched
-        elif result.reason == speechsdk.ResultReason.NoMatch:
-            return {"transcription": "", "entities": []}
-
-        # Handle cancellation with error details
-        elif result.reason == speechsdk.ResultReason.Canceled:
-            cancellation = result.cancellation_details
-            if cancellation.error_details:
-                logger.error(f"Azure Error: {cancellation.error_details}")
-            raise HTTPException(status_code=500, detail="Azure Speech Recognition was canceled.")
+        # Allow a fixed allowance plus a multiple of the clip's duration
+        audio_seconds = len(audio_bytes) / PCM_BYTES_PER_SECOND
+        timeout = settings.LIVE_RECOGNITION_TIMEOUT_BASE_S + audio_seconds * settings.LIVE_RECOGNITION_TIMEOUT_FACTOR
+
+        async with recognition_slot():
+            # Setup a push stream holding the whole clip; closing it signals end of input
+            recognizer, stream = create_push_recognizer(language)
+            stream.write(audio_bytes)
+            stream.close()
+            outcome = await recognize_continuous(recognizer, timeout)
+
+        # Combine all recognized text pieces
+        full_text = " ".join(r.text for r in outcome["results"]).strip()
+        return {
+            "transcription": full_text,
+            "entities": [],  # No entity extraction performed here
+            "complete": outcome["completed"]
+        }
 
-        else:
-            raise HTTPException(status_code=500, detail="Unexpected error in Azure transcription.")
     except Exception as e:
-        logger.error(f"Error during transcription: {e}")
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+        logger.error(f"Live transcription failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Live transcription failed: {e}")
 
 
-async def transcribe_live_audio_bytes(audio_bytes: bytes, language: str = "en-US") -> dict:
+class StreamingRecognitionSession(StreamingSession):
     """
-    Transcribes live audio streamed as raw bytes using Azure Speech-to-Text service.
-    Processes the audio stream in real-time and returns the combined transcription text.
+    Continuous recognition over audio that arrives incrementally (e.g. WebSocket frames).
+    Audio frames (16 kHz, 16-bit mono PCM) are written into a PushAudioInputStream as they
+    arrive; interim hypotheses, final phrases and the end of the session are delivered as
+    dicts on an asyncio queue, in the order the recognizer produced them.
     """
-    try:
-        # Configure Azure Speech with credentials and language
-        speech_config = speechsdk.SpeechConfig(
-            subscription=settings.AZURE_SPEECH_KEY,
-            region=settings.AZURE_SPEECH_REGION
-        )
-        speech_config.speech_recognition_language = language
 
-        # Setup a push stream to feed audio data continuously
-        stream = speechsdk.audio.PushAudioInputStream()
-        audio_config = speechsdk.audio.AudioConfig(stream=stream)
-        recognizer = speechsdk.SpeechRecognizer(speech_config, audio_config)
+    def __init__(self, language: str = "en-US"):
+        super().__init__(language)
+        self._stream = None
+        self._recognizer = None
+
+    async def start(self):
+        self._recognizer, self._stream = create_push_recognizer(self.language)
 
-        recognized_text_chunks = []
+        def recognizing_handler(evt):
+            self._emit({"type": "partial", "text": evt.result.text})
 
-        # Define event handler to collect recognized chunks
         def recognized_handler(evt):
-            if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
-                recognized_text_chunks.append(evt.result.text)
+            if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech and evt.result.text:
+                self._emit({
+                    "type": "final",
+                    "text": evt.result.text,
+                    "offset_ms": evt.result.offset // 10_000,      # SDK offsets are in 100 ns ticks
+                    "duration_ms": evt.result.duration // 10_000,
+                })
 
-        # Attach the handler to recognized event
-        recognizer.recognized.connect(recognized_handler)
+        def canceled_handler(evt):
+            details = evt.cancellation_details
+            if details.reason == speechsdk.CancellationReason.Error:
+                logger.error(f"Azure Error: {details.error_details}")
+                self._emit({"type": "error", "detail": f"Recognition canceled: {details.error_details}"})
+            self._emit({"type": "end"})  # session_stopped and end-of-stream cancel both mean the session is over
 
-        # Start continuous speech recognition
-        recognizer.start_continuous_recognition()
+        self._recognizer.recognizing.connect(recognizing_handler)
+        self._recognizer.recognized.connect(recognized_handler)
+        self._recognizer.canceled.connect(canceled_handler)
+        self._recognizer.session_stopped.connect(lambda evt: self._emit({"type": "end"}))
 
-        # Feed audio bytes to the stream, then close to signal end of input
-        stream.write(audio_bytes)
-        stream.close()
+        await run_recognition(lambda: self._recognizer.start_continuous_recognition_async().get())
 
-        # Wait some time for recognition to process the input audio
-        await asyncio.sleep(5)
+    def write(self, audio_chunk: bytes):
+        """Feed the next chunk of PCM audio to the recognizer"""
+        self._stream.write(audio_chunk)
 
-        # Stop the continuous recognition session
-        recognizer.stop_continuous_recognition()
+    def close_input(self):
+        """Signal that no more audio will arrive; the recognizer drains what it has and ends"""
+        super().close_input()
+        self._stream.close()
 
-        # Combine all recognized text pieces
-        full_text = " ".join(recognized_text_chunks).strip()
-        return {
-            "transcription": full_text,
-            "entities": []  # No entity extraction performed here
-        }
+    async def stop(self):
+        if self._recognizer is not None:
+            await run_recognition(lambda: self._recognizer.stop_continuous_recognition_async().get())
 
-    except Exception as e:
-        logger.error(f"Live transcription failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Live transcription failed: {e}")
+
+class AzureRecognizerBackend(RecognizerBackend):
+    """Azure Speech-to-Text: pooled push-stream recognizers with continuous recognition"""
+    name = "azure"
+
+    async def recognize_pcm(self, pcm: bytes, sample_rate: int, language: str) -> list:
+        return await recognize_pcm_segment(pcm, sample_rate, language)
+
+    def cache_identity(self) -> str:
+        # A custom endpoint (e.g. a speech container) may run a different model than the region
+        return f"{self.name}/{self.version}/{settings.AZURE_SPEECH_ENDPOINT or settings.AZURE_SPEECH_REGION}"
+
+    def streaming_session(self, language: str) -> StreamingSession:
+        return StreamingRecognitionSession(language)
+
+    async def startup(self):
+        await start_speech_pool()
+
+    async def shutdown(self):
+        await stop_speech_pool()
+
+    def status(self) -> dict:
+        return {"name": self.name, "speech_pool": speech_pool_status()}
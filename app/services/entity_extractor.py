@@ -1,80 +1,171 @@
 # file: entity_extractor.py
 
 '''
-Provides functionality to load medical terminology from an Excel file and
-extract relevant medical entities from input text by exact keyword matching.
-Returns structured entity data including codes, standard names, confidence,
-and position of the matched term within the text.
+Extracts relevant medical entities from input text by exact keyword matching
+against the shared compiled lexicon (see lexicon.py and term_index.py).
+All terms live in a single Aho-Corasick matcher, so the text is scanned
+once regardless of lexicon size. Returns structured entity data including codes,
+standard names, confidence, and every position of the matched term within the text.
+ExtractorSession does the same for a transcript that grows over time (live dictation),
+scanning only the appended text on each update.
 '''
 
-import pandas as pd
-import re
-from typing import List
-from app.models.schemas import MedicalEntity
-
-# Load the Excel file into a pandas DataFrame and organize terms into categories
-def load_medical_terms(file_path: str) -> dict:
-    try:
-        df = pd.read_excel(file_path)
-    except Exception as e:
-        raise ValueError(f"Error loading the Excel file: {e}")
-
-    # Dictionary to hold terms by category, each maps term text to metadata
-    medical_terms = {
-        "procedure": {},
-        "diagnosis": {},
-        "lab_test": {}
-    }
-
-    # Populate dictionary from Excel rows: each term has code, standard name, confidence
-    for _, row in df.iterrows():
-        term_type = row['Type']     # e.g., procedure, diagnosis, lab_test
-        term = row['Term'].lower()  # Normalize to lowercase for matching
-        code = row['Code']
-        standard_name = row['Standard Name']
-        confidence = 0.95  # Fixed confidence for all loaded terms
-
-        if term_type in medical_terms:
-            medical_terms[term_type][term] = {
-                'code': code,
-                'standard_name': standard_name,
-                'confidence': confidence
-            }
-
-    return medical_terms
-
-# Global variable holding medical terms loaded from Excel once at module import
-MEDICAL_TERMS = load_medical_terms('mock_data/medical_terms.xlsx')
-
-# Extract medical entities from text by matching loaded terms via regex word boundaries
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+from app.models.schemas import EntitySpan, MedicalEntity
+from app.services.lexicon import Lexicon
+from app.services.term_index import get_term_index
+from app.services.term_matcher import is_word_char
+
+# Term categories reported by the keyword extractor, in output order
+EXTRACTOR_CATEGORIES = ("procedure", "diagnosis", "lab_test")
+
+# Fixed confidence for all keyword-matched terms
+KEYWORD_CONFIDENCE = 0.95
+
+# Extract medical entities from text in one pass over it, matching whole words only
 def extract_medical_entities(text: str) -> List[MedicalEntity]:
-    if not text:
+    lexicon = get_term_index().lexicon
+    if not text or lexicon is None:
         return []
 
     text_lower = text.lower()
-    found_entities = []
 
-    # Check each term category and match terms against the text
-    for term_type, terms in MEDICAL_TERMS.items():
-        for term, data in terms.items():
-            # Regex pattern to match whole words exactly (case-insensitive)
-            pattern = r'\b' + re.escape(term) + r'\b'
-            match = re.search(pattern, text_lower, re.IGNORECASE)
-            if match:
-                # Create a MedicalEntity with matched info including matched span offsets
-                found_entities.append(
-                    MedicalEntity(
-                        text=term,
-                        type=term_type,
-                        code=data['code'],
-                        standard_name=data['standard_name'],
-                        confidence=data['confidence'],
-                        span={
-                            "matched_text": match.group(0),
-                            "start": match.start(),
-                            "end": match.end()
-                        }
-                    )
-                )
+    # Collect every word-bounded occurrence of every term, grouped by lexicon entry
+    spans_by_entry: Dict[int, List[EntitySpan]] = {}
+    for entry_id, start, end in lexicon.matcher.find_all(text_lower):
+        if lexicon.category(entry_id) not in EXTRACTOR_CATEGORIES:
+            continue
+        spans_by_entry.setdefault(entry_id, []).append(
+            EntitySpan.model_construct(matched_text=text_lower[start:end], start=start, end=end)
+        )
+
+    return _build_entities(lexicon, spans_by_entry)
+
+
+# Turn matched spans into entities grouped by category, then in lexicon order
+def _build_entities(lexicon: Lexicon, spans_by_entry: Dict[int, List[EntitySpan]]) -> List[MedicalEntity]:
+    ordered_entries = sorted(
+        spans_by_entry,
+        key=lambda entry_id: (EXTRACTOR_CATEGORIES.index(lexicon.category(entry_id)), entry_id)
+    )
+
+    found_entities = []
+    for entry_id in ordered_entries:
+        data = lexicon.entry(entry_id)
+        spans = spans_by_entry[entry_id]
+        # Create a MedicalEntity with matched info including every matched span
+        # (built from the compiled lexicon, which is trusted, so without re-validation)
+        found_entities.append(
+            MedicalEntity.model_construct(
+                text=lexicon.term(entry_id),
+                type=lexicon.category(entry_id),
+                code=data['code'],
+                standard_name=data['standard_name'],
+                confidence=KEYWORD_CONFIDENCE,
+                span=spans[0],
+                spans=spans
+            )
+        )
 
     return found_entities
+
+
+class ExtractorSession:
+    """
+    Incremental keyword extraction over a growing transcript.
+    append() takes the next piece of text (separators included, e.g. "shortness of " then
+    "breath ") and returns only the entity occurrences it completed, with spans offset from
+    the start of the whole transcript. The Aho-Corasick state is carried across calls, so a
+    term split over two pieces is found, and each call costs time proportional to the new
+    text only. An occurrence ending exactly at the end of the text so far is held back
+    until the next character (or close()) shows whether the word ends there.
+    After close(), entities() equals extract_medical_entities() on the whole transcript.
+    """
+
+    def __init__(self, lexicon: Optional[Lexicon] = None):
+        # Pin one lexicon snapshot so a hot reload mid-dictation cannot change entry ids under us
+        self.lexicon = lexicon if lexicon is not None else get_term_index().lexicon
+        self._state = 0
+        self._length = 0
+        self._chunks: List[str] = []
+        self._chunk_starts: List[int] = []
+        self._pending: List[Tuple[int, int, int, bool]] = []  # (entry_id, start, end, word char before)
+        self._spans_by_entry: Dict[int, List[EntitySpan]] = {}
+        self._closed = False
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def text(self) -> str:
+        """The lowercased transcript so far (the text the span offsets refer to)"""
+        return "".join(self._chunks)
+
+    def _char_at(self, pos: int) -> str:
+        chunk = bisect_right(self._chunk_starts, pos) - 1
+        return self._chunks[chunk][pos - self._chunk_starts[chunk]]
+
+    def append(self, text: str) -> List[MedicalEntity]:
+        """Extend the transcript by `text`; return the entity occurrences completed by it"""
+        if self._closed:
+            raise RuntimeError("ExtractorSession is closed")
+        if not text:
+            return []
+        lowered = text.lower()
+        base = self._length
+        self._chunks.append(lowered)
+        self._chunk_starts.append(base)
+        self._length += len(lowered)
+        if self.lexicon is None:
+            return []
+        matcher = self.lexicon.matcher
+
+        # Occurrences held back at the previous end of text are decided by the first new character
+        completed = [(entry_id, start, end) for entry_id, start, end, before in self._pending
+                     if matcher.is_word_bounded(entry_id, before, is_word_char(lowered[0]))]
+        self._pending = []
+
+        matches, self._state = matcher.scan(lowered, self._state)
+        for entry_id, local_end in matches:
+            if self.lexicon.category(entry_id) not in EXTRACTOR_CATEGORIES:
+                continue
+            end = base + local_end
+            start = end - matcher.term_length(entry_id)
+            before = start > 0 and is_word_char(self._char_at(start - 1))
+            if end == self._length:
+                self._pending.append((entry_id, start, end, before))
+            elif matcher.is_word_bounded(entry_id, before, is_word_char(lowered[local_end])):
+                completed.append((entry_id, start, end))
+        return self._record(completed)
+
+    def close(self) -> List[MedicalEntity]:
+        """Mark the end of the transcript; return the occurrences that were waiting on it"""
+        if self._closed:
+            return []
+        self._closed = True
+        completed = [(entry_id, start, end) for entry_id, start, end, before in self._pending
+                     if self.lexicon.matcher.is_word_bounded(entry_id, before, False)]
+        self._pending = []
+        return self._record(completed)
+
+    def _record(self, completed: List[Tuple[int, int, int]]) -> List[MedicalEntity]:
+        if not completed:
+            return []
+        new_spans: Dict[int, List[EntitySpan]] = {}
+        for entry_id, start, end in completed:
+            matched_text = self._slice(start, end)
+            span = EntitySpan.model_construct(matched_text=matched_text, start=start, end=end)
+            new_spans.setdefault(entry_id, []).append(span)
+            self._spans_by_entry.setdefault(entry_id, []).append(span)
+        return _build_entities(self.lexicon, new_spans)
+
+    def _slice(self, start: int, end: int) -> str:
+        # Terms are short, so reassembling one from the chunks it spans is cheap
+        return "".join(self._char_at(pos) for pos in range(start, end))
+
+    def entities(self) -> List[MedicalEntity]:
+        """Every entity found so far, with all of its spans"""
+        if self.lexicon is None:
+            return []
+        return _build_entities(self.lexicon, self._spans_by_entry)
@@ -0,0 +1,365 @@
+# file: exporter.py
+
+'''
+Bulk export of structured transcription results to CSV, Parquet or Excel (XLSX).
+Every MappedTerm of every result becomes one row (source, term index, text, type,
+code, standard name, confidence). Results come from stored jobs (the job queue's
+database, read page by page) or from files of batch/transcription responses (NDJSON
+from /api/transcribe/batch, or JSON bodies of /api/transcribe/file and /api/jobs/{id}).
+
+Rows are streamed in chunks of CHUNK_ROWS and never collected into one DataFrame:
+CSV is written chunk by chunk, Parquet gets one row group per chunk (built column by
+column), and XLSX is written with openpyxl's write-only mode. Memory use therefore
+stays flat for hundreds of thousands of rows. Input files are read incrementally too:
+NDJSON line by line, and a JSON array of records one element at a time. pyarrow is
+only needed for Parquet (an optional dependency).
+
+    python -m app.services.exporter --jobs --output results.parquet
+    python -m app.services.exporter batch_results.ndjson --output results.xlsx
+'''
+
+import io
+import os
+import csv
+import codecs
+import sys
+import json
+import logging
+import argparse
+import tempfile
+from itertools import islice
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Columns of an exported row, in order
+EXPORT_COLUMNS = ("source", "term_index", "text", "type", "code", "standard_name", "confidence")
+
+# Export format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+CHUNK_ROWS = 10_000      # Rows per CSV write, Parquet row group and progress log line
+FILE_CHUNK_BYTES = 256 * 1024
+
+Row = Tuple[str, int, str, str, Optional[str], Optional[str], float]
+
+
+# ---------------------------------------------------------------------------
+# Inputs: results -> rows
+# ---------------------------------------------------------------------------
+
+def rows_from_result(source: str, result: dict) -> Iterator[Row]:
+    """One row per structured term of a TranscriptionResponse body"""
+    for index, term in enumerate(result.get("structured_data") or []):
+        yield (source, index, term.get("text"), term.get("type"), term.get("code"),
+               term.get("standard_name"), float(term.get("confidence") or 0.0))
+
+
+def rows_from_records(records: Iterable[dict], default_source: str = "") -> Iterator[Row]:
+    """
+    Rows from response records of any shape the API produces: batch NDJSON lines (failed
+    items and the summary line are skipped), job views with a "result", or plain
+    transcription responses. Records without a name are labelled `default_source#n`.
+    """
+    for position, record in enumerate(records):
+        if not isinstance(record, dict) or "summary" in record or record.get("status") == "error":
+            continue
+        if isinstance(record.get("result"), dict):  # Job view from /api/jobs/{id}
+            source = record.get("filename") or record.get("job_id") or f"{default_source}#{position}"
+            yield from rows_from_result(source, record["result"])
+        else:
+            source = record.get("filename") or f"{default_source}#{record.get('index', position)}"
+            yield from rows_from_result(source, record)
+
+
+def _iter_json_document(stream: IO[bytes], head: bytes) -> Iterator:
+    """
+    Records of a JSON document that starts with `head`: a top-level array is decoded one
+    element at a time from a sliding buffer, so only the current record is held in memory;
+    any other document (a single record) is decoded whole.
+    """
+    text = codecs.getincrementaldecoder("utf-8")()
+    decoder = json.JSONDecoder()
+    buffer, eof = text.decode(head), False
+
+    def fill() -> bool:
+        nonlocal buffer, eof
+        if eof:
+            return False
+        data = stream.read(FILE_CHUNK_BYTES)
+        eof = not data
+        buffer += text.decode(data, final=eof)
+        return not eof or bool(buffer)
+
+    def skip_whitespace(position: int) -> int:
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or not fill():
+                return position
+
+    position = skip_whitespace(0)
+    if buffer[position:position + 1] != "[":
+        while fill():
+            pass
+        yield json.loads(buffer)
+        return
+
+    position = skip_whitespace(position + 1)
+    if buffer[position:position + 1] == "]":
+        return
+    while True:
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            record, end = None, None
+        # Incomplete (or a number that may continue): read more and decode the element again
+        if end is None or (end == len(buffer) and not eof):
+            if not fill():
+                raise ValueError("Truncated or malformed JSON array in results file")
+            continue
+        yield record
+        buffer = buffer[end:]  # Drop decoded records from the buffer
+        position = skip_whitespace(0)
+        separator = buffer[position:position + 1]
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' after a record of the results file, got {separator!r}")
+        position = skip_whitespace(position + 1)
+
+
+def read_records(stream: IO[bytes]) -> Iterator[dict]:
+    """
+    Parse a results file: NDJSON (one record per line, read line by line), or a single
+    JSON document holding one record or a list of records (a list is decoded record by
+    record, so a large list is not loaded whole).
+    """
+    first = stream.readline()
+    while first and not first.strip():
+        first = stream.readline()
+    if not first:
+        return
+    try:
+        record = json.loads(first)
+    except json.JSONDecodeError:
+        # Not one record per line: a (pretty-printed) JSON document
+        yield from _iter_json_document(stream, first)
+        return
+    yield from (record if isinstance(record, list) else [record])
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def open_records(path: str) -> Iterator[dict]:
+    """
+    Records of the results file at `path`, with the first one decoded right away so a file
+    that is not JSON/NDJSON raises ValueError here, before any output has been produced.
+    Later records are decoded as the returned iterator is consumed.
+    """
+    stream = open(path, "rb")
+    records = read_records(stream)
+    try:
+        first = next(records, None)
+    except BaseException:
+        stream.close()
+        raise
+
+    def resumed() -> Iterator[dict]:
+        with stream:
+            if first is not None:
+                yield first
+                yield from records
+    return resumed()
+
+
+def rows_from_files(paths: Iterable[str]) -> Iterator[Row]:
+    for path in paths:
+        if path == "-":
+            yield from rows_from_records(read_records(sys.stdin.buffer), "stdin")
+            continue
+        with open(path, "rb") as stream:
+            yield from rows_from_records(read_records(stream), os.path.basename(path))
+
+
+def rows_from_jobs(job_ids: Optional[List[str]] = None) -> Iterator[Row]:
+    """Rows from the results of succeeded jobs in the job queue database"""
+    from app.services.job_queue import get_job_store
+    for job in get_job_store().iter_results(job_ids):
+        yield from rows_from_result(job["filename"] or job["id"], job["result"])
+
+
+def chunked(rows: Iterable[Row], size: int = CHUNK_ROWS) -> Iterator[List[Row]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---------------------------------------------------------------------------
+# Outputs: rows -> bytes
+# ---------------------------------------------------------------------------
+
+def stream_csv(rows: Iterable[Row]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunked(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the caller between row groups"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("source", pa.string()),
+        ("term_index", pa.int32()),
+        ("text", pa.string()),
+        ("type", pa.string()),
+        ("code", pa.string()),
+        ("standard_name", pa.string()),
+        ("confidence", pa.float64()),
+    ])
+
+
+def stream_parquet(rows: Iterable[Row]) -> Iterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for chunk in chunked(rows):
+            # Columnar layout: one array per column, one row group per chunk
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_xlsx(rows: Iterable[Row]) -> Iterator[bytes]:
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk; the finished file is then streamed back
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("structured_data")
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(FILE_CHUNK_BYTES)
+                if not data:
+                    break
+                yield data
+    finally:
+        os.remove(path)
+
+
+WRITERS = {"csv": stream_csv, "parquet": stream_parquet, "xlsx": stream_xlsx}
+
+
+def stream_export(rows: Iterable[Row], export_format: str) -> Iterator[bytes]:
+    """The export file for `rows` in `export_format` ("csv", "parquet" or "xlsx"), as a stream of bytes"""
+    if export_format not in WRITERS:
+        raise ValueError(f"Unknown export format '{export_format}' (expected one of {', '.join(WRITERS)})")
+    count = 0
+
+    def counted(rows: Iterable[Row]) -> Iterator[Row]:
+        nonlocal count
+        for count, row in enumerate(rows, 1):
+            if count % (CHUNK_ROWS * 10) == 0:
+                logger.info(f"Exported {count} rows so far")
+            yield row
+
+    yield from WRITERS[export_format](counted(rows))
+    logger.info(f"Exported {count} rows as {export_format}")
+
+
+def format_for_path(path: str) -> Optional[str]:
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in WRITERS else None
+
+
+# Command-line entry point
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export structured transcription results to CSV, Parquet or XLSX")
+    parser.add_argument("inputs", nargs="*", help="NDJSON/JSON result files (batch output, responses); '-' for stdin")
+    parser.add_argument("--jobs", action="store_true", help="Export results of succeeded jobs from the job database")
+    parser.add_argument("--job-id", action="append", default=None, help="Only this job (repeatable; implies --jobs)")
+    parser.add_argument("--output", required=True, help="Output file")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="Output format (default: from the output extension)")
+    args = parser.parse_args(argv)
+
+    export_format = args.format or format_for_path(args.output)
+    if export_format is None:
+        parser.error("cannot infer the format from --output; pass --format")
+    if not args.inputs and not (args.jobs or args.job_id):
+        parser.error("give result files to export, or --jobs")
+
+    def rows() -> Iterator[Row]:
+        yield from rows_from_files(args.inputs)
+        if args.jobs or args.job_id:
+            yield from rows_from_jobs(args.job_id)
+
+    written = 0
+    with open(args.output, "wb") as out:
+        for data in stream_export(rows(), export_format):
+            out.write(data)
+            written += len(data)
+    print(f"Wrote {args.output} ({export_format}, {written} bytes)")
+
+
+if __name__ == "__main__":
+    main()
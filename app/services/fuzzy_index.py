@@ -0,0 +1,128 @@
+# file: fuzzy_index.py
+
+'''
+Indexed replacement for `difflib.get_close_matches` over large term categories.
+Terms are indexed by padded character trigrams; a lookup only scores the terms
+that share the most trigrams with the query and whose length can still reach the
+cutoff, then applies exactly the same real_quick_ratio / quick_ratio / ratio checks
+and top-n ordering as difflib, so scores, cutoff and tie-breaking are unchanged.
+The result is approximate, not identical to difflib: terms sharing no trigram with the
+query are never scored, and only the `max_candidates` terms with the best trigram
+overlap (plus any tied with the last of them) are, so a term that would score well on
+ratio() but shares few trigrams with the query can be missed. Such misses are rare at
+the mapper's 0.8 cutoff. Pass max_candidates=None to score every term that shares a trigram.
+'''
+
+import heapq
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+
+# Padded character trigrams of a term ("  mri " -> "  m", " mr", "mri", "ri ")
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """
+    Character-trigram inverted index over the terms of one category.
+    Term ids are assigned in order of term length, so the lengths that can still
+    reach the cutoff form one contiguous id range and the trigram overlap of every
+    term in that range is counted with a single vectorized bincount.
+    """
+
+    def __init__(self, terms: Sequence[str], max_candidates: Optional[int] = 200):
+        self.terms: List[str] = sorted(terms, key=len)
+        self.max_candidates = max_candidates  # Candidates checked per query (best trigram overlap first; None = no cap)
+        self._lengths = np.fromiter((len(t) for t in self.terms), dtype=np.int32, count=len(self.terms))
+        postings = defaultdict(list)
+        for term_id, term in enumerate(self.terms):
+            for gram in trigrams(term):
+                postings[gram].append(term_id)
+        self._postings: Dict[str, np.ndarray] = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+
+        # Per-term character histograms let quick_ratio be evaluated for many candidates at once
+        self._alphabet = {ch: col for col, ch in enumerate(sorted({ch for t in self.terms for ch in t}))}
+        self._histograms = np.zeros((len(self.terms), len(self._alphabet)), dtype=np.uint16)
+        rows = np.repeat(np.arange(len(self.terms)), self._lengths)
+        cols = np.fromiter((self._alphabet[ch] for t in self.terms for ch in t), dtype=np.int32, count=len(rows))
+        np.add.at(self._histograms, (rows, cols), 1)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def candidates(self, word: str, cutoff: float) -> List[int]:
+        """
+        Term ids worth scoring for `word`, highest trigram overlap first.
+        Terms whose length alone keeps real_quick_ratio below the cutoff are never considered.
+        At most `max_candidates` are returned, except that terms tied with the last one are kept.
+        """
+        hits = [self._postings[gram] for gram in trigrams(word) if gram in self._postings]
+        if not hits:
+            return []
+
+        # real_quick_ratio = 2*min(la, lb) / (la + lb) bounds the achievable ratio.
+        # The band is widened by a tiny epsilon so float rounding never drops a boundary length.
+        word_len = len(word)
+        lo = int(np.searchsorted(self._lengths, word_len * cutoff / (2 - cutoff) - 1e-9, side="left"))
+        hi = len(self.terms) if cutoff <= 0 else int(
+            np.searchsorted(self._lengths, word_len * (2 - cutoff) / cutoff + 1e-9, side="right"))
+        if lo >= hi:
+            return []
+
+        counts = np.bincount(np.concatenate(hits), minlength=len(self.terms))[lo:hi]
+        shared = np.flatnonzero(counts)
+        # Rank by trigram Dice overlap, which tracks SequenceMatcher.ratio far better than raw counts
+        scores = counts[shared] / (self._lengths[lo:hi][shared] + (word_len + 2))
+        if self.max_candidates is not None and len(shared) > self.max_candidates:
+            # Keep every candidate tied with the last one admitted, so the cut never splits a tie
+            floor = np.partition(scores, -self.max_candidates)[-self.max_candidates]
+            top = scores >= floor
+            shared, scores = shared[top], scores[top]
+        ranked = shared[np.argsort(-scores, kind="stable")]
+        return (ranked + lo).tolist()
+
+    def _quick_ratio_filter(self, word: str, term_ids: List[int], cutoff: float) -> List[int]:
+        """
+        Keep the candidates whose quick_ratio (character multiset overlap) reaches the cutoff.
+        Characters outside the term alphabet can never overlap, so the vectorized value is exact.
+        """
+        if not term_ids:
+            return []
+        query = np.zeros(len(self._alphabet), dtype=np.uint16)
+        for ch in word:
+            col = self._alphabet.get(ch)
+            if col is not None:
+                query[col] += 1
+        ids = np.asarray(term_ids)
+        overlap = np.minimum(self._histograms[ids], query).sum(axis=1)
+        ratio = 2.0 * overlap / (self._lengths[ids] + len(word))
+        return ids[ratio >= cutoff - 1e-9].tolist()
+
+    def close_matches(self, word: str, n: int = 3, cutoff: float = 0.8) -> List[str]:
+        """
+        Indexed difflib.get_close_matches(word, terms, n, cutoff): same scores, cutoff and order,
+        over the candidates chosen by candidates() (approximate when that list is capped)
+        """
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        result = []
+        for term_id in self._quick_ratio_filter(word, self.candidates(word, cutoff), cutoff):
+            term = self.terms[term_id]
+            matcher.set_seq1(term)
+            if (matcher.real_quick_ratio() >= cutoff and
+                    matcher.quick_ratio() >= cutoff and
+                    matcher.ratio() >= cutoff):
+                result.append((matcher.ratio(), term))
+        # Same ordering as difflib: best score first, ties broken by the larger string
+        return [term for _, term in heapq.nlargest(n, result)]
+
+    def close_matches_batch(self, words: Iterable[str], n: int = 3, cutoff: float = 0.8) -> Dict[str, List[str]]:
+        """Resolve many query words at once, scoring each distinct word only once"""
+        return {word: self.close_matches(word, n, cutoff) for word in dict.fromkeys(words)}
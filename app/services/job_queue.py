@@ -0,0 +1,435 @@
+# file: job_queue.py
+
+'''
+Durable transcription job queue backed by a local SQLite database.
+Submitted audio is stored under the upload directory and a row records the job's
+state (queued -> running -> succeeded / failed), progress and result. A pool of
+asyncio workers claims queued jobs atomically and runs them through the shared
+transcription pipeline, so long or bulk recordings never hold a request open.
+A running job is leased by the process that claimed it (worker_id), which refreshes
+heartbeat_at while it works. Only jobs whose lease has expired (the owner crashed or
+was stopped) are queued again, so several worker processes and rolling restarts never
+run the same job twice.
+'''
+
+import os
+import json
+import socket
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Set
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.pipeline import transcribe_content
+
+logger = logging.getLogger(__name__)
+
+# Job states; succeeded and failed are terminal
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+TERMINAL_STATES = {SUCCEEDED, FAILED}
+
+ID_BATCH = 500  # Job ids per "id IN (...)" query, under SQLite's bound-parameter limit (999 before 3.32)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id               TEXT PRIMARY KEY,
+    status           TEXT NOT NULL,
+    filename         TEXT,
+    language         TEXT NOT NULL,
+    include_entities INTEGER NOT NULL DEFAULT 0,
+    payload_path     TEXT NOT NULL,
+    payload_bytes    INTEGER NOT NULL DEFAULT 0,
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    segments_done    INTEGER NOT NULL DEFAULT 0,
+    segments_total   INTEGER NOT NULL DEFAULT 0,
+    created_at       REAL NOT NULL,
+    started_at       REAL,
+    finished_at      REAL,
+    result           TEXT,
+    error            TEXT,
+    worker_id        TEXT,
+    heartbeat_at     REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at);
+"""
+
+# Columns added after the first schema version, created on databases that predate them
+MIGRATIONS = {
+    "worker_id": "ALTER TABLE jobs ADD COLUMN worker_id TEXT",
+    "heartbeat_at": "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL",
+}
+
+# Identifies this process as the lease holder of the jobs it runs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs. Every call opens its own short-lived connection,
+    so the store can be used from worker threads; claims are a single atomic UPDATE.
+    """
+
+    def __init__(self, db_path: str, payload_dir: str):
+        self.db_path = db_path
+        self.payload_dir = payload_dir
+        os.makedirs(payload_dir, exist_ok=True)
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    db.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def payload_path(self, job_id: str) -> str:
+        return os.path.join(self.payload_dir, f"{job_id}.audio")
+
+    def submit(self, job_id: str, filename: Optional[str], language: str, include_entities: bool,
+               payload_bytes: int) -> dict:
+        """Record a queued job whose audio has already been written to payload_path(job_id)"""
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, filename, language, include_entities, payload_path,"
+                " payload_bytes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, filename, language, int(include_entities), self.payload_path(job_id),
+                 payload_bytes, time.time())
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim_next(self, worker_id: str = WORKER_ID) -> Optional[dict]:
+        """
+        Atomically move the oldest queued job to running, leased to `worker_id`, and return it
+        (None if the queue is empty)
+        """
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, worker_id = ?, heartbeat_at = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1)"
+                " AND status = ? RETURNING *",
+                (RUNNING, now, worker_id, now, QUEUED, QUEUED)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def heartbeat(self, worker_id: str = WORKER_ID) -> int:
+        """Renew the lease of every job `worker_id` is running; returns how many it holds"""
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND worker_id = ?",
+                (time.time(), RUNNING, worker_id)
+            ).rowcount
+
+    def update_progress(self, job_id: str, segments_done: int, segments_total: int, worker_id: str = WORKER_ID):
+        # MAX() keeps progress monotonic even if updates land out of order
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET segments_done = MAX(segments_done, ?), segments_total = ?"
+                " WHERE id = ? AND status = ? AND worker_id = ?",
+                (segments_done, segments_total, job_id, RUNNING, worker_id)
+            )
+
+    def finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None,
+               worker_id: str = WORKER_ID) -> bool:
+        """
+        Mark a job succeeded (with its response body) or failed (with an error) and drop its audio.
+        Returns False (and changes nothing) if `worker_id` no longer holds the job's lease.
+        """
+        with self._connect() as db:
+            finished = db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?"
+                " WHERE id = ? AND status = ? AND worker_id = ?",
+                (FAILED if error is not None else SUCCEEDED, time.time(),
+                 json.dumps(result) if result is not None else None, error, job_id, RUNNING, worker_id)
+            ).rowcount
+        if finished:
+            self._remove_payload(job_id)
+        return bool(finished)
+
+    def recover(self, max_attempts: int, lease_s: float) -> int:
+        """
+        Requeue running jobs whose lease has expired: their owner has not sent a heartbeat
+        for `lease_s` seconds (it crashed or was stopped). Jobs leased by live processes are
+        left alone. Expired jobs already attempted `max_attempts` times are failed instead
+        of retried forever.
+        """
+        expired = "status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)"
+        cutoff = time.time() - lease_s
+        with self._connect() as db:
+            exhausted = [row["id"] for row in db.execute(
+                f"SELECT id FROM jobs WHERE {expired} AND attempts >= ?", (RUNNING, cutoff, max_attempts))]
+            db.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, error = ?, worker_id = NULL"
+                f" WHERE {expired} AND attempts >= ?",
+                (FAILED, time.time(), "Job interrupted too many times", RUNNING, cutoff, max_attempts)
+            )
+            requeued = db.execute(
+                f"UPDATE jobs SET status = ?, started_at = NULL, segments_done = 0, worker_id = NULL,"
+                f" heartbeat_at = NULL WHERE {expired}",
+                (QUEUED, RUNNING, cutoff)
+            ).rowcount
+        for job_id in exhausted:
+            self._remove_payload(job_id)
+        return requeued
+
+    def release(self, worker_id: str = WORKER_ID) -> int:
+        """Give the jobs `worker_id` is running back to the queue at once (graceful shutdown)"""
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, segments_done = 0, worker_id = NULL,"
+                " heartbeat_at = NULL WHERE status = ? AND worker_id = ?",
+                (QUEUED, RUNNING, worker_id)
+            ).rowcount
+
+    def prune(self, older_than_s: float) -> int:
+        """Delete finished jobs older than the retention period"""
+        with self._connect() as db:
+            return db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - older_than_s)
+            ).rowcount
+
+    def iter_results(self, job_ids: Optional[List[str]] = None, page_size: int = 500) -> Iterator[dict]:
+        """
+        Succeeded jobs (id, filename, finished_at, parsed result) in completion order, read one
+        page at a time with a fresh connection per page, so memory stays flat and the iterator
+        can be advanced from different threads. A list of `job_ids` is queried ID_BATCH ids at
+        a time (within SQLite's bound-parameter limit); results are in completion order per batch.
+        """
+        if not job_ids:
+            yield from self._iter_results_page("", (), page_size)
+            return
+        unique_ids = list(dict.fromkeys(job_ids))
+        for start in range(0, len(unique_ids), ID_BATCH):
+            batch = tuple(unique_ids[start:start + ID_BATCH])
+            yield from self._iter_results_page(f" AND id IN ({', '.join('?' * len(batch))})", batch, page_size)
+
+    def _iter_results_page(self, filter_sql: str, filter_args: tuple, page_size: int) -> Iterator[dict]:
+        # Keyset pagination on (finished_at, id)
+        last_finished, last_id = -1.0, ""
+        while True:
+            with self._connect() as db:
+                rows = db.execute(
+                    "SELECT id, filename, finished_at, result FROM jobs WHERE status = ?"
+                    " AND (finished_at, id) > (?, ?)" + filter_sql + " ORDER BY finished_at, id LIMIT ?",
+                    (SUCCEEDED, last_finished, last_id, *filter_args, page_size)
+                ).fetchall()
+            for row in rows:
+                if row["result"]:
+                    yield {"id": row["id"], "filename": row["filename"], "finished_at": row["finished_at"],
+                           "result": json.loads(row["result"])}
+            if len(rows) < page_size:
+                return
+            last_finished, last_id = rows[-1]["finished_at"], rows[-1]["id"]
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as db:
+            return {row["status"]: row["n"] for row in
+                    db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    def _remove_payload(self, job_id: str):
+        try:
+            os.remove(self.payload_path(job_id))
+        except FileNotFoundError:
+            pass
+
+
+def job_view(job: dict) -> dict:
+    """Public representation of a job row for the API"""
+    total = job["segments_total"]
+    view = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "language": job["language"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "progress": {
+            "segments_done": job["segments_done"],
+            "segments_total": total,
+            "percent": 100.0 if job["status"] == SUCCEEDED else
+                       round(100.0 * job["segments_done"] / total, 1) if total else 0.0,
+        },
+    }
+    if job["status"] == SUCCEEDED:
+        view["result"] = json.loads(job["result"]) if job["result"] else None
+    if job["status"] == FAILED:
+        view["error"] = job["error"]
+    return view
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+_workers: List[asyncio.Task] = []
+_lease_task: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+_listeners: Dict[str, Set[asyncio.Event]] = {}
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore(settings.JOBS_DB_PATH, os.path.join(settings.UPLOAD_DIR, "jobs"))
+    return _store
+
+
+# Job change notifications for in-process event streams (other processes are seen by polling)
+def subscribe(job_id: str) -> asyncio.Event:
+    event = asyncio.Event()
+    _listeners.setdefault(job_id, set()).add(event)
+    return event
+
+
+def unsubscribe(job_id: str, event: asyncio.Event):
+    listeners = _listeners.get(job_id)
+    if listeners is not None:
+        listeners.discard(event)
+        if not listeners:
+            _listeners.pop(job_id, None)
+
+
+def notify(job_id: str):
+    for event in _listeners.get(job_id, ()):
+        event.set()
+
+
+def wake_workers():
+    """Tell idle workers a job was queued (they also poll, so this is only a latency shortcut)"""
+    if _wake is not None:
+        _wake.set()
+
+
+async def _run_job(store: JobStore, job: dict):
+    job_id = job["id"]
+    loop = asyncio.get_running_loop()
+    pending_updates = set()
+
+    def on_segment(done: int, total: int):
+        # Persist progress off the event loop, then wake any event streams for this job
+        update = loop.run_in_executor(None, store.update_progress, job_id, done, total)
+        pending_updates.add(update)
+        update.add_done_callback(lambda f: (pending_updates.discard(f), notify(job_id)))
+
+    try:
+        content = await asyncio.to_thread(_read_file, job["payload_path"])
+        body = await transcribe_content(content, job["language"], bool(job["include_entities"]),
+                                        job["filename"], on_segment)
+        if pending_updates:
+            await asyncio.gather(*pending_updates, return_exceptions=True)
+        finished, outcome = await asyncio.to_thread(store.finish, job_id, body), "succeeded"
+    except HTTPException as e:
+        finished, outcome = await asyncio.to_thread(store.finish, job_id, None, str(e.detail)), f"failed: {e.detail}"
+    except Exception:
+        logger.error(f"Job {job_id} failed", exc_info=True)
+        finished = await asyncio.to_thread(store.finish, job_id, None, "Transcription failed due to an internal error")
+        outcome = "failed"
+    if finished:
+        logger.info(f"Job {job_id} {outcome}")
+    else:
+        logger.warning(f"Job {job_id} lost its lease while running (heartbeats missed); result discarded")
+    notify(job_id)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def _worker(store: JobStore):
+    while True:
+        try:
+            job = await asyncio.to_thread(store.claim_next)
+        except Exception as e:
+            logger.warning(f"Failed to claim a job: {e}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(_wake.wait(), settings.JOBS_POLL_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            _wake.clear()
+            continue
+        notify(job["id"])
+        await _run_job(store, job)
+
+
+async def _lease_keeper(store: JobStore):
+    """Renew this process's job leases and requeue jobs whose owner stopped renewing them"""
+    while True:
+        await asyncio.sleep(settings.JOBS_HEARTBEAT_INTERVAL_S)
+        try:
+            await asyncio.to_thread(store.heartbeat)
+            requeued = await asyncio.to_thread(store.recover, settings.JOBS_MAX_ATTEMPTS, settings.JOBS_LEASE_S)
+        except Exception as e:
+            logger.warning(f"Job lease maintenance failed: {e}")
+            continue
+        if requeued:
+            logger.info(f"Job queue: requeued {requeued} job(s) with an expired lease")
+            wake_workers()
+
+
+async def start_job_workers():
+    """Recover jobs with expired leases and start the worker pool (app startup)"""
+    global _wake, _lease_task
+    if settings.JOBS_WORKERS <= 0:
+        return
+    store = get_job_store()
+    requeued = await asyncio.to_thread(store.recover, settings.JOBS_MAX_ATTEMPTS, settings.JOBS_LEASE_S)
+    pruned = await asyncio.to_thread(store.prune, settings.JOBS_RETENTION_DAYS * 86400)
+    if requeued or pruned:
+        logger.info(f"Job queue: requeued {requeued} interrupted job(s), pruned {pruned} old job(s)")
+    _wake = asyncio.Event()
+    _workers.extend(asyncio.create_task(_worker(store)) for _ in range(settings.JOBS_WORKERS))
+    _lease_task = asyncio.create_task(_lease_keeper(store))
+
+
+async def stop_job_workers():
+    """
+    Stop the worker pool (app shutdown). Jobs cut off mid-run are handed back to the
+    queue right away; if the process dies instead, their leases expire after JOBS_LEASE_S.
+    """
+    global _lease_task
+    tasks = _workers + ([_lease_task] if _lease_task is not None else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _lease_task = None
+    if _workers:
+        released = await asyncio.to_thread(get_job_store().release)
+        if released:
+            logger.info(f"Job queue: returned {released} unfinished job(s) to the queue")
+    _workers.clear()
+
+
+def job_queue_status() -> dict:
+    """Worker count and jobs per state for the health endpoint"""
+    try:
+        counts = get_job_store().counts()
+    except Exception as e:
+        return {"workers": len(_workers), "error": str(e)}
+    return {"workers": len(_workers), "worker_id": WORKER_ID, "jobs": counts}
@@ -0,0 +1,337 @@
+# file: lexicon.py
+
+'''
+Compiled, memory-mappable medical lexicon shared by every worker process.
+A build step compiles the hospital Excel workbook, the VARIATION_MAP from
+medical_terms.py and the Aho-Corasick match arrays into one compact binary file.
+Workers memory-map that file instead of parsing the workbook with pandas, so the
+pages are shared through the OS page cache and startup does no per-term work.
+
+Build it ahead of deployment with:
+    python -m app.services.lexicon --source mock_data/medical_terms.xlsx --output mock_data/medical_terms.lex
+
+File layout (arrays in the build host's byte order, checked on load):
+    magic (8 bytes) | header length (uint32) | JSON header | 8-byte aligned array sections
+The JSON header records the source workbook fingerprint, the format version, a hash of
+the build inputs that do not come from the workbook (VARIATION_MAP and the code of the
+builder and the matcher), and the offset, length and typecode of every section; strings
+live in one UTF-8 blob with an offset table. An artifact whose workbook fingerprint,
+format version or build hash differs from the running code is rebuilt on load, so a
+deploy that changes any of them never serves a stale artifact.
+'''
+
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import logging
+import argparse
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.services import medical_terms, term_matcher
+from app.services.fuzzy_index import FuzzyIndex
+from app.services.medical_terms import VARIATION_MAP
+from app.services.term_matcher import ARRAY_NAMES, TermMatcher
+
+try:
+    import fcntl  # Used to serialize concurrent rebuilds across workers (POSIX only)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MEDLEX\x00\x02"
+FORMAT_VERSION = 3  # Bump when the header or section layout changes
+_LENGTH = struct.Struct("<I")
+
+
+# Read the workbook into ordered {(type, term): (code, standard_name)} entries.
+# pandas is only needed here, i.e. when (re)building the artifact, never when serving.
+def read_workbook_entries(file_path: str) -> Dict[Tuple[str, str], Tuple[str, str]]:
+    import pandas as pd
+
+    df = pd.read_excel(file_path)
+    entries: Dict[Tuple[str, str], Tuple[str, str]] = {}
+    for type_, term, code, standard_name in df[['Type', 'Term', 'Code', 'Standard Name']].itertuples(index=False):
+        # Normalize keys to lowercase; later rows override earlier duplicates as before
+        entries[(str(type_).lower(), str(term).lower())] = (str(code), str(standard_name))
+    return entries
+
+
+# Hash of everything besides the workbook that shapes the artifact: the variation map and the
+# source of the modules that lay out the entries and the match arrays
+@lru_cache(maxsize=1)
+def build_inputs_hash() -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps(sorted(VARIATION_MAP.items())).encode("utf-8"))
+    for module in (sys.modules[__name__], medical_terms, term_matcher):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _source_fingerprint(path: str) -> Optional[List[float]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_size]
+
+
+class _StringTable:
+    """Deduplicating string pool written as one UTF-8 blob plus an offset table"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.offsets = array("I", [0])
+        self.data = bytearray()
+
+    def add(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = self._ids[value] = len(self._ids)
+            self.data += value.encode("utf-8")
+            self.offsets.append(len(self.data))
+        return string_id
+
+
+def build_lexicon_artifact(source_path: str, output_path: str) -> str:
+    """
+    Compile the workbook, VARIATION_MAP and match structures into `output_path`.
+    The file is written to a temporary name and renamed into place, so readers
+    (including workers that already mapped the old file) never see a partial artifact.
+    """
+    return write_lexicon_artifact(read_workbook_entries(source_path), output_path, source_path)
+
+
+def write_lexicon_artifact(entries: Dict[Tuple[str, str], Tuple[str, str]], output_path: str,
+                           source_path: Optional[str] = None) -> str:
+    """
+    Compile already-read {(type, term): (code, standard_name)} entries into `output_path`
+    (used by the workbook build and by tools that generate lexicons, e.g. benchmarks).
+    """
+    strings = _StringTable()
+    category_ids: Dict[str, int] = {}
+    # Group entries by category, keeping the workbook's first-appearance order
+    ordered = sorted(entries.items(), key=lambda item: category_ids.setdefault(item[0][0], len(category_ids)))
+    categories = list(category_ids)
+
+    sections: Dict[str, array] = {
+        "entry_type": array("I"),
+        "entry_term": array("I"),
+        "entry_code": array("I"),
+        "entry_name": array("I"),
+        "variation_key": array("I"),
+        "variation_value": array("I"),
+    }
+    terms = []
+    for (type_, term), (code, standard_name) in ordered:
+        sections["entry_type"].append(category_ids[type_])
+        sections["entry_term"].append(strings.add(term))
+        sections["entry_code"].append(strings.add(code))
+        sections["entry_name"].append(strings.add(standard_name))
+        terms.append(term)
+
+    for variation, base in VARIATION_MAP.items():
+        sections["variation_key"].append(strings.add(variation.lower()))
+        sections["variation_value"].append(strings.add(base))
+
+    for name, values in TermMatcher(terms).to_arrays().items():
+        sections["match_" + name] = array("I", values)
+    sections["string_offsets"] = strings.offsets
+    sections["string_data"] = array("B", bytes(strings.data))
+
+    # Lay out the sections after the header, each aligned to 8 bytes
+    header = {
+        "source_path": os.path.abspath(source_path) if source_path else None,
+        "source_fingerprint": _source_fingerprint(source_path) if source_path else None,
+        "format_version": FORMAT_VERSION,
+        "build_hash": build_inputs_hash(),
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "byteorder": sys.byteorder,
+        "categories": categories,
+        "entry_count": len(terms),
+        "sections": {},
+    }
+    # Offsets depend on the header length, so iterate until the layout is stable
+    header_size = 0
+    while True:
+        offset = _align(len(MAGIC) + _LENGTH.size + header_size)
+        for name, values in sections.items():
+            header["sections"][name] = [offset, len(values), values.typecode]
+            offset = _align(offset + len(values) * values.itemsize)
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        if len(encoded) == header_size:
+            break
+        header_size = len(encoded)
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(MAGIC)
+        out.write(_LENGTH.pack(len(encoded)))
+        out.write(encoded)
+        for name, values in sections.items():
+            out.write(b"\x00" * (header["sections"][name][0] - out.tell()))
+            values.tofile(out)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Compiled lexicon with {len(terms)} terms to {output_path}")
+    return output_path
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class Lexicon:
+    """
+    Read-only view over a compiled lexicon file.
+    Arrays are memoryviews into the mapped file; strings are decoded on access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled lexicon (or was built by another version)")
+        (header_len,) = _LENGTH.unpack_from(self._mm, len(MAGIC))
+        start = len(MAGIC) + _LENGTH.size
+        self.header = json.loads(self._mm[start:start + header_len].decode("utf-8"))
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was built on a host with different byte order")
+
+        view = memoryview(self._mm)
+        self._arrays = {
+            name: view[offset:offset + count * array(typecode).itemsize].cast(typecode)
+            for name, (offset, count, typecode) in self.header["sections"].items()
+        }
+        self.categories: List[str] = self.header["categories"]
+        self.matcher = TermMatcher.from_arrays({name: self._arrays["match_" + name] for name in ARRAY_NAMES})
+        self._string_base = self.header["sections"]["string_data"][0]
+        self._variations: Optional[Dict[str, str]] = None
+        self._category_terms: Dict[str, Dict[str, int]] = {}
+        self._fuzzy_indexes: Dict[str, FuzzyIndex] = {}
+
+    def __len__(self) -> int:
+        return self.header["entry_count"]
+
+    @property
+    def source_fingerprint(self) -> Optional[List[float]]:
+        return self.header["source_fingerprint"]
+
+    def string(self, string_id: int) -> str:
+        offsets = self._arrays["string_offsets"]
+        a, b = offsets[string_id], offsets[string_id + 1]
+        return self._mm[self._string_base + a:self._string_base + b].decode("utf-8")
+
+    def category(self, entry_id: int) -> str:
+        return self.categories[self._arrays["entry_type"][entry_id]]
+
+    def term(self, entry_id: int) -> str:
+        return self.string(self._arrays["entry_term"][entry_id])
+
+    def entry(self, entry_id: int) -> Dict[str, str]:
+        """Code and standard name for an entry, in the shape the mappers expect"""
+        return {
+            "code": self.string(self._arrays["entry_code"][entry_id]),
+            "standard_name": self.string(self._arrays["entry_name"][entry_id]),
+        }
+
+    def lookup(self, category: str, term: str) -> Optional[int]:
+        """Entry id of an exact (already normalized) term within a category, if present"""
+        for entry_id in self.matcher.match_exact(term):
+            if self.category(entry_id) == category:
+                return entry_id
+        return None
+
+    def has_category(self, category: str) -> bool:
+        return category in self.categories
+
+    def terms_of(self, category: str) -> Dict[str, int]:
+        """{term: entry_id} for one category, decoded on first use and cached"""
+        terms = self._category_terms.get(category)
+        if terms is None:
+            type_id = self.categories.index(category)
+            terms = {
+                self.term(entry_id): entry_id
+                for entry_id, t in enumerate(self._arrays["entry_type"]) if t == type_id
+            }
+            self._category_terms[category] = terms
+        return terms
+
+    def fuzzy_index(self, category: str) -> FuzzyIndex:
+        """Trigram index over one category's terms, built on first use and cached with the snapshot"""
+        index = self._fuzzy_indexes.get(category)
+        if index is None:
+            index = self._fuzzy_indexes[category] = FuzzyIndex(list(self.terms_of(category)))
+        return index
+
+    @property
+    def variations(self) -> Dict[str, str]:
+        """VARIATION_MAP as compiled into the artifact (decoded on first use)"""
+        if self._variations is None:
+            keys, values = self._arrays["variation_key"], self._arrays["variation_value"]
+            self._variations = {self.string(k): self.string(v) for k, v in zip(keys, values)}
+        return self._variations
+
+
+def _artifact_is_fresh(artifact_path: str, source_path: str) -> bool:
+    """
+    True if the artifact exists, was built by this code (format version and build hash) and
+    from the current workbook (or no workbook is shipped)
+    """
+    try:
+        lexicon = Lexicon(artifact_path)
+    except (OSError, ValueError, KeyError):
+        return False
+    current = lexicon.header.get("format_version") == FORMAT_VERSION and lexicon.header.get("build_hash") == build_inputs_hash()
+    source = _source_fingerprint(source_path)
+    if source is None:
+        # No workbook to rebuild from: the shipped artifact is all there is
+        if not current:
+            logger.warning(f"{artifact_path} was built by another version of the code and {source_path} is missing")
+        return True
+    return current and source == lexicon.source_fingerprint
+
+
+def load_lexicon(source_path: str, artifact_path: str) -> Lexicon:
+    """
+    Map the compiled lexicon, rebuilding it first if it is missing, older than the workbook,
+    or built by a different version of the code.
+    Concurrent workers serialize on a lock file so only one of them pays for the rebuild.
+    """
+    if not _artifact_is_fresh(artifact_path, source_path):
+        with open(f"{artifact_path}.lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have finished the rebuild while we waited for the lock
+            if not _artifact_is_fresh(artifact_path, source_path):
+                logger.info(f"Compiling lexicon artifact from {source_path}")
+                build_lexicon_artifact(source_path, artifact_path)
+    return Lexicon(artifact_path)
+
+
+# Command-line entry point for the build step
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compile the medical term workbook into a memory-mappable lexicon")
+    parser.add_argument("--source", help="Path to the Excel workbook (defaults to settings.MEDICAL_TERMS_PATH)")
+    parser.add_argument("--output", help="Artifact path (defaults to settings.LEXICON_ARTIFACT_PATH)")
+    args = parser.parse_args(argv)
+
+    if not args.source or not args.output:
+        from app.config import settings
+        args.source = args.source or settings.MEDICAL_TERMS_PATH
+        args.output = args.output or settings.LEXICON_ARTIFACT_PATH
+
+    build_lexicon_artifact(args.source, args.output)
+    lexicon = Lexicon(args.output)
+    print(f"Wrote {args.output}: {len(lexicon)} terms, {os.path.getsize(args.output)} bytes")
+
+
+if __name__ == "__main__":
+    main()
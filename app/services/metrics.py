@@ -0,0 +1,191 @@
+# file: metrics.py
+
+'''
+Lightweight in-process metrics exposed in the Prometheus text format at /api/metrics.
+Histograms time each stage of the transcription pipeline (upload read, cache lookup,
+decoding, recognition, term mapping, serialization) and whole HTTP requests; gauges
+and counters owned by other services (cache, recognition pool, job queue, ...) are
+read from registered collector callbacks only when the endpoint is scraped.
+Recording a sample is a lock, a bisect and three additions, cheap enough to leave on.
+'''
+
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; dense around the 200 ms response-time target, reaching out to long recordings
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# A collected sample: (metric name, metric type, help text, [(labels, value)])
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label-value combination"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labelvalues, counts, total, count in snapshot:
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label-value combination"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = list(self._values.items())
+        for labelvalues, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, labelvalues)))} {_format_value(value)}")
+        return lines
+
+
+# Registry: metrics owned here plus collector callbacks registered by other services
+_metrics: List = []
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, help_text, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    metric = Counter(name, help_text, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]):
+    """Add a callback producing gauge/counter samples at scrape time"""
+    _collectors.append(collector)
+
+
+STAGE_SECONDS = histogram(
+    "transcription_stage_seconds",
+    "Time spent in each stage of the transcription pipeline",
+    ("stage",),
+)
+REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route, method and status code",
+    ("route", "method", "status"),
+)
+TRANSCRIPTIONS = counter(
+    "transcriptions_total",
+    "Transcriptions completed by the pipeline, by source of the transcription",
+    ("source",),
+)
+ADMISSION_WAIT_SECONDS = histogram(
+    "admission_wait_seconds",
+    "Time admitted transcription requests waited for a slot, by priority class",
+    ("priority",),
+)
+COLLECTOR_ERRORS = counter(
+    "collector_errors_total",
+    "Scrape-time collectors that raised (their samples are left out of that scrape), by collector",
+    ("collector",),
+)
+AUDIO_SECONDS = counter(
+    "audio_seconds_total",
+    "Seconds of decoded audio received (input) and removed by pre-processing before recognition (removed)",
+    ("kind",),
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time the enclosed block (sync or async code) into transcription_stage_seconds{stage=...}"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines: List[str] = []
+    # Collectors run first so a failure in this scrape already shows in collector_errors_total
+    for collector in _collectors:
+        collector_name = getattr(collector, "__name__", str(collector))
+        try:
+            samples = list(collector())
+        except Exception as e:
+            logger.warning(f"Metrics collector {collector_name} failed: {e}")
+            COLLECTOR_ERRORS.inc(collector_name)
+            continue
+        for name, metric_type, help_text, values in samples:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in values:
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
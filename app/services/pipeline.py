@@ -0,0 +1,204 @@
+# file: pipeline.py
+
+'''
+The transcription pipeline shared by the single-file, batch and job endpoints:
+transcription cache lookup, format detection and decoding, pre-processing
+(resampling and silence trimming, see audio_preprocess.py), speech recognition
+(long recordings are split at silences and the segments recognized in parallel by
+the configured recognizer backend, with hedging, retries and a circuit breaker, see
+resilience.py), and mapping of the result to structured
+medical terms against the current lexicon.
+'''
+
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.config import settings
+from app.models.schemas import TranscriptionResponse, MappedTerm, MedicalEntity
+from app.services.audio_convert import decode_audio
+from app.services.audio_preprocess import preprocess_audio
+from app.services.audio_segmenter import split_on_silence
+from app.services.metrics import AUDIO_SECONDS, TRANSCRIPTIONS, stage_timer
+from app.services.recognizer_backend import get_recognizer_backend
+from app.services.resilience import CircuitOpenError, circuit_open_retry_after, get_resilient_recognizer
+from app.services.transcription_cache import cache_key, get_transcription_cache
+from app.services.term_mapper import map_terms_from_azure
+from app.services.entity_extractor import extract_medical_entities
+
+logger = logging.getLogger(__name__)
+
+
+def convert_entities_to_mapped(entities: List[MedicalEntity]) -> List[MappedTerm]:
+    """
+    Convert keyword-extracted MedicalEntity objects to MappedTerm objects.
+    Adds fallback code and standard name if not provided.
+    The fields come from already validated entities, so the models are built without re-validation.
+    """
+    return [
+        MappedTerm.model_construct(
+            text=e.text,
+            type=e.type,
+            code=e.code if e.code else f"UNK-{e.type[:3].upper()}",
+            standard_name=e.standard_name if e.standard_name else e.text.title(),
+            confidence=float(e.confidence)
+        ) for e in entities
+    ]
+
+
+def recognizer_unavailable(retry_after_s: float) -> HTTPException:
+    """503 answered while the recognizer's circuit breaker is open"""
+    return HTTPException(status_code=503, detail="Speech recognition is temporarily unavailable",
+                         headers={"Retry-After": str(max(1, round(retry_after_s)))})
+
+
+async def transcribe_pcm(samples: np.ndarray, sample_rate: int, language: str = "en-US",
+                         on_segment: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Transcribes in-memory 16-bit mono PCM samples using the configured recognizer backend.
+    The recording is split at silence boundaries and the segments are recognized
+    concurrently (up to settings.RECOGNITION_SEGMENT_PARALLELISM at a time), then stitched
+    back in order with offsets relative to the start of the recording.
+    `on_segment(done, total)` is called each time a segment finishes, for progress reporting.
+    """
+    recognizer = get_resilient_recognizer()
+    segments = split_on_silence(samples, sample_rate, max_segment_s=settings.RECOGNITION_SEGMENT_MAX_S)
+    limit = asyncio.Semaphore(settings.RECOGNITION_SEGMENT_PARALLELISM)
+    finished = 0
+
+    async def recognize_segment(start: int, end: int) -> list:
+        nonlocal finished
+        async with limit:
+            utterances = await recognizer.recognize_pcm(samples[start:end].tobytes(), sample_rate, language)
+        finished += 1
+        if on_segment is not None:
+            on_segment(finished, len(segments))
+        # Shift offsets from segment-relative to recording-relative ticks (100 ns units)
+        base = start * 10_000_000 // sample_rate
+        for utterance in utterances:
+            utterance["offset"] += base
+        return utterances
+
+    try:
+        per_segment = await asyncio.gather(*(recognize_segment(start, end) for start, end in segments))
+    except CircuitOpenError as e:
+        raise recognizer_unavailable(e.retry_after_s)
+    except Exception as e:
+        logger.error(f"Error during transcription: {e}")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+    utterances = [u for segment in per_segment for u in segment]
+    logger.info(f"Recognized {len(segments)} segment(s), {len(utterances)} utterance(s)")
+    return {
+        "transcription": " ".join(u["text"] for u in utterances).strip(),
+        "entities": [],  # No extra entity extraction implemented here
+        "segments": [
+            {"text": u["text"], "offset_ms": u["offset"] // 10_000, "duration_ms": u["duration"] // 10_000}
+            for u in utterances
+        ]
+    }
+
+
+async def transcribe_audio(samples: np.ndarray, sample_rate: int, language: str = "en-US",
+                           on_segment: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Pre-process decoded mono audio (resample, trim silence), transcribe it with transcribe_pcm,
+    and map segment offsets back to the original recording. The result gains an "audio"
+    entry with the original, processed and removed durations in seconds.
+    """
+    with stage_timer("preprocess"):
+        processed = preprocess_audio(samples, sample_rate)
+    AUDIO_SECONDS.inc("input", amount=processed.original_seconds)
+    AUDIO_SECONDS.inc("removed", amount=processed.removed_seconds)
+
+    if len(processed.samples) == 0:
+        logger.info("Empty audio; skipping recognition")
+        transcription_result = {"transcription": "", "entities": [], "segments": []}
+    else:
+        with stage_timer("recognition"):
+            transcription_result = await transcribe_pcm(processed.samples, processed.sample_rate, language, on_segment)
+        for segment in transcription_result["segments"]:
+            segment["offset_ms"] = processed.to_original_ms(segment["offset_ms"])
+    transcription_result["audio"] = processed.summary()
+    return transcription_result
+
+
+async def recognize_upload(content: bytes, language: str, filename: Optional[str] = None,
+                           on_segment: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Return the raw transcription result ({"transcription", "entities", "segments"}) for an
+    uploaded audio payload, plus "cached": whether it was served from the transcription cache.
+    `on_segment(done, total)` reports recognition progress (see transcribe_pcm).
+    """
+    # Re-submitted recordings are served from the transcription cache without calling the recognizer
+    cache = get_transcription_cache()
+    with stage_timer("cache_lookup"):
+        key = cache_key(content, language, get_recognizer_backend().cache_identity())
+        transcription_result = await cache.get(key) if cache is not None else None
+    if transcription_result is not None:
+        logger.info(f"Transcription cache hit for {filename}")
+        TRANSCRIPTIONS.inc("cache")
+        return {**transcription_result, "cached": True}
+
+    # Fail fast while the recognizer is unhealthy (only cached recordings can be served)
+    retry_after = circuit_open_retry_after()
+    if retry_after is not None:
+        raise recognizer_unavailable(retry_after)
+
+    # Decode to PCM in memory; the real format is sniffed and only non-PCM audio goes through ffmpeg
+    with stage_timer("decode"):
+        samples, sample_rate, audio_format = await decode_audio(content)
+    logger.info(f"Detected {audio_format} audio ({len(samples) / sample_rate:.1f}s)")
+
+    # Pre-process and transcribe the PCM with the configured recognizer backend
+    transcription_result = await transcribe_audio(samples, sample_rate, language, on_segment)
+    TRANSCRIPTIONS.inc("recognizer")
+    if cache is not None:
+        with stage_timer("cache_store"):
+            await cache.put(key, transcription_result)
+    return {**transcription_result, "cached": False}
+
+
+def build_response(transcription_result: dict, include_entities: bool = False) -> dict:
+    """
+    Map a transcription result to structured medical terms and return the response body:
+    a TranscriptionResponse, extended with the Azure entities and their source when requested.
+    """
+    transcription = transcription_result.get("transcription", "")
+    azure_entities = transcription_result.get("entities", [])
+
+    # Map Azure entities to standard format, or fallback to keyword-based extraction
+    with stage_timer("term_mapping"):
+        if azure_entities:
+            structured_data = map_terms_from_azure(azure_entities)
+        else:
+            # Fallback: extract medical entities using in-house NLP extractor
+            fallback_entities = extract_medical_entities(transcription)
+            structured_data = convert_entities_to_mapped(fallback_entities)
+            logger.info(f"Fallback extracted entities: {[e.text for e in fallback_entities]}")
+
+    # Compose response with transcription and structured entities; every part was built by our
+    # own mappers, so skip re-validation and dump the whole tree in one call
+    with stage_timer("response_model"):
+        response = TranscriptionResponse.model_construct(
+            transcription=transcription,
+            structured_data=structured_data  # Already a list of MappedTerm
+        ).model_dump()
+
+    if include_entities:
+        response["azure_entities"] = azure_entities
+        response["source"] = "azure" if azure_entities else "keyword_extractor"
+        response["cached"] = transcription_result.get("cached", False)
+        response["audio"] = transcription_result.get("audio")
+    return response
+
+
+async def transcribe_content(content: bytes, language: str, include_entities: bool = False,
+                             filename: Optional[str] = None,
+                             on_segment: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Run the full pipeline for one uploaded payload and return the response body"""
+    transcription_result = await recognize_upload(content, language, filename, on_segment)
+    return build_response(transcription_result, include_entities)
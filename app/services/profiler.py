@@ -0,0 +1,118 @@
+# file: profiler.py
+
+'''
+Opt-in, sampled call-stack profiling of single requests.
+A request is profiled when it is picked by PROFILE_SAMPLE_RATE, or carries the `X-Profile: 1`
+header while PROFILE_HEADER_ENABLED is on (off by default; when PROFILE_TOKEN is set the request
+must also send it as `X-Profile-Token`). The whole handler runs under cProfile and the result
+is written to UPLOAD_DIR/profiles/<request id>-<random suffix>.prof, a pstats file that
+standard viewers open (python -m pstats, snakeviz, gprof2dot). Only the newest
+PROFILE_MAX_FILES profiles are kept; older ones are deleted as new ones are written.
+
+Only one request is profiled at a time: cProfile hooks the event-loop thread, so a profile
+also contains whatever other coroutines ran while the profiled request was awaiting, and
+work done in recognizer threads is not included. Requests arriving while a profile is
+running are simply not profiled.
+'''
+
+import os
+import re
+import hmac
+import uuid
+import random
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Mapping
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_TOKEN_HEADER = "x-profile-token"
+REQUEST_ID_HEADER = "x-request-id"
+
+_active = threading.Lock()
+_unsafe_id_chars = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def profile_dir() -> str:
+    return os.path.join(settings.UPLOAD_DIR, "profiles")
+
+
+# Caller-supplied request ids end up in file names, so keep them to a safe character set
+def request_id_from(headers: Mapping[str, str]) -> str:
+    supplied = _unsafe_id_chars.sub("", headers.get(REQUEST_ID_HEADER, ""))[:64]
+    return supplied or uuid.uuid4().hex
+
+
+def _header_allowed(headers: Mapping[str, str]) -> bool:
+    if not settings.PROFILE_HEADER_ENABLED:
+        return False
+    if not settings.PROFILE_TOKEN:
+        return True
+    return hmac.compare_digest(headers.get(PROFILE_TOKEN_HEADER, "").encode(), settings.PROFILE_TOKEN.encode())
+
+
+def should_profile(headers: Mapping[str, str]) -> bool:
+    """Whether this request asked for (and may have) profiling, or was sampled into it"""
+    if headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes") and _header_allowed(headers):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+# Keep the newest `keep` profiles; anything older is deleted so profiles cannot fill the disk
+def prune_profiles(directory: str, keep: int):
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".prof")]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[max(0, keep):]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def _write_profile(profiler: cProfile.Profile, path: str):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        logger.info(f"Wrote request profile {path}")
+        prune_profiles(os.path.dirname(path), settings.PROFILE_MAX_FILES)
+    except OSError as e:
+        logger.warning(f"Could not write request profile {path}: {e}")
+
+
+@contextmanager
+def request_profiler(request_id: str, enabled: bool):
+    """
+    Profile the enclosed block when `enabled` and no other profile is running.
+    Yields the path the profile is written to, or None when not profiling.
+    The profile is written even if the block raises, so slow failing requests are kept too.
+    """
+    if not enabled or not _active.acquire(blocking=False):
+        yield None
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler (e.g. a debugger or an external cProfile run) already owns this thread
+        _active.release()
+        logger.warning(f"Request {request_id} not profiled: {e}")
+        profiler = None
+    if profiler is None:
+        yield None
+        return
+    # The random suffix keeps a reused (client-chosen) request id from overwriting an earlier profile
+    path = os.path.join(profile_dir(), f"{request_id}-{uuid.uuid4().hex[:8]}.prof")
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        _active.release()
+        _write_profile(profiler, path)
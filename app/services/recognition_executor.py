@@ -0,0 +1,134 @@
+# file: recognition_executor.py
+
+'''
+Dedicated, bounded thread pool for blocking speech recognition calls, and the limit on
+recognitions running at once.
+The Azure Speech SDK's blocking calls (starting and stopping continuous recognition) run
+here instead of on the event loop. Those calls are short, so the pool alone does not bound
+how many recognitions are in flight: a recognition holds a slot from recognition_slot() for
+its whole lifetime instead. Both are sized by settings.RECOGNITION_MAX_WORKERS, and queue
+depths are tracked for the health endpoint and metrics.
+'''
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.config import settings
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Counters shared between the event loop and worker threads
+_stats_lock = threading.Lock()
+_queued = 0   # Submitted calls waiting for a free worker
+_active = 0   # Calls currently running on a worker
+_completed = 0
+
+# Recognition slots (event loop only)
+_slots: Optional[asyncio.Semaphore] = None
+_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+_recognitions_active = 0
+_recognitions_waiting = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RECOGNITION_MAX_WORKERS,
+                    thread_name_prefix="recognition"
+                )
+    return _executor
+
+
+def _tracked_call(fn: Callable[..., Any], *args) -> Any:
+    global _queued, _active, _completed
+    with _stats_lock:
+        _queued -= 1
+        _active += 1
+    try:
+        return fn(*args)
+    finally:
+        with _stats_lock:
+            _active -= 1
+            _completed += 1
+
+
+# A call cancelled before a worker picked it up (caller gone, shutdown) never runs _tracked_call
+def _forget_if_cancelled(future: Future):
+    global _queued
+    if future.cancelled():
+        with _stats_lock:
+            _queued -= 1
+
+
+async def run_recognition(fn: Callable[..., Any], *args) -> Any:
+    """Run a blocking recognition call on the bounded pool and await its result"""
+    global _queued
+    with _stats_lock:
+        _queued += 1
+    try:
+        future = _get_executor().submit(_tracked_call, fn, *args)
+    except BaseException:
+        with _stats_lock:
+            _queued -= 1
+        raise
+    future.add_done_callback(_forget_if_cancelled)
+    # Cancelling the await also cancels the pool call if it has not started yet
+    return await asyncio.wrap_future(future)
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots, _slots_loop = asyncio.Semaphore(max(1, settings.RECOGNITION_MAX_WORKERS)), loop
+    return _slots
+
+
+@asynccontextmanager
+async def recognition_slot():
+    """
+    Hold one of settings.RECOGNITION_MAX_WORKERS recognition slots for the enclosed block,
+    waiting for one if all are taken. Wrap the whole life of a recognition in it.
+    """
+    global _recognitions_active, _recognitions_waiting
+    slots = _get_slots()
+    _recognitions_waiting += 1
+    try:
+        await slots.acquire()
+    finally:
+        _recognitions_waiting -= 1
+    _recognitions_active += 1
+    try:
+        yield
+    finally:
+        _recognitions_active -= 1
+        slots.release()
+
+
+def recognition_stats() -> dict:
+    """Concurrency limit, pool queue depth and recognitions running or waiting for a slot"""
+    with _stats_lock:
+        return {
+            "max_workers": settings.RECOGNITION_MAX_WORKERS,
+            "active": _active,
+            "queued": _queued,
+            "completed": _completed,
+            "recognitions_active": _recognitions_active,
+            "recognitions_waiting": _recognitions_waiting,
+        }
+
+
+def shutdown_executor():
+    """Stop accepting work and wait for running recognitions (called on app shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,145 @@
+# file: recognizer_backend.py
+
+'''
+Pluggable speech recognizer backends.
+The transcription pipeline talks to a RecognizerBackend instead of a specific speech SDK:
+it recognizes one segment of PCM audio at a time and opens streaming sessions for live
+dictation. The backend is chosen by settings.RECOGNIZER_BACKEND ("azure" for Azure
+Speech, "stub" for the offline stand-in used for load testing) and imported lazily.
+'''
+
+import asyncio
+import importlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Backend name -> "module:attribute" of its RecognizerBackend class
+RECOGNIZER_BACKENDS = {
+    "azure": "app.services.azure_speech:AzureRecognizerBackend",
+    "stub": "app.services.stub_recognizer:StubRecognizerBackend",
+}
+
+
+class RecognitionError(RuntimeError):
+    """A recognition call failed on the recognizer's side (canceled, timed out); worth retrying"""
+
+
+class StreamingSession:
+    """
+    Recognition over audio that arrives incrementally (e.g. WebSocket frames of 16 kHz,
+    16-bit mono PCM). Backends push "partial", "final", "error" and "end" events onto
+    `events`; consumers read them in order through iter_events().
+    """
+
+    def __init__(self, language: str = "en-US"):
+        self.language = language
+        self.events: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._input_closed = False
+
+    def _emit(self, event: dict):
+        # May be called from backend threads; hand the event over to the event loop
+        self._loop.call_soon_threadsafe(self.events.put_nowait, event)
+
+    async def start(self):
+        raise NotImplementedError
+
+    def write(self, audio_chunk: bytes):
+        """Feed the next chunk of PCM audio to the recognizer"""
+        raise NotImplementedError
+
+    def close_input(self):
+        """Signal that no more audio will arrive; the recognizer drains what it has and ends"""
+        self._input_closed = True
+
+    async def iter_events(self, end_timeout: float):
+        """
+        Yield recognition events until the session ends. Once input is closed, the
+        remaining audio must be recognized within `end_timeout` seconds.
+        """
+        deadline = None
+        while True:
+            if deadline is None and self._input_closed:
+                deadline = self._loop.time() + end_timeout
+            remaining = 1.0 if deadline is None else deadline - self._loop.time()
+            if remaining <= 0:
+                logger.warning("Streaming recognition did not end in time after input closed")
+                return
+            try:
+                # Short waits so a close_input() issued meanwhile starts the end deadline promptly
+                event = await asyncio.wait_for(self.events.get(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                continue
+            if event["type"] == "end":
+                return
+            yield event
+
+    async def stop(self):
+        pass
+
+
+class RecognizerBackend:
+    """Interface every recognizer backend implements"""
+    name = "base"
+    version = "1"  # Bump when the backend's output for the same audio changes
+
+    def cache_identity(self) -> str:
+        """
+        What produced a transcription, for the transcription cache key: results of one
+        backend (or model/endpoint) must never be served when another one is configured.
+        """
+        return f"{self.name}/{self.version}"
+
+    async def recognize_pcm(self, pcm: bytes, sample_rate: int, language: str) -> List[dict]:
+        """
+        Recognize one segment of 16-bit mono PCM. Returns [{"text", "offset", "duration"}]
+        with offsets in 100 ns ticks relative to the segment; raises on failure or timeout.
+        """
+        raise NotImplementedError
+
+    def streaming_session(self, language: str) -> StreamingSession:
+        """A new, not yet started, streaming session"""
+        raise NotImplementedError
+
+    async def startup(self):
+        """Prepare resources (connections, pools) when the app starts"""
+
+    async def shutdown(self):
+        """Release resources when the app stops"""
+
+    def status(self) -> dict:
+        return {"name": self.name}
+
+
+_backends: Dict[str, RecognizerBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_recognizer_backend(name: Optional[str] = None) -> RecognizerBackend:
+    """The process-wide backend instance selected by settings.RECOGNIZER_BACKEND (or `name`)"""
+    name = (name or settings.RECOGNIZER_BACKEND).lower()
+    backend = _backends.get(name)
+    if backend is None:
+        if name not in RECOGNIZER_BACKENDS:
+            raise ValueError(f"Unknown recognizer backend '{name}' (expected one of {', '.join(RECOGNIZER_BACKENDS)})")
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                module_name, attribute = RECOGNIZER_BACKENDS[name].split(":")
+                backend = getattr(importlib.import_module(module_name), attribute)()
+                _backends[name] = backend
+                logger.info(f"Using '{name}' recognizer backend")
+    return backend
+
+
+def recognizer_backend_status() -> dict:
+    """Status of the configured backend, without importing it if nothing has used it yet"""
+    backend = _backends.get(settings.RECOGNIZER_BACKEND.lower())
+    if backend is None:
+        return {"name": settings.RECOGNIZER_BACKEND, "loaded": False}
+    return backend.status()
@@ -0,0 +1,256 @@
+# file: resilience.py
+
+'''
+Resilience layer around segment recognition (RecognizerBackend.recognize_pcm).
+- Hedging: when a call is still running past settings.RECOGNITION_HEDGE_PERCENTILE of
+  recent latencies, a duplicate call is sent and whichever finishes first wins (the other
+  is cancelled). Hedges are capped at RECOGNITION_HEDGE_MAX_RATIO of calls so a slow
+  backend is not hit with double the load.
+- Retries: transient failures (RecognitionError from the backend, timeouts, connection
+  errors, 5xx/429) are retried up to RECOGNITION_MAX_ATTEMPTS with exponential backoff
+  and full jitter. Any other exception is a bug or bad input: it is raised at once and
+  does not count against the circuit breaker.
+- Circuit breaker: when too many recent attempts failed, the circuit opens and calls fail
+  fast with CircuitOpenError for RECOGNITION_BREAKER_COOLDOWN_S; then a single probe call
+  decides whether it closes again. The pipeline answers 503 with Retry-After meanwhile,
+  and keeps serving re-submitted recordings from the transcription cache.
+Latencies are tracked per second of audio, so the hedge delay scales with segment length.
+Exercise it offline with the stub backend (STUB_ERROR_RATE, STUB_LATENCY_* settings).
+'''
+
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.recognizer_backend import RecognitionError, RecognizerBackend, get_recognizer_backend
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 200         # Recent successful calls the hedge delay is computed from
+HEDGE_MIN_SAMPLES = 20       # No hedging until this many latencies have been observed
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the circuit breaker is open"""
+
+    def __init__(self, retry_after_s: float):
+        super().__init__(f"Recognizer circuit open; retry in {retry_after_s:.0f}s")
+        self.retry_after_s = retry_after_s
+
+
+# Exceptions that signal a recognizer outage or overload rather than a problem with the request
+TRANSIENT_ERRORS = (RecognitionError, asyncio.TimeoutError, TimeoutError, ConnectionError)
+
+
+def is_transient(error: BaseException) -> bool:
+    """Failures worth retrying: backend errors, timeouts and 5xx/429; anything unknown is not"""
+    if isinstance(error, HTTPException):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open when at least `min_calls` of the last `window` attempts were recorded and
+    `failure_ratio` of them failed; open -> half-open after `cooldown_s`, letting one probe
+    through; the probe's outcome closes the circuit or opens it for another cooldown.
+    """
+
+    def __init__(self, window: int, min_calls: int, failure_ratio: float, cooldown_s: float):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown_s = cooldown_s
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened_count = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.cooldown_s - time.monotonic())
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go to the backend now"""
+        if self.state == "open":
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.retry_after())
+            self.state = "half_open"
+            logger.info("Recognizer circuit half-open; sending a probe")
+        if self.state == "half_open":
+            if self._probing:
+                raise CircuitOpenError(1.0)
+            self._probing = True
+
+    def abandon(self):
+        """The call allowed through was cancelled or failed for a non-transient reason; it proves nothing either way"""
+        if self.state == "half_open":
+            self._probing = False
+
+    def record(self, success: bool):
+        if self.state == "half_open":
+            self._probing = False
+            if success:
+                self.state = "closed"
+                self._outcomes.clear()
+                logger.info("Recognizer circuit closed")
+            else:
+                self._open()
+            return
+        if self.state == "open":  # Late results of calls started before the circuit opened
+            return
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if (len(self._outcomes) >= self.min_calls
+                and failures >= self.failure_ratio * len(self._outcomes)):
+            self._open()
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened_count += 1
+        logger.warning(f"Recognizer circuit open for {self.cooldown_s:.0f}s after repeated failures")
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "retry_after_s": round(self.retry_after(), 1) if self.state == "open" else None,
+            "recent_failures": self._outcomes.count(False),
+            "recent_calls": len(self._outcomes),
+            "opened": self.opened_count,
+        }
+
+
+class ResilientRecognizer:
+    """recognize_pcm of the configured backend with hedging, retries and a circuit breaker"""
+
+    def __init__(self, backend: RecognizerBackend):
+        self.backend = backend
+        self.breaker = CircuitBreaker(
+            window=settings.RECOGNITION_BREAKER_WINDOW,
+            min_calls=settings.RECOGNITION_BREAKER_MIN_CALLS,
+            failure_ratio=settings.RECOGNITION_BREAKER_FAILURE_RATIO,
+            cooldown_s=settings.RECOGNITION_BREAKER_COOLDOWN_S,
+        )
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)  # Seconds per (1 + audio second)
+        self.stats = {"calls": 0, "attempts": 0, "failures": 0, "retries": 0,
+                      "hedges": 0, "hedges_won": 0, "rejected": 0}
+
+    def hedge_delay(self, audio_seconds: float) -> Optional[float]:
+        """How long to wait before hedging a call, or None if hedging is off or not yet calibrated"""
+        if settings.RECOGNITION_HEDGE_PERCENTILE <= 0 or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self.stats["hedges"] >= settings.RECOGNITION_HEDGE_MAX_RATIO * self.stats["calls"]:
+            return None
+        per_second = float(np.percentile(np.fromiter(self._latencies, dtype=np.float64),
+                                         settings.RECOGNITION_HEDGE_PERCENTILE))
+        return max(per_second * (1.0 + audio_seconds), settings.RECOGNITION_HEDGE_MIN_DELAY_S)
+
+    async def _attempt(self, pcm: bytes, sample_rate: int, language: str) -> List[dict]:
+        """One call, bounded by settings.RECOGNITION_ATTEMPT_TIMEOUT_S"""
+        return await asyncio.wait_for(
+            self.backend.recognize_pcm(pcm, sample_rate, language), settings.RECOGNITION_ATTEMPT_TIMEOUT_S
+        )
+
+    async def _hedged_attempt(self, pcm: bytes, sample_rate: int, language: str, audio_seconds: float) -> List[dict]:
+        """Run one attempt; if it is still running after the hedge delay, race a duplicate against it"""
+        primary = asyncio.ensure_future(self._attempt(pcm, sample_rate, language))
+        delay = self.hedge_delay(audio_seconds)
+        if delay is None:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.stats["hedges"] += 1
+                hedge = asyncio.ensure_future(self._attempt(pcm, sample_rate, language))
+                tasks.add(hedge)
+            # First successful result wins; fail only if every call failed
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedges_won"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def recognize_pcm(self, pcm: bytes, sample_rate: int, language: str) -> List[dict]:
+        """Same contract as RecognizerBackend.recognize_pcm; raises CircuitOpenError when failing fast"""
+        self.stats["calls"] += 1
+        audio_seconds = len(pcm) / (sample_rate * 2)
+        attempts = max(1, settings.RECOGNITION_MAX_ATTEMPTS)
+        for attempt in range(attempts):
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self.stats["rejected"] += 1
+                raise
+
+            self.stats["attempts"] += 1
+            started = time.monotonic()
+            try:
+                result = await self._hedged_attempt(pcm, sample_rate, language, audio_seconds)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                self.stats["failures"] += 1
+                if not is_transient(e):
+                    # Says nothing about the backend's health: neither retried nor counted by the breaker
+                    self.breaker.abandon()
+                    raise
+                self.breaker.record(False)
+                if attempt + 1 >= attempts:
+                    raise
+                # Full jitter: a random wait up to the exponential backoff spreads out retries
+                backoff = random.uniform(0, min(settings.RECOGNITION_RETRY_MAX_S,
+                                                settings.RECOGNITION_RETRY_BASE_S * 2 ** attempt))
+                logger.warning(f"Recognition attempt {attempt + 1} failed ({e!r}); retrying in {backoff:.2f}s")
+                self.stats["retries"] += 1
+                await asyncio.sleep(backoff)
+                continue
+
+            self.breaker.record(True)
+            self._latencies.append((time.monotonic() - started) / (1.0 + audio_seconds))
+            return result
+
+    def status(self) -> dict:
+        return {"breaker": self.breaker.status(), **self.stats}
+
+
+_recognizer: Optional[ResilientRecognizer] = None
+
+
+def get_resilient_recognizer() -> ResilientRecognizer:
+    """Process-wide resilient wrapper around the configured recognizer backend"""
+    global _recognizer
+    if _recognizer is None:
+        _recognizer = ResilientRecognizer(get_recognizer_backend())
+    return _recognizer
+
+
+def circuit_open_retry_after() -> Optional[float]:
+    """Seconds until the breaker lets calls through again, or None when it is not open"""
+    if _recognizer is None or _recognizer.breaker.state != "open" or _recognizer.breaker.retry_after() <= 0:
+        return None
+    return _recognizer.breaker.retry_after()
+
+
+def resilience_status() -> dict:
+    if _recognizer is None:
+        return {"loaded": False}
+    return _recognizer.status()
@@ -0,0 +1,37 @@
+# file: serialization.py
+
+'''
+One-step JSON encoding for response bodies.
+Uses orjson when it is installed (several times faster than the standard library on
+large entity lists) and falls back to json with the same compact, UTF-8 output that
+Starlette's JSONResponse produces, so clients see the same bytes either way.
+'''
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up; the standard library encoder is used instead
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain JSON-compatible data (dicts, lists, str, numbers, None) to UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_line(content: Any) -> bytes:
+    """One NDJSON line"""
+    return dumps(content) + b"\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes its (already plain) content with dumps()"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,271 @@
+# file: speech_pool.py
+
+'''
+Per-language pool of Azure Speech configuration and pre-warmed recognizers.
+A SpeechConfig is built once per language and shared. For each language in use, a
+few push-stream recognizers are kept with their service connection already open,
+so a dictation starts without paying TLS and handshake setup. Connections report
+their health through the SDK's connected/disconnected events; broken or idle
+entries are closed and replaced by a background maintenance loop. Setting
+AZURE_SPEECH_ENDPOINT points every recognizer at a different (e.g. local) service.
+'''
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+
+import azure.cognitiveservices.speech as speechsdk
+
+from app.config import settings
+from app.services.audio_segmenter import TARGET_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+class WarmRecognizer:
+    """A push-stream recognizer whose service connection was opened ahead of use"""
+    __slots__ = ("recognizer", "stream", "connection", "created_at", "connected", "failed")
+
+    def __init__(self, recognizer, stream, connection):
+        self.recognizer = recognizer
+        self.stream = stream
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.connected = False   # Set by the connection's `connected` event
+        self.failed = False      # Set by the `disconnected` event; the entry is never handed out
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled speech connection: {e}")
+
+
+class SpeechPool:
+    """
+    Shared SpeechConfig objects plus `size` warm recognizers per language.
+    Acquiring takes a healthy warm recognizer (or builds one cold if none is ready)
+    and schedules a replacement on the pool's own background thread.
+    """
+
+    def __init__(self, size: int, idle_recycle_s: float):
+        self.size = size
+        self.idle_recycle_s = idle_recycle_s
+        self._configs: Dict[str, speechsdk.SpeechConfig] = {}
+        self._warm: Dict[str, Deque[WarmRecognizer]] = {}
+        self._lock = threading.Lock()
+        self._refiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speech-pool")
+        self.stats = {"warm_hits": 0, "cold_starts": 0, "opened": 0, "recycled_idle": 0, "dropped_unhealthy": 0}
+
+    def _count(self, counter: str):
+        # Counters are bumped from request threads and the pool thread; `+=` on a dict item is not atomic
+        with self._lock:
+            self.stats[counter] += 1
+
+    def speech_config(self, language: str) -> speechsdk.SpeechConfig:
+        """The shared SpeechConfig for a language (built on first use, never mutated afterwards)"""
+        config = self._configs.get(language)
+        if config is None:
+            with self._lock:
+                config = self._configs.get(language)
+                if config is None:
+                    if settings.AZURE_SPEECH_ENDPOINT:
+                        config = speechsdk.SpeechConfig(
+                            subscription=settings.AZURE_SPEECH_KEY,
+                            endpoint=settings.AZURE_SPEECH_ENDPOINT
+                        )
+                    else:
+                        config = speechsdk.SpeechConfig(
+                            subscription=settings.AZURE_SPEECH_KEY,
+                            region=settings.AZURE_SPEECH_REGION
+                        )
+                    config.speech_recognition_language = language
+                    self._configs[language] = config
+        return config
+
+    def _create(self, language: str, sample_rate: int):
+        stream_format = speechsdk.audio.AudioStreamFormat(samples_per_second=sample_rate, bits_per_sample=16, channels=1)
+        stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+        audio_config = speechsdk.audio.AudioConfig(stream=stream)
+        recognizer = speechsdk.SpeechRecognizer(speech_config=self.speech_config(language), audio_config=audio_config)
+        return recognizer, stream
+
+    def _open_warm(self, language: str) -> WarmRecognizer:
+        # Build a recognizer and open its connection now, so the first audio skips the handshake
+        recognizer, stream = self._create(language, TARGET_SAMPLE_RATE)
+        connection = speechsdk.Connection.from_recognizer(recognizer)
+        entry = WarmRecognizer(recognizer, stream, connection)
+
+        def on_connected(evt):
+            entry.connected = True
+
+        def on_disconnected(evt):
+            entry.failed = True
+
+        connection.connected.connect(on_connected)
+        connection.disconnected.connect(on_disconnected)
+        connection.open(True)  # Open for continuous recognition
+        self._count("opened")
+        return entry
+
+    def _refill(self, language: str):
+        # Runs on the pool thread: top the language's warm queue back up to `size`
+        while True:
+            with self._lock:
+                queue = self._warm.setdefault(language, deque())
+                if len(queue) >= self.size:
+                    return
+            try:
+                entry = self._open_warm(language)
+            except Exception as e:
+                logger.warning(f"Failed to pre-warm speech recognizer for {language}: {e}")
+                return
+            with self._lock:
+                self._warm[language].append(entry)
+
+    def _schedule_refill(self, language: str):
+        try:
+            self._refiller.submit(self._refill, language)
+        except RuntimeError:
+            pass  # Pool is shutting down
+
+    def warm(self, language: str):
+        """Start keeping warm recognizers for a language"""
+        with self._lock:
+            self._warm.setdefault(language, deque())
+        self._schedule_refill(language)
+
+    def acquire(self, language: str, sample_rate: int = TARGET_SAMPLE_RATE):
+        """Return (recognizer, push stream) for one recognition session; warm if one is ready"""
+        if sample_rate != TARGET_SAMPLE_RATE:
+            # Warm entries are 16 kHz only; other rates still share the cached SpeechConfig
+            self._count("cold_starts")
+            return self._create(language, sample_rate)
+
+        entry = None
+        unhealthy = []
+        with self._lock:
+            queue = self._warm.setdefault(language, deque())
+            while queue:
+                candidate = queue.popleft()
+                if candidate.failed:
+                    self.stats["dropped_unhealthy"] += 1
+                    unhealthy.append(candidate)
+                    continue
+                entry = candidate
+                break
+            self.stats["warm_hits" if entry is not None else "cold_starts"] += 1
+        for candidate in unhealthy:
+            candidate.close()
+        self._schedule_refill(language)
+
+        if entry is None:
+            return self._create(language, sample_rate)
+        return entry.recognizer, entry.stream
+
+    def maintain(self):
+        """Close broken connections and ones idle longer than `idle_recycle_s`, then refill"""
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for language, queue in self._warm.items():
+                keep = deque()
+                for entry in queue:
+                    if entry.failed:
+                        self.stats["dropped_unhealthy"] += 1
+                        stale.append(entry)
+                    elif now - entry.created_at > self.idle_recycle_s:
+                        self.stats["recycled_idle"] += 1
+                        stale.append(entry)
+                    else:
+                        keep.append(entry)
+                self._warm[language] = keep
+            languages = list(self._warm)
+        for entry in stale:
+            entry.close()
+        for language in languages:
+            self._schedule_refill(language)
+
+    def status(self) -> dict:
+        """Warm/connected counts per language and pool counters for the health endpoint"""
+        with self._lock:
+            languages = {
+                language: {
+                    "warm": len(queue),
+                    "connected": sum(1 for e in queue if e.connected and not e.failed),
+                }
+                for language, queue in self._warm.items()
+            }
+            stats = dict(self.stats)
+        return {"size": self.size, "endpoint": settings.AZURE_SPEECH_ENDPOINT or None,
+                "languages": languages, **stats}
+
+    def close(self):
+        self._refiller.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            entries = [entry for queue in self._warm.values() for entry in queue]
+            self._warm.clear()
+        for entry in entries:
+            entry.close()
+
+
+_pool: Optional[SpeechPool] = None
+_pool_lock = threading.Lock()
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+def get_speech_pool() -> SpeechPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SpeechPool(settings.SPEECH_POOL_SIZE, settings.SPEECH_POOL_IDLE_RECYCLE_S)
+    return _pool
+
+
+# Recognizer plus push stream for one session (16-bit mono PCM at `sample_rate`), warm when possible
+def acquire_recognizer(language: str, sample_rate: int = TARGET_SAMPLE_RATE) -> Tuple[object, object]:
+    return get_speech_pool().acquire(language, sample_rate)
+
+
+async def _maintenance_loop(pool: SpeechPool):
+    while True:
+        await asyncio.sleep(settings.SPEECH_POOL_MAINTENANCE_INTERVAL_S)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, pool.maintain)
+        except Exception as e:
+            logger.warning(f"Speech pool maintenance failed: {e}")
+
+
+async def start_speech_pool():
+    """Pre-open connections for the configured languages and start idle recycling (app startup)"""
+    global _maintenance_task
+    if settings.SPEECH_POOL_SIZE <= 0:
+        return
+    pool = get_speech_pool()
+    for language in filter(None, (lang.strip() for lang in settings.SPEECH_POOL_LANGUAGES.split(","))):
+        pool.warm(language)
+    _maintenance_task = asyncio.create_task(_maintenance_loop(pool))
+
+
+async def stop_speech_pool():
+    """Stop maintenance and close every warm connection (app shutdown)"""
+    global _pool, _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        _maintenance_task = None
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def speech_pool_status() -> dict:
+    """Pool status for the health endpoint"""
+    if _pool is None:
+        return {"size": settings.SPEECH_POOL_SIZE, "languages": {}}
+    return _pool.status()
@@ -0,0 +1,100 @@
+# file: startup.py
+
+'''
+Startup phases and readiness.
+The app starts accepting connections as soon as it is imported; slow preparation
+(loading the term lexicon, importing the speech SDK and warming its connections,
+recovering queued jobs) runs afterwards as timed phases in a background task.
+/api/health answers as soon as the process is up (liveness); /api/ready answers 200
+only once every phase has finished (readiness), so load balancers and autoscalers
+route traffic to a new worker only when it can serve at full speed.
+The total startup time is compared against settings.STARTUP_BUDGET_S.
+'''
+
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Reference point for startup time: when this module was first imported by app.main
+_process_started = time.monotonic()
+
+_phases: Dict[str, dict] = {}
+_ready = False
+_error: Optional[str] = None
+_startup_seconds: Optional[float] = None
+_task: Optional[asyncio.Task] = None
+
+
+async def _run_phase(name: str, phase: Callable[[], Awaitable[None]]):
+    started = time.monotonic()
+    _phases[name] = {"status": "running", "seconds": None}
+    try:
+        await phase()
+    except Exception as e:
+        _phases[name] = {"status": "failed", "seconds": round(time.monotonic() - started, 3), "error": str(e)}
+        raise
+    _phases[name] = {"status": "done", "seconds": round(time.monotonic() - started, 3)}
+    logger.info(f"Startup phase '{name}' finished in {_phases[name]['seconds']:.3f}s")
+
+
+async def _run_phases(phases: List[Tuple[str, Callable[[], Awaitable[None]]]]):
+    global _ready, _error, _startup_seconds
+    for name, _ in phases:
+        _phases[name] = {"status": "pending", "seconds": None}
+    try:
+        for name, phase in phases:
+            await _run_phase(name, phase)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        _error = f"{name}: {e}"
+        logger.error(f"Startup phase '{name}' failed; the app stays not ready", exc_info=True)
+        return
+
+    _startup_seconds = round(time.monotonic() - _process_started, 3)
+    _ready = True
+    if _startup_seconds > settings.STARTUP_BUDGET_S:
+        timings = ", ".join(f"{phase_name}={phase['seconds']}s" for phase_name, phase in _phases.items())
+        logger.warning(f"Startup took {_startup_seconds:.2f}s, over the {settings.STARTUP_BUDGET_S:.1f}s budget "
+                       f"(phases: {timings})")
+    else:
+        logger.info(f"Ready after {_startup_seconds:.2f}s (budget {settings.STARTUP_BUDGET_S:.1f}s)")
+
+
+def start_phases(phases: List[Tuple[str, Callable[[], Awaitable[None]]]]):
+    """Run the named startup phases in order in the background (called from the app startup hook)"""
+    global _task
+    _task = asyncio.create_task(_run_phases(phases))
+
+
+async def stop_phases():
+    """Cancel startup work still in progress (app shutdown)"""
+    if _task is not None and not _task.done():
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def phase_started(name: str) -> bool:
+    return _phases.get(name, {}).get("status") in ("running", "done", "failed")
+
+
+def startup_status() -> dict:
+    """Readiness, per-phase timings and the total startup time against the budget"""
+    return {
+        "ready": _ready,
+        "uptime_seconds": round(time.monotonic() - _process_started, 3),
+        "startup_seconds": _startup_seconds,
+        "budget_seconds": settings.STARTUP_BUDGET_S,
+        "within_budget": _startup_seconds <= settings.STARTUP_BUDGET_S if _startup_seconds is not None else None,
+        "phases": dict(_phases),
+        "error": _error,
+    }
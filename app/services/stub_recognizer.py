@@ -0,0 +1,149 @@
+# file: stub_recognizer.py
+
+'''
+Offline stand-in recognizer backend for load and resilience testing.
+It never touches the network: each request returns a scripted transcript after a
+simulated latency, and fails with a configurable probability, so the service can be
+driven end to end without spending Azure quota or picking up network jitter.
+Select it with RECOGNIZER_BACKEND=stub; the STUB_* settings shape its behavior.
+'''
+
+import math
+import random
+import asyncio
+import zlib
+import logging
+from typing import List, Optional
+
+from app.config import settings
+from app.services.audio_segmenter import TARGET_SAMPLE_RATE
+from app.services.recognizer_backend import RecognitionError, RecognizerBackend, StreamingSession
+
+logger = logging.getLogger(__name__)
+
+# Default scripts: typical dictations mentioning terms from the medical terms workbook
+DEFAULT_TRANSCRIPTS = [
+    "Patient complains of chest pain, order an ECG and a CBC.",
+    "Schedule an MRI of the brain and check blood sugar levels.",
+    "History of hypertension and type 2 diabetes, continue current medication.",
+    "Order a chest X-ray and a lipid profile before the follow-up visit.",
+    "Patient reports fever and cough, suspect pneumonia, order a CBC.",
+]
+
+# z-score of the 99th percentile of a standard normal distribution
+Z_99 = 2.326
+
+
+class StubRecognizerBackend(RecognizerBackend):
+    """
+    Scripted recognizer. The transcript for a segment is picked deterministically from the
+    audio content, so identical audio always yields the same text. Latency follows a
+    log-normal distribution given by its median and 99th percentile, plus an optional
+    per-audio-second component; each call fails with probability STUB_ERROR_RATE.
+    """
+    name = "stub"
+
+    def __init__(self, transcripts: Optional[List[str]] = None):
+        self.transcripts = transcripts or self._load_transcripts()
+        self.random = random.Random(settings.STUB_SEED)
+        median = max(settings.STUB_LATENCY_MEDIAN_MS, 0.001)
+        p99 = max(settings.STUB_LATENCY_P99_MS, median)
+        self._mu = math.log(median / 1000.0)
+        self._sigma = math.log(p99 / median) / Z_99
+        self.calls = 0
+        self.injected_errors = 0
+
+    @staticmethod
+    def _load_transcripts() -> List[str]:
+        if not settings.STUB_TRANSCRIPTS_PATH:
+            return list(DEFAULT_TRANSCRIPTS)
+        with open(settings.STUB_TRANSCRIPTS_PATH, encoding="utf-8") as f:
+            transcripts = [line.strip() for line in f if line.strip()]
+        return transcripts or list(DEFAULT_TRANSCRIPTS)
+
+    def transcript_for(self, pcm: bytes) -> str:
+        return self.transcripts[zlib.crc32(pcm) % len(self.transcripts)]
+
+    def sample_latency(self, audio_seconds: float) -> float:
+        """Simulated recognition time in seconds"""
+        latency = self.random.lognormvariate(self._mu, self._sigma) if self._sigma > 0 else math.exp(self._mu)
+        return latency + audio_seconds * settings.STUB_SECONDS_PER_AUDIO_SECOND
+
+    def _maybe_fail(self):
+        if settings.STUB_ERROR_RATE > 0 and self.random.random() < settings.STUB_ERROR_RATE:
+            self.injected_errors += 1
+            raise RecognitionError("Recognition canceled: stub recognizer injected failure")
+
+    async def recognize_pcm(self, pcm: bytes, sample_rate: int, language: str) -> list:
+        self.calls += 1
+        audio_seconds = len(pcm) / (sample_rate * 2)
+        await asyncio.sleep(self.sample_latency(audio_seconds))
+        self._maybe_fail()
+        if not pcm:
+            return []
+        return [{"text": self.transcript_for(pcm), "offset": 0, "duration": int(audio_seconds * 10_000_000)}]
+
+    def cache_identity(self) -> str:
+        return f"{self.name}/{self.version}/{zlib.crc32(chr(0).join(self.transcripts).encode('utf-8')):08x}"
+
+    def streaming_session(self, language: str) -> StreamingSession:
+        return StubStreamingSession(self, language)
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "transcripts": len(self.transcripts),
+            "latency_median_ms": settings.STUB_LATENCY_MEDIAN_MS,
+            "latency_p99_ms": settings.STUB_LATENCY_P99_MS,
+            "error_rate": settings.STUB_ERROR_RATE,
+            "calls": self.calls,
+            "injected_errors": self.injected_errors,
+        }
+
+
+class StubStreamingSession(StreamingSession):
+    """
+    Streaming counterpart of the stub: reveals the scripted transcript word by word as
+    audio arrives (one word per STUB_STREAM_WORD_MS of audio) and emits it as a final
+    phrase once input is closed.
+    """
+
+    def __init__(self, backend: StubRecognizerBackend, language: str = "en-US"):
+        super().__init__(language)
+        self.backend = backend
+        self._words: List[str] = []
+        self._received = 0
+        self._revealed = 0
+
+    async def start(self):
+        self.backend.calls += 1
+        self._words = self.backend.random.choice(self.backend.transcripts).split()
+
+    def write(self, audio_chunk: bytes):
+        self._received += len(audio_chunk)
+        audio_ms = self._received * 1000 // (TARGET_SAMPLE_RATE * 2)
+        words = min(len(self._words), int(audio_ms // max(settings.STUB_STREAM_WORD_MS, 1)))
+        if words > self._revealed:
+            self._revealed = words
+            self._emit({"type": "partial", "text": " ".join(self._words[:words])})
+
+    def close_input(self):
+        super().close_input()
+        self._loop.create_task(self._finish())
+
+    async def _finish(self):
+        audio_seconds = self._received / (TARGET_SAMPLE_RATE * 2)
+        await asyncio.sleep(self.backend.sample_latency(0.0))
+        try:
+            self.backend._maybe_fail()
+        except RecognitionError as e:
+            self._emit({"type": "error", "detail": str(e)})
+        else:
+            if self._received:
+                self._emit({
+                    "type": "final",
+                    "text": " ".join(self._words),
+                    "offset_ms": 0,
+                    "duration_ms": int(audio_seconds * 1000),
+                })
+        self._emit({"type": "end"})
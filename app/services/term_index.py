@@ -0,0 +1,134 @@
+# file: term_index.py
+
+'''
+Process-wide medical term index shared by the term mapper and the keyword extractor.
+Each snapshot wraps the compiled, memory-mapped lexicon (see lexicon.py). When the
+workbook or the compiled artifact changes on disk, a replacement snapshot is built
+on a background thread and swapped in with a single reference assignment, so
+requests in flight always see a complete lexicon (the old one or the new one).
+'''
+
+import os
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.services.lexicon import Lexicon, load_lexicon
+
+logger = logging.getLogger(__name__)
+
+
+class TermIndex:
+    """Immutable snapshot of the lexicon plus the bookkeeping used for hot reload"""
+    __slots__ = ("lexicon", "version", "built_at", "source_mtimes", "build_seconds")
+
+    def __init__(self, lexicon: Optional[Lexicon], version: int, source_mtimes: Tuple, build_seconds: float):
+        self.lexicon = lexicon                # Memory-mapped lexicon (None if it could not be loaded)
+        self.version = version                # Increments on every successful (re)build
+        self.built_at = datetime.now(timezone.utc)
+        self.source_mtimes = source_mtimes    # (workbook mtime, artifact mtime) the snapshot was built from
+        self.build_seconds = build_seconds    # Time spent loading (and, if stale, compiling) the lexicon
+
+
+# Current snapshot and reload bookkeeping (the snapshot reference is swapped atomically)
+_current: Optional[TermIndex] = None
+_build_lock = threading.Lock()
+_reloading = False
+_last_check = 0.0
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _source_mtimes() -> Tuple[Optional[float], Optional[float]]:
+    return _mtime(settings.MEDICAL_TERMS_PATH), _mtime(settings.LEXICON_ARTIFACT_PATH)
+
+
+# Map the compiled lexicon (recompiling it if the workbook is newer); empty index on failure
+def _build_index(version: int) -> TermIndex:
+    started = time.perf_counter()
+    try:
+        lexicon = load_lexicon(settings.MEDICAL_TERMS_PATH, settings.LEXICON_ARTIFACT_PATH)
+        mtimes = _source_mtimes()  # Taken after loading so a fresh compile is not seen as a change
+    except Exception as e:
+        logger.warning(f"Failed to load medical terms lexicon: {e}")
+        lexicon = None
+        mtimes = (None, None)  # Force a retry on the next mtime check
+    return TermIndex(lexicon, version, mtimes, time.perf_counter() - started)
+
+
+def _rebuild_in_background(previous: TermIndex):
+    global _current, _reloading
+    try:
+        index = _build_index(previous.version + 1)
+        if index.lexicon is not None or previous.lexicon is None:
+            _current = index  # Atomic swap: readers hold either the old or the new snapshot
+            logger.info(f"Medical term index reloaded (version {index.version}, {index.build_seconds:.3f}s)")
+        else:
+            logger.warning("Keeping previous medical term index; reload failed")
+    finally:
+        _reloading = False
+
+
+def get_term_index() -> TermIndex:
+    """
+    Return the current term index snapshot.
+    The first call builds it synchronously; afterwards the source files' mtimes are checked
+    at most every TERM_INDEX_RELOAD_INTERVAL_S seconds and changes trigger a background rebuild.
+    """
+    global _current, _reloading, _last_check
+    index = _current
+    if index is None:
+        with _build_lock:
+            if _current is None:
+                _current = _build_index(1)
+                _last_check = time.monotonic()
+            return _current
+
+    now = time.monotonic()
+    if now - _last_check >= settings.TERM_INDEX_RELOAD_INTERVAL_S:
+        _last_check = now
+        if _source_mtimes() != index.source_mtimes:
+            with _build_lock:
+                if not _reloading:
+                    _reloading = True
+                    threading.Thread(
+                        target=_rebuild_in_background, args=(index,),
+                        name="term-index-reload", daemon=True
+                    ).start()
+    return index
+
+
+def install_lexicon(lexicon: Lexicon) -> TermIndex:
+    """
+    Make an already-built lexicon the current snapshot (for benchmarks and offline tools).
+    Hot reload still watches the configured sources and replaces it if they change.
+    """
+    global _current, _last_check
+    with _build_lock:
+        version = _current.version + 1 if _current is not None else 1
+        _current = TermIndex(lexicon, version, _source_mtimes(), 0.0)
+        _last_check = time.monotonic()
+    return _current
+
+
+def term_index_status() -> dict:
+    """Summary of the current index snapshot for the health endpoint"""
+    index = _current
+    if index is None:
+        return {"version": None, "built_at": None, "term_count": 0, "reloading": _reloading}
+    return {
+        "version": index.version,
+        "built_at": index.built_at.isoformat(),
+        "build_seconds": round(index.build_seconds, 4),
+        "term_count": len(index.lexicon) if index.lexicon is not None else 0,
+        "artifact_path": index.lexicon.path if index.lexicon is not None else None,
+        "reloading": _reloading,
+    }
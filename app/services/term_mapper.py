@@ -1,16 +1,16 @@
 # file : term_mapper.py
 
 '''
-Loads medical terms from an Excel file and maps Azure-recognized medical entities to
-internal standardized terms with codes and confidence scores. Uses exact and fuzzy 
-matching to align Azure entities with known medical terms.
+Maps Azure-recognized medical entities to internal standardized terms with codes and
+confidence scores, using the shared compiled lexicon (see term_index.py). Uses exact
+matching first (of the text itself, or of the base term VARIATION_MAP gives for a known
+synonym or alternative phrasing), then an indexed fuzzy match (see fuzzy_index.py) for the
+remaining entities of a request, to align Azure entities with known medical terms.
 '''
 
-import pandas as pd
-from typing import List, Dict, Any
-from difflib import get_close_matches
+from typing import List, Dict, Any, Optional, Tuple
 from app.models.schemas import MappedTerm, AzureEntity
-from app.config import settings
+from app.services.term_index import get_term_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,37 +26,37 @@ AZURE_CATEGORY_MAP = {
     "Vital": "vital_sign",
 }
 
-# Load medical terms from Excel into nested dictionary by category and term
-def load_medical_terms():
-    try:
-        df = pd.read_excel('mock_data/medical_terms.xlsx')  # Load Excel file
-        terms = {}
-
-        # Organize terms by their type, normalize keys to lowercase
-        for _, row in df.iterrows():
-            type_ = row['Type'].lower()  # Ensure case consistency
-            term = row['Term'].lower()
-            if type_ not in terms:
-                terms[type_] = {}
-            terms[type_][term] = {
-                "code": row['Code'],
-                "standard_name": row['StandardName']
-            }
-        return terms
-    except Exception as e:
-        logger.warning(f"Failed to load medical terms from Excel: {e}")
-        return {}  # Return empty dict on failure
-
 # Normalize text by trimming and lowercasing
 def normalize(text: str) -> str:
     """Normalize text to lower case and remove leading/trailing spaces."""
     return text.lower().strip()
 
+# Exact lexicon entry for a normalized text, directly or through its VARIATION_MAP base term
+def lookup_exact(lexicon, entity_type: str, entity_text: str) -> Optional[int]:
+    entry_id = lexicon.lookup(entity_type, entity_text)
+    if entry_id is None:
+        base = lexicon.variations.get(entity_text)
+        if base is not None:
+            entry_id = lexicon.lookup(entity_type, normalize(base))
+    return entry_id
+
+# Resolve fuzzy matches for every unmatched entity of a request in one batch per category.
+# Returns {(category, normalized_text): matched_term or None}.
+def fuzzy_match_batch(lexicon, unmatched: Dict[str, List[str]]) -> Dict[Tuple[str, str], Optional[str]]:
+    resolved = {}
+    for entity_type, texts in unmatched.items():
+        matches = lexicon.fuzzy_index(entity_type).close_matches_batch(texts, n=3, cutoff=0.8)
+        for text, close_matches in matches.items():
+            resolved[(entity_type, text)] = close_matches[0] if close_matches else None
+    return resolved
+
 # Map Azure entities to internal MappedTerm objects using exact and fuzzy matching
 def map_terms_from_azure(entities: List[Dict[str, Any]]) -> List[MappedTerm]:
-    medical_terms = load_medical_terms()
-    mapped_terms = []
+    lexicon = get_term_index().lexicon  # Shared memory-mapped snapshot, rebuilt in the background on file change
 
+    # First pass: validate entities and resolve exact matches, collecting the rest for fuzzy matching
+    parsed = []
+    unmatched: Dict[str, List[str]] = {}
     for entity_dict in entities:
         try:
             entity = AzureEntity(**entity_dict)  # Validate and parse entity dict
@@ -66,27 +66,34 @@ def map_terms_from_azure(entities: List[Dict[str, Any]]) -> List[MappedTerm]:
 
         entity_type = AZURE_CATEGORY_MAP.get(entity.category, "other")
         entity_text = normalize(entity.text)
+        entry_id = None
+        if lexicon is not None and lexicon.has_category(entity_type):
+            # Try exact match first (including known variations of a term)
+            entry_id = lookup_exact(lexicon, entity_type, entity_text)
+            if entry_id is None:
+                logger.info(f"No exact match found for '{entity_text}' in category '{entity_type}', trying fuzzy matching.")
+                unmatched.setdefault(entity_type, []).append(entity_text)
+        parsed.append((entity, entity_type, entity_text, entry_id))
 
-        if entity_type in medical_terms:
-            type_terms = medical_terms[entity_type]
+    # Fuzzy fallback for all unmatched entities of the request at once (trigram index, difflib scoring)
+    fuzzy_matches = fuzzy_match_batch(lexicon, unmatched) if unmatched else {}
 
-            # Try exact match first
-            if entity_text in type_terms:
-                term_info = type_terms[entity_text]
+    # Second pass: build mapped terms in the original entity order
+    mapped_terms = []
+    for entity, entity_type, entity_text, entry_id in parsed:
+        if lexicon is not None and lexicon.has_category(entity_type):
+            if entry_id is not None:
+                term_info = lexicon.entry(entry_id)
                 confidence = entity.confidence_score * 0.9
             else:
-                # Try fuzzy matching as fallback
-                logger.info(f"No exact match found for '{entity_text}' in category '{entity_type}', trying fuzzy matching.")
-                close_matches = get_close_matches(entity_text, type_terms.keys(), n=3, cutoff=0.8)
-                if close_matches:
-                    matched_term = close_matches[0]
-                    term_info = type_terms[matched_term]
+                matched_term = fuzzy_matches.get((entity_type, entity_text))
+                if matched_term is not None:
+                    term_info = lexicon.entry(lexicon.lookup(entity_type, matched_term))
                     confidence = entity.confidence_score * 0.75  # Reduced confidence for fuzzy match
                     logger.info(f"Fuzzy matched '{entity_text}' to '{matched_term}' with confidence {confidence}")
                 else:
                     # No match found - fallback with default unknown code
                     logger.info(f"No close match found for '{entity_text}' in category '{entity_type}'. Using fallback.")
-                    matched_term = entity.text
                     confidence = entity.confidence_score * 0.6
                     term_info = {"code": f"UNK-{entity_type[:3].upper()}", "standard_name": entity.text.title()}
         else:
@@ -96,13 +103,13 @@ def map_terms_from_azure(entities: List[Dict[str, Any]]) -> List[MappedTerm]:
             entity_type = "other"
             confidence = entity.confidence_score * 0.5  # Lowest confidence for unknown categories
 
-        # Append mapped term to results
-        mapped_terms.append(MappedTerm(
+        # Append mapped term to results (fields are already validated/derived above, so no re-validation)
+        mapped_terms.append(MappedTerm.model_construct(
             text=entity.text,
             type=entity_type,
             code=term_info["code"],
             standard_name=term_info["standard_name"],
-            confidence=confidence
+            confidence=float(confidence)
         ))
 
     return mapped_terms
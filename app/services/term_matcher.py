@@ -0,0 +1,201 @@
+# file: term_matcher.py
+
+'''
+Compiled multi-pattern matcher used by the keyword-based entity extractor.
+Builds an Aho-Corasick automaton once from a list of lowercase terms and reports
+every occurrence of every term in a single pass over the text, applying the same
+word-boundary rule as a per-term `\\bterm\\b` regex search. The automaton lives in
+flat integer arrays so it can be saved into, and served from, the compiled lexicon.
+'''
+
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Names of the flat arrays that fully describe a compiled automaton
+ARRAY_NAMES = (
+    "edge_start", "labels", "targets", "fail", "dict_link",
+    "out_start", "outputs", "lengths", "word_flags",
+)
+
+# Bit flags recording whether a term's first/last character is a word character
+WORD_FIRST = 1
+WORD_LAST = 2
+
+# Mirror regex `\w` for a single character (letters, digits and underscore)
+def is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton over a fixed list of terms.
+    The automaton is stored in flat integer arrays (sorted edge labels per state,
+    failure links and per-state outputs) so lookups stay cheap for large lexicons.
+    """
+
+    def __init__(self, terms: Sequence[str]):
+        self.terms: List[str] = list(terms)
+
+        # Build a plain trie first: one dict of {char: child_state} per state
+        children: List[dict] = [{}]
+        own_outputs: List[List[int]] = [[]]
+        for term_id, term in enumerate(self.terms):
+            if not term:
+                continue  # Empty terms would match everywhere; skip them
+            state = 0
+            for ch in term:
+                nxt = children[state].get(ch)
+                if nxt is None:
+                    nxt = len(children)
+                    children[state][ch] = nxt
+                    children.append({})
+                    own_outputs.append([])
+                state = nxt
+            own_outputs[state].append(term_id)
+
+        # Breadth-first pass to compute failure links and output (dictionary) links
+        fail = [0] * len(children)
+        dict_link = [0] * len(children)
+        queue = deque(children[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in children[state].items():
+                queue.append(child)
+                f = fail[state]
+                while f and ch not in children[f]:
+                    f = fail[f]
+                target = children[f].get(ch, 0)
+                fail[child] = target if target != child else 0
+                dict_link[child] = fail[child] if own_outputs[fail[child]] else dict_link[fail[child]]
+
+        # Flatten the trie into CSR-style arrays
+        edge_start = [0]
+        labels: List[int] = []
+        targets: List[int] = []
+        out_start = [0]
+        outputs: List[int] = []
+        for state, edges in enumerate(children):
+            for ch in sorted(edges):
+                labels.append(ord(ch))
+                targets.append(edges[ch])
+            edge_start.append(len(labels))
+            outputs.extend(own_outputs[state])
+            out_start.append(len(outputs))
+
+        # Whether a term starts/ends with a word character decides what `\b` requires around it
+        word_flags = [
+            (WORD_FIRST if t and is_word_char(t[0]) else 0) | (WORD_LAST if t and is_word_char(t[-1]) else 0)
+            for t in self.terms
+        ]
+        self._set_arrays({
+            "edge_start": edge_start,
+            "labels": labels,
+            "targets": targets,
+            "fail": fail,
+            "dict_link": dict_link,
+            "out_start": out_start,
+            "outputs": outputs,
+            "lengths": [len(t) for t in self.terms],
+            "word_flags": word_flags,
+        })
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Sequence[int]]) -> "TermMatcher":
+        """Rebuild a matcher from arrays produced by `to_arrays` (lists, arrays or memoryviews)"""
+        matcher = cls.__new__(cls)
+        matcher.terms = []  # Term strings are owned by the caller (e.g. the lexicon string table)
+        matcher._set_arrays(arrays)
+        return matcher
+
+    def to_arrays(self) -> Dict[str, Sequence[int]]:
+        """Flat arrays describing the automaton, keyed by name (see ARRAY_NAMES)"""
+        return {name: getattr(self, "_" + name) for name in ARRAY_NAMES}
+
+    def _set_arrays(self, arrays: Dict[str, Sequence[int]]):
+        for name in ARRAY_NAMES:
+            setattr(self, "_" + name, arrays[name])
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def _goto(self, state: int, code: int) -> int:
+        """Follow the trie edge labelled `code` from `state`, or return -1 if there is none"""
+        lo, hi = self._edge_start[state], self._edge_start[state + 1]
+        i = bisect_left(self._labels, code, lo, hi)
+        if i < hi and self._labels[i] == code:
+            return self._targets[i]
+        return -1
+
+    def match_exact(self, text: str) -> List[int]:
+        """Return the indices of the terms equal to `text` (a trie walk, no scan)"""
+        state = 0
+        for ch in text:
+            state = self._goto(state, ord(ch))
+            if state < 0:
+                return []
+        return list(self._outputs[self._out_start[state]:self._out_start[state + 1]])
+
+    def scan(self, text: str, state: int = 0) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Run the automaton over `text` starting from `state` (0 = start of text).
+        Returns every raw occurrence as (term_index, end), ordered by end offset and
+        without word-boundary checks, plus the state reached at the end of `text`.
+        Passing that state back in continues the scan across appended text, so a
+        term split over two calls is still found.
+        """
+        edge_start, labels, targets = self._edge_start, self._labels, self._targets
+        fail, dict_link = self._fail, self._dict_link
+        out_start, outputs = self._out_start, self._outputs
+
+        matches: List[Tuple[int, int]] = []
+        for pos, ch in enumerate(text):
+            code = ord(ch)
+            # Follow failure links until a transition on `ch` exists (or we are back at the root)
+            while True:
+                lo, hi = edge_start[state], edge_start[state + 1]
+                i = bisect_left(labels, code, lo, hi)
+                if i < hi and labels[i] == code:
+                    state = targets[i]
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+
+            # Collect this state's outputs and every shorter suffix that is also a term
+            s = state if out_start[state] != out_start[state + 1] else dict_link[state]
+            while s:
+                for k in range(out_start[s], out_start[s + 1]):
+                    matches.append((outputs[k], pos + 1))
+                s = dict_link[s]
+        return matches, state
+
+    def term_length(self, term_id: int) -> int:
+        return self._lengths[term_id]
+
+    def is_word_bounded(self, term_id: int, word_before: bool, word_after: bool) -> bool:
+        """
+        Whether an occurrence satisfies `\\bterm\\b`, given whether the characters just
+        before and after it are word characters (False at the edges of the text).
+        """
+        flags = self._word_flags[term_id]
+        return word_before != bool(flags & WORD_FIRST) and word_after != bool(flags & WORD_LAST)
+
+    def find_all(self, text: str, word_boundary: bool = True) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield (term_index, start, end) for every occurrence of every term in `text`.
+        Matches are reported in order of their end offset; overlapping matches of
+        different terms (e.g. "x-ray" inside "chest x-ray") are all returned.
+        """
+        lengths, word_flags = self._lengths, self._word_flags
+        text_len = len(text)
+        matches, _ = self.scan(text)
+        for term_id, end in matches:
+            start = end - lengths[term_id]
+            if word_boundary:
+                before = start > 0 and is_word_char(text[start - 1])
+                after = end < text_len and is_word_char(text[end])
+                flags = word_flags[term_id]
+                if before == bool(flags & WORD_FIRST) or after == bool(flags & WORD_LAST):
+                    continue
+            yield term_id, start, end
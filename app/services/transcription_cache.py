@@ -0,0 +1,207 @@
+# file: transcription_cache.py
+
+'''
+Content-addressed cache of Azure transcription results, so a recording that is
+re-submitted (retries, double-clicks, re-processing after a lexicon change) does
+not pay for another recognition. Entries are keyed by a SHA-256 of the audio
+bytes, the recognition language and the recognizer backend that produced them
+(so e.g. scripted stub transcripts are never served in Azure mode), and live in
+two tiers: an LRU in memory and a size-bounded directory of JSON files under the
+upload directory. Only the raw transcription is cached; term mapping always runs
+against the current lexicon.
+Lookups and stores are coroutines: the memory tier is consulted inline, while disk
+reads, writes and evictions run in a worker thread so they never block the event loop.
+'''
+
+import os
+import json
+import asyncio
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Cache key for an upload: the audio content, the language it is recognized in and the backend recognizing it
+def cache_key(audio_bytes: bytes, language: str, backend: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(backend.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(language.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(audio_bytes)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Two-tier (memory LRU + disk) store of transcription results.
+    The disk tier evicts its least recently used files (by mtime, refreshed on every hit)
+    once their total size exceeds `disk_max_bytes`.
+    """
+
+    def __init__(self, memory_entries: int, disk_dir: Optional[str], disk_max_bytes: int):
+        self.memory_entries = memory_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()       # Memory tier and counters (held briefly)
+        self._disk_lock = threading.Lock()  # Disk tier files and size accounting (held in worker threads)
+        self._disk_bytes = 0
+        self.stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "memory_evictions": 0, "disk_evictions": 0, "disk_write_errors": 0,
+        }
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_entries(self):
+        # (mtime, path, size) of every cached file in the disk tier
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _remember(self, key: str, value: dict):
+        # Insert into the memory tier as most recently used, evicting the oldest entries
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def _get_memory(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return value
+
+    def _get_disk(self, key: str) -> Optional[dict]:
+        # Blocking: runs in a worker thread
+        path = self._path(key)
+        with self._disk_lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                os.utime(path)  # Refresh recency for disk-tier eviction
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError) as e:
+                logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+                return None
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Return the cached transcription result for `key`, or None on a miss"""
+        value = self._get_memory(key)
+        if value is None and self.disk_dir:
+            value = await asyncio.to_thread(self._get_disk, key)
+        if value is None:
+            with self._lock:
+                self.stats["misses"] += 1
+        return value
+
+    def _put_disk(self, key: str, value: dict):
+        # Blocking: runs in a worker thread
+        path = self._path(key)
+        with self._disk_lock:
+            try:
+                data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)  # Readers never see a half-written entry
+                self._disk_bytes += len(data) - previous
+            except OSError as e:
+                with self._lock:
+                    self.stats["disk_write_errors"] += 1
+                logger.warning(f"Failed to write cache entry {key}: {e}")
+                return
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    async def put(self, key: str, value: dict):
+        """Store a transcription result in both tiers"""
+        with self._lock:
+            self._remember(key, value)
+        if self.disk_dir:
+            await asyncio.to_thread(self._put_disk, key, value)
+
+    def _evict_disk(self):
+        # Drop least recently used files until the disk tier is back under its size bound (disk lock held)
+        entries = sorted(self._disk_entries())
+        self._disk_bytes = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            with self._lock:
+                self.stats["disk_evictions"] += 1
+
+    def status(self) -> dict:
+        """Hit/miss counters, eviction counts and tier sizes for the health endpoint"""
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "memory_entries": len(self._memory),
+                "memory_capacity": self.memory_entries,
+                "disk_bytes": self._disk_bytes,
+                "disk_capacity_bytes": self.disk_max_bytes,
+            }
+
+
+_cache: Optional[TranscriptionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_transcription_cache() -> Optional[TranscriptionCache]:
+    """Process-wide cache instance (None when caching is disabled in settings)"""
+    global _cache
+    if not settings.TRANSCRIPTION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                disk_dir = os.path.join(settings.UPLOAD_DIR, "transcription_cache") \
+                    if settings.TRANSCRIPTION_CACHE_DISK_MAX_MB > 0 else None
+                _cache = TranscriptionCache(
+                    memory_entries=settings.TRANSCRIPTION_CACHE_MEMORY_ENTRIES,
+                    disk_dir=disk_dir,
+                    disk_max_bytes=int(settings.TRANSCRIPTION_CACHE_DISK_MAX_MB * 1024 * 1024),
+                )
+    return _cache
+
+
+def transcription_cache_status() -> dict:
+    """Cache statistics for the health endpoint"""
+    cache = get_transcription_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.status()}
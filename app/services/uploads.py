@@ -0,0 +1,78 @@
+# file: uploads.py
+
+'''
+Helpers shared by the routers that accept uploads (transcription, jobs, export):
+the accepted audio MIME types, and reading an UploadFile in chunks while enforcing a
+size limit - either into memory or to a file on disk. File writes run in worker
+threads so a slow disk never stalls the event loop.
+'''
+
+import os
+import asyncio
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_CHUNK_SIZE = 256 * 1024  # Uploads are read in chunks of this size while enforcing the limit
+
+# Audio MIME types accepted by the single-file, batch and job endpoints
+SUPPORTED_MIME_TYPES = {
+    "audio/mpeg",
+    "audio/mp3",
+    "audio/wav",
+    "audio/x-wav",
+    "audio/wave",
+    "audio/webm",
+    "audio/webm;codecs=opus"
+}
+
+
+def too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File size exceeds {max_bytes // (1024 * 1024)}MB limit")
+
+
+def remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def read_upload_limited(file: UploadFile, max_bytes: int) -> bytes:
+    """
+    Read a spooled upload in chunks, rejecting it with 413 once it exceeds `max_bytes`.
+    The request body itself is bounded earlier, by its Content-Length (see main.reject_oversized_uploads).
+    """
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise too_large(max_bytes)
+    return bytes(buffer)
+
+
+async def save_upload(file: UploadFile, path: str, max_bytes: int) -> int:
+    """
+    Stream an upload to `path` in chunks, rejecting it with 413 once it exceeds `max_bytes`.
+    The file only appears at `path` once it is complete; returns the number of bytes written.
+    """
+    written = 0
+    tmp_path = f"{path}.part"
+    try:
+        out = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise too_large(max_bytes)
+                await asyncio.to_thread(out.write, chunk)
+        finally:
+            await asyncio.to_thread(out.close)
+        await asyncio.to_thread(os.replace, tmp_path, path)
+    finally:
+        await asyncio.to_thread(remove_if_exists, tmp_path)
+    return written
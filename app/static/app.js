@@ -4,6 +4,7 @@
 Handles audio recording and file upload for transcription. 
 Enables live recording via MediaRecorder API with start/stop controls,
 uploads audio files, sends audio data to backend API for transcription,
+streams microphone audio over a WebSocket for interim/final results while speaking,
 and displays transcribed text and structured data with user-friendly status updates.
 */
 
@@ -196,6 +197,138 @@ function stopRecording() {
   }
 } 
 
+// ---------------- Streaming dictation over WebSocket ----------------
+
+// Streaming state: socket, audio graph and the phrases finalized so far
+const STREAM_SAMPLE_RATE = 16000;
+const streamStartBtn = document.getElementById('streamStartBtn');
+const streamStopBtn = document.getElementById('streamStopBtn');
+let streamSocket = null;
+let streamAudioContext = null;
+let streamProcessor = null;
+let streamMicStream = null;
+let streamFinalPhrases = [];
+let streamStructuredData = [];
+
+// Downsample Float32 audio to 16 kHz and convert it to 16-bit PCM for the recognizer
+function toPcm16(input, inputRate) {
+  const ratio = inputRate / STREAM_SAMPLE_RATE;
+  const length = Math.floor(input.length / ratio);
+  const output = new Int16Array(length);
+  for (let i = 0; i < length; i++) {
+    // Average the input samples that fall into this output sample (simple low-pass)
+    const start = Math.floor(i * ratio);
+    const end = Math.min(Math.floor((i + 1) * ratio), input.length);
+    let sum = 0;
+    for (let j = start; j < end; j++) sum += input[j];
+    const sample = Math.max(-1, Math.min(1, sum / Math.max(1, end - start)));
+    output[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+  }
+  return output;
+}
+
+// Render finalized phrases, the current interim hypothesis and structured data
+function renderStream(interimText) {
+  const finalText = streamFinalPhrases.join(' ');
+  jsonOutput.innerHTML = `
+    <p><strong>Transcription:</strong> ${finalText} <em>${interimText || ''}</em></p>
+    <p><strong>Structured Data:</strong> ${JSON.stringify(streamStructuredData, null, 2)}</p>
+  `;
+}
+
+// Release the microphone and audio graph used for streaming
+function teardownStreamAudio() {
+  if (streamProcessor) streamProcessor.disconnect();
+  if (streamMicStream) streamMicStream.getTracks().forEach(track => track.stop());
+  if (streamAudioContext) streamAudioContext.close();
+  streamProcessor = null;
+  streamMicStream = null;
+  streamAudioContext = null;
+  streamStartBtn.disabled = false;
+  streamStopBtn.disabled = true;
+}
+
+// Start streaming microphone audio to /api/transcribe/stream
+async function startStreaming() {
+  try {
+    streamFinalPhrases = [];
+    streamStructuredData = [];
+    jsonOutput.textContent = '';
+    statusText.textContent = 'Connecting...';
+    statusText.className = 'processing';
+
+    streamMicStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    streamSocket = new WebSocket(`${wsProtocol}//${window.location.host}/api/transcribe/stream?language=en-US`);
+    streamSocket.binaryType = 'arraybuffer';
+
+    streamSocket.onopen = () => {
+      // Capture raw samples from the microphone and send them as 16 kHz PCM frames
+      streamAudioContext = new AudioContext();
+      const source = streamAudioContext.createMediaStreamSource(streamMicStream);
+      streamProcessor = streamAudioContext.createScriptProcessor(4096, 1, 1);
+      streamProcessor.onaudioprocess = (e) => {
+        if (streamSocket && streamSocket.readyState === WebSocket.OPEN) {
+          const pcm = toPcm16(e.inputBuffer.getChannelData(0), streamAudioContext.sampleRate);
+          streamSocket.send(pcm.buffer);
+        }
+      };
+      source.connect(streamProcessor);
+      streamProcessor.connect(streamAudioContext.destination);
+
+      statusText.textContent = 'Streaming... results appear as you speak';
+      statusText.className = 'recording';
+      streamStartBtn.disabled = true;
+      streamStopBtn.disabled = false;
+    };
+
+    streamSocket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'partial') {
+        renderStream(message.text);
+      } else if (message.type === 'final') {
+        streamFinalPhrases.push(message.text);
+        streamStructuredData = streamStructuredData.concat(message.structured_data || []);
+        renderStream('');
+      } else if (message.type === 'done') {
+        statusText.textContent = 'Transcription completed successfully!';
+        statusText.className = 'success';
+      } else if (message.type === 'error') {
+        statusText.textContent = `Error: ${message.detail}`;
+        statusText.className = 'error';
+      }
+    };
+
+    streamSocket.onerror = () => {
+      statusText.textContent = 'Streaming connection error.';
+      statusText.className = 'error';
+    };
+
+    streamSocket.onclose = () => {
+      teardownStreamAudio();
+      streamSocket = null;
+    };
+  } catch (err) {
+    console.error("Error starting streaming:", err);
+    statusText.textContent = 'Error accessing microphone. Please check your device and permissions.';
+    statusText.className = 'error';
+    teardownStreamAudio();
+  }
+}
+
+// Stop sending audio; the server finishes recognizing and then closes the socket
+function stopStreaming() {
+  teardownStreamAudio();
+  if (streamSocket && streamSocket.readyState === WebSocket.OPEN) {
+    streamSocket.send('stop');
+    statusText.textContent = 'Finishing transcription...';
+    statusText.className = 'processing';
+  }
+}
+
+window.startStreaming = startStreaming;
+window.stopStreaming = stopStreaming;
+
 // Keyboard shortcuts: spacebar toggles start/stop recording when focused on body
 window.startRecording = startRecording;
 window.stopRecording = stopRecording;
@@ -0,0 +1,22 @@
+# file: conftest.py
+
+'''
+Shared pytest setup. Settings are read when app modules are imported, so the required
+ones get test values here first: a dummy Azure key, the offline stub recognizer, and a
+throwaway upload directory so runtime files never land in the tree.
+
+    python -m pytest -q
+'''
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("AZURE_SPEECH_KEY", "test-key")
+os.environ.setdefault("RECOGNIZER_BACKEND", "stub")
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="dictation-tests-"))
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(os.environ["UPLOAD_DIR"], "jobs.sqlite3"))
@@ -0,0 +1,174 @@
+# file: test_admission.py
+
+'''
+Tests for AdmissionController: slot and byte limits, priority order of the wait queue,
+displacement of lower-priority waiters when the queue is full, 429/503 refusals with
+Retry-After, and clean-up of waiters that time out or are cancelled.
+'''
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.admission import AdmissionController, parse_priority
+
+
+def controller(max_concurrent=1, max_bytes=1000, queue_size=4, max_wait_s=5.0) -> AdmissionController:
+    return AdmissionController(max_concurrent, max_bytes, queue_size, max_wait_s)
+
+
+# Enter admission, record the order of admission in `log`, then hold the slot until `release` is set
+async def hold(admission: AdmissionController, name: str, nbytes: int, priority: str,
+               log: list, release: asyncio.Event):
+    async with admission.admit(nbytes, priority):
+        log.append(name)
+        await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_parse_priority():
+    assert parse_priority(None) == settings.ADMISSION_DEFAULT_PRIORITY
+    assert parse_priority(" STAT ") == "stat"
+    with pytest.raises(HTTPException) as refused:
+        parse_priority("asap")
+    assert refused.value.status_code == 400
+
+
+def test_admits_within_limits_and_releases():
+    admission = controller(max_concurrent=2)
+
+    async def run():
+        async with admission.admit(300, "routine"):
+            async with admission.admit(200, "routine"):
+                status = admission.status()
+                assert (status["active"], status["inflight_bytes"]) == (2, 500)
+        status = admission.status()
+        assert (status["active"], status["inflight_bytes"]) == (0, 0)
+        assert status["outcomes"]["routine"] == {"admitted": 2}
+
+    asyncio.run(run())
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    admission = controller()
+
+    async def run():
+        log, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(admission, "first", 1, "routine", log, release))]
+        await settle()
+        for name, priority in [("routine-1", "routine"), ("urgent", "urgent"), ("routine-2", "routine"), ("stat", "stat")]:
+            tasks.append(asyncio.create_task(hold(admission, name, 1, priority, log, release)))
+            await settle()
+        assert admission.status()["queued_by_priority"] == {"stat": 1, "urgent": 1, "routine": 2}
+        release.set()
+        await asyncio.gather(*tasks)
+        return log
+
+    assert asyncio.run(run()) == ["first", "stat", "urgent", "routine-1", "routine-2"]
+
+
+def test_full_queue_displaces_newest_lower_priority_waiter():
+    admission = controller(queue_size=2)
+
+    async def run():
+        log, release = [], asyncio.Event()
+        holder = asyncio.create_task(hold(admission, "holder", 1, "routine", log, release))
+        await settle()
+        older = asyncio.create_task(hold(admission, "older", 1, "routine", log, release))
+        await settle()
+        newer = asyncio.create_task(hold(admission, "newer", 1, "routine", log, release))
+        await settle()
+        stat = asyncio.create_task(hold(admission, "stat", 1, "stat", log, release))
+        await settle()
+        with pytest.raises(HTTPException) as displaced:
+            await newer
+        assert displaced.value.status_code == 503 and "Retry-After" in displaced.value.headers
+        release.set()
+        await asyncio.gather(holder, older, stat)
+        return log
+
+    assert asyncio.run(run()) == ["holder", "stat", "older"]
+    assert admission.status()["outcomes"]["routine"]["displaced"] == 1
+
+
+def test_full_queue_without_lower_priority_refuses_with_429():
+    admission = controller(queue_size=1)
+
+    async def run():
+        log, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(admission, name, 1, "stat", log, release)) for name in ("a", "b")]
+        await settle()
+        with pytest.raises(HTTPException) as refused:
+            async with admission.admit(1, "routine"):
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return refused.value
+
+    refused = asyncio.run(run())
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
+
+
+def test_wait_times_out_with_503_and_leaves_the_queue():
+    admission = controller(max_wait_s=0.05)
+
+    async def run():
+        log, release = [], asyncio.Event()
+        holder = asyncio.create_task(hold(admission, "holder", 1, "routine", log, release))
+        await settle()
+        with pytest.raises(HTTPException) as refused:
+            async with admission.admit(1, "urgent"):
+                pass
+        assert admission.status()["queued"] == 0
+        release.set()
+        await holder
+        return refused.value
+
+    assert asyncio.run(run()).status_code == 503
+    assert admission.status()["outcomes"]["urgent"] == {"timeout": 1}
+
+
+def test_byte_budget_limits_concurrency_and_caps_huge_requests():
+    admission = controller(max_concurrent=10, max_bytes=100)
+
+    async def run():
+        log, release = [], asyncio.Event()
+        first = asyncio.create_task(hold(admission, "60a", 60, "routine", log, release))
+        second = asyncio.create_task(hold(admission, "60b", 60, "routine", log, release))
+        await settle()
+        assert log == ["60a"] and admission.status()["queued"] == 1
+        release.set()
+        await asyncio.gather(first, second)
+        # Larger than the whole budget: charged the budget, so it runs, but alone
+        async with admission.admit(10_000, "routine"):
+            assert admission.status()["inflight_bytes"] == 100
+        return log
+
+    assert asyncio.run(run()) == ["60a", "60b"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    admission = controller()
+
+    async def run():
+        log, release = [], asyncio.Event()
+        holder = asyncio.create_task(hold(admission, "holder", 1, "routine", log, release))
+        await settle()
+        waiter = asyncio.create_task(hold(admission, "waiter", 1, "routine", log, release))
+        await settle()
+        waiter.cancel()
+        await settle()
+        assert admission.status()["queued"] == 0
+        release.set()
+        await holder
+        return log
+
+    assert asyncio.run(run()) == ["holder"]
+    assert admission.status()["active"] == 0
@@ -0,0 +1,120 @@
+# file: test_audio_convert.py
+
+'''
+Tests for upload decoding: container formats are detected from magic bytes, 16-bit PCM
+WAV (any rate or channel count) is decoded in memory without ffmpeg, other WAV encodings
+and formats go to ffmpeg, and an ffmpeg that cannot be started is a server error (500)
+counted as a failed conversion, never as a completed one.
+'''
+
+import io
+import wave
+import struct
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.services import audio_convert
+from app.services.audio_convert import conversion_stats, decode_audio, detect_audio_format, wav_pcm_format
+
+
+def wav_bytes(samples: np.ndarray, rate: int = 16000, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def float_wav_bytes(rate: int = 16000) -> bytes:
+    # IEEE float (format 3), 32-bit: valid WAV that NumPy passthrough must not accept
+    data = np.zeros(160, dtype="<f4").tobytes()
+    fmt = struct.pack("<HHIIHH", 3, 1, rate, rate * 4, 4, 32)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"RIFF\x24\x00\x00\x00WAVEfmt ", "wav"),
+    (b"\x1a\x45\xdf\xa3\x01\x00\x00\x00", "webm"),
+    (b"OggS\x00\x02\x00\x00", "ogg"),
+    (b"fLaC\x00\x00\x00\x22", "flac"),
+    (b"\x00\x00\x00\x20ftypM4A ", "mp4"),
+    (b"ID3\x04\x00\x00\x00\x00", "mp3"),
+    (b"\xff\xfb\x90\x64\x00\x00", "mp3"),
+    (b"%PDF-1.4", "unknown"),
+    (b"", "unknown"),
+])
+def test_format_is_detected_from_magic_bytes(head, expected):
+    assert detect_audio_format(head) == expected
+
+
+def test_wav_pcm_format():
+    assert wav_pcm_format(wav_bytes(np.zeros(10), 44100, 2)) == (44100, 2)
+    assert wav_pcm_format(float_wav_bytes()) is None
+    assert wav_pcm_format(b"RIFF\x04\x00\x00\x00WAVE") is None
+
+
+def test_pcm_wav_skips_ffmpeg(monkeypatch):
+    async def no_ffmpeg(*args, **kwargs):
+        raise AssertionError("ffmpeg must not be started for 16-bit PCM WAV")
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", no_ffmpeg)
+
+    stereo = np.stack([np.full(4410, 1000), np.full(4410, 3000)], axis=1)
+    before = conversion_stats()["passthrough"]
+    samples, rate, audio_format = asyncio.run(decode_audio(wav_bytes(stereo, 44100, 2)))
+    assert (rate, audio_format) == (44100, "wav")
+    assert len(samples) == 4410 and int(samples[0]) == 2000  # Downmixed to mono
+    assert conversion_stats()["passthrough"] == before + 1
+
+
+def missing_ffmpeg(monkeypatch):
+    async def spawn(*args, **kwargs):
+        raise FileNotFoundError(2, "No such file or directory", "ffmpeg")
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", spawn)
+    monkeypatch.setattr(audio_convert, "_ffmpeg_slots", None)  # Each asyncio.run() has its own loop
+
+
+@pytest.mark.parametrize("payload", [float_wav_bytes(), b"OggS\x00\x02" + bytes(64)])
+def test_other_audio_goes_to_ffmpeg(monkeypatch, payload):
+    missing_ffmpeg(monkeypatch)
+    before = conversion_stats()["passthrough"]
+    with pytest.raises(HTTPException):
+        asyncio.run(decode_audio(payload))
+    assert conversion_stats()["passthrough"] == before
+
+
+def test_missing_ffmpeg_is_a_server_error(monkeypatch):
+    missing_ffmpeg(monkeypatch)
+    before = conversion_stats()
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(decode_audio(b"OggS\x00\x02" + bytes(64)))
+    assert raised.value.status_code == 500
+    after = conversion_stats()
+    assert after["failed"] == before["failed"] + 1
+    assert after["completed"] == before["completed"]
+    assert after["active"] == 0 and after["waiting"] == 0
+
+
+def test_undecodable_input_is_a_client_error(monkeypatch):
+    class FailedProcess:
+        returncode = 1
+
+        async def communicate(self, data):
+            return b"", b"Invalid data found when processing input"
+
+    async def spawn(*args, **kwargs):
+        return FailedProcess()
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", spawn)
+    monkeypatch.setattr(audio_convert, "_ffmpeg_slots", None)
+    before = conversion_stats()
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(decode_audio(b"\xff\xfb" + bytes(64)))
+    assert raised.value.status_code == 400
+    after = conversion_stats()
+    assert after["failed"] == before["failed"] + 1
+    assert after["completed"] == before["completed"]
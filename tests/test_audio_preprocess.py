@@ -0,0 +1,110 @@
+# file: test_audio_preprocess.py
+
+'''
+Tests for audio pre-processing on synthetic audio: resampling keeps tones in band and
+removes those above the new Nyquist frequency, the voice activity detector trims edge
+silence and long pauses down to their padding, and offsets on the trimmed audio map back
+to the original timeline exactly (including at region boundaries). All-silent audio is
+sent untrimmed.
+'''
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.audio_preprocess import preprocess_audio, resample, voice_regions
+
+RATE = 16000
+FRAME = RATE * 20 // 1000  # VAD analysis frame in samples
+
+
+def tone(seconds: float, rate: int = RATE, frequency: float = 440.0, amplitude: float = 8000.0) -> np.ndarray:
+    t = np.arange(int(round(seconds * rate))) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def silence(seconds: float, rate: int = RATE) -> np.ndarray:
+    return np.zeros(int(round(seconds * rate)), dtype=np.int16)
+
+
+def dominant_frequency(samples: np.ndarray, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(samples.astype(np.float64)))
+    return float(np.fft.rfftfreq(len(samples), 1 / rate)[np.argmax(spectrum)])
+
+
+# 1 s silence | 1 s tone | 2 s pause | 0.5 s tone | 1 s silence  (5.5 s)
+RECORDING = np.concatenate([silence(1.0), tone(1.0), silence(2.0), tone(0.5), silence(1.0)])
+
+
+@pytest.fixture
+def trim_settings(monkeypatch):
+    monkeypatch.setattr(settings, "PREPROCESS_TRIM_SILENCE", True)
+    monkeypatch.setattr(settings, "PREPROCESS_EDGE_PAD_S", 0.2)   # 10 frames
+    monkeypatch.setattr(settings, "PREPROCESS_MAX_PAUSE_S", 0.8)  # 20 frames kept on each side of a pause
+
+
+def test_resample_keeps_length_and_pitch():
+    for rate in (8000, 22050, 44100, 48000):
+        resampled = resample(tone(1.0, rate), rate)
+        assert len(resampled) == RATE
+        assert abs(dominant_frequency(resampled, RATE) - 440.0) <= 1.0
+    same = tone(0.1)
+    assert resample(same, RATE) is same
+
+
+def test_downsampling_filters_out_tones_above_the_new_nyquist():
+    kept = resample(tone(1.0, 48000, frequency=1000.0), 48000)
+    removed = resample(tone(1.0, 48000, frequency=12000.0), 48000)  # Would alias to 4 kHz
+    rms = lambda samples: float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+    assert rms(kept) > 5000
+    assert rms(removed) < 100
+
+
+def test_voice_regions_trim_edges_and_long_pauses():
+    regions = voice_regions(RECORDING, RATE, edge_pad_s=0.2, max_pause_s=0.8)
+    assert regions.tolist() == [
+        [40 * FRAME, 120 * FRAME],    # 0.2 s before the first tone, 0.4 s of the pause after it
+        [180 * FRAME, 235 * FRAME],   # 0.4 s of the pause before the second tone, 0.2 s after it
+    ]
+
+
+def test_short_pauses_are_kept_whole():
+    audio = np.concatenate([tone(0.5), silence(0.6), tone(0.5)])
+    assert voice_regions(audio, RATE, edge_pad_s=0.2, max_pause_s=0.8).tolist() == [[0, len(audio)]]
+
+
+def test_all_silent_audio_keeps_nothing():
+    assert voice_regions(silence(2.0), RATE, 0.2, 0.8).shape == (0, 2)
+
+
+def test_trimmed_offsets_map_back_to_the_original(trim_settings):
+    processed = preprocess_audio(RECORDING, RATE)
+    assert processed.sample_rate == RATE
+    assert processed.kept.tolist() == [[0, 40 * FRAME, 80 * FRAME], [80 * FRAME, 180 * FRAME, 55 * FRAME]]
+    assert len(processed.samples) == 135 * FRAME
+    assert processed.removed_seconds == pytest.approx(5.5 - 2.7)
+    assert np.array_equal(processed.samples[:80 * FRAME], RECORDING[40 * FRAME:120 * FRAME])
+
+    assert processed.to_original_ms(0) == 800         # Start of the kept edge padding
+    assert processed.to_original_ms(200) == 1000      # Onset of the first tone
+    assert processed.to_original_ms(1599) == 2399     # Last instant of the first region
+    assert processed.to_original_ms(1600) == 3600     # First instant of the second region
+    assert processed.to_original_ms(2000) == 4000     # Onset of the second tone
+    assert processed.to_original_ms(2700) == 4700     # End of the trimmed audio
+
+
+def test_resampled_recording_maps_back_in_milliseconds(trim_settings):
+    recording = np.concatenate([silence(1.0, 44100), tone(1.0, 44100), silence(1.0, 44100)])
+    processed = preprocess_audio(recording, 44100)
+    assert processed.sample_rate == RATE
+    assert processed.original_seconds == pytest.approx(3.0)
+    # The tone starts 0.2 s into the trimmed audio (the edge padding), i.e. 1 s into the original
+    assert abs(processed.to_original_ms(200) - 1000) <= 20
+
+
+def test_all_silent_audio_is_sent_untrimmed(trim_settings):
+    audio = silence(1.5)
+    processed = preprocess_audio(audio, RATE)
+    assert len(processed.samples) == len(audio)
+    assert processed.removed_seconds == 0.0
+    assert processed.to_original_ms(700) == 700
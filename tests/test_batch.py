@@ -0,0 +1,118 @@
+# file: test_batch.py
+
+'''
+Tests for the batch endpoint against the stub recognizer: the response is NDJSON with one
+line per item (in completion order, tagged with its index and filename) and a closing
+summary line; unusable files and archive members become per-item error lines instead of
+failing the batch; and the spooled uploads are removed once the stream has ended.
+'''
+
+import io
+import os
+import wave
+import zipfile
+
+import numpy as np
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.routers import transcription
+
+
+def wav_bytes(seconds: float = 0.5, rate: int = 16000) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (8000 * np.sin(2 * np.pi * 440 * t)).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def zip_bytes(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def batch_spools() -> list:
+    return [name for name in os.listdir(settings.UPLOAD_DIR) if name.startswith("batch-")]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def post_batch(client, files):
+    response = client.post("/api/transcribe/batch", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text.endswith("\n")
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]["summary"]
+
+
+def test_every_item_gets_one_line_then_a_summary(client):
+    results, summary = post_batch(client, [
+        ("files", ("a.wav", wav_bytes(), "audio/wav")),
+        ("files", ("b.wav", wav_bytes(0.3), "audio/wav")),
+        ("files", ("c.wav", wav_bytes(0.7), "audio/wav")),
+    ])
+    assert sorted((r["index"], r["filename"]) for r in results) == [(0, "a.wav"), (1, "b.wav"), (2, "c.wav")]
+    assert all(r["status"] == "ok" and "transcription" in r for r in results)
+    assert summary["total"] == 3 and summary["succeeded"] == 3 and summary["failed"] == 0
+    assert summary["elapsed_seconds"] >= 0
+
+
+def test_bad_files_become_error_lines(client):
+    archive = zip_bytes({"inner/one.wav": wav_bytes(), "notes.txt": b"not audio", "__MACOSX/._one.wav": b"x"})
+    results, summary = post_batch(client, [
+        ("files", ("good.wav", wav_bytes(), "audio/wav")),
+        ("files", ("notes.pdf", b"%PDF-1.4", "application/pdf")),
+        ("files", ("broken.zip", b"PK\x03\x04 truncated", "application/zip")),
+        ("files", ("recordings.zip", archive, "application/zip")),
+    ])
+    by_name = {r["filename"]: r for r in results}
+    assert set(by_name) == {"good.wav", "notes.pdf", "broken.zip", "recordings.zip/inner/one.wav",
+                            "recordings.zip/notes.txt"}
+    assert by_name["good.wav"]["status"] == "ok"
+    assert by_name["recordings.zip/inner/one.wav"]["status"] == "ok"
+    for name, detail in (("notes.pdf", "Only MP3, WAV, and WEBM files are supported"),
+                         ("broken.zip", "Invalid zip archive"),
+                         ("recordings.zip/notes.txt", "Unsupported audio format")):
+        assert by_name[name]["status"] == "error"
+        assert by_name[name]["status_code"] == 400
+        assert by_name[name]["detail"] == detail
+    assert summary == {**summary, "total": 5, "succeeded": 2, "failed": 3}
+
+
+def test_oversized_file_is_rejected_per_item(client, monkeypatch):
+    monkeypatch.setattr(transcription, "MAX_FILE_SIZE_MB", 0)
+    results, summary = post_batch(client, [("files", ("big.wav", wav_bytes(), "audio/wav"))])
+    assert results[0]["status_code"] == 413
+    assert summary["failed"] == 1
+
+
+def test_empty_batch_is_rejected(client):
+    files = [("files", ("empty.zip", zip_bytes({}), "application/zip"))]
+    response = client.post("/api/transcribe/batch", files=files)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No audio files in batch"
+    assert batch_spools() == []
+
+
+def test_spooled_uploads_are_removed(client):
+    post_batch(client, [
+        ("files", ("a.wav", wav_bytes(), "audio/wav")),
+        ("files", ("recordings.zip", zip_bytes({"one.wav": wav_bytes()}), "application/zip")),
+    ])
+    assert batch_spools() == []
@@ -0,0 +1,107 @@
+# file: test_entity_extractor.py
+
+'''
+Tests for ExtractorSession, the incremental keyword extractor: however a transcript is
+split into appended pieces, the session reports the same spans as one pass over the
+whole text, and an occurrence at the current end of text waits for the next character.
+'''
+
+import random
+
+import pytest
+
+from app.services.entity_extractor import ExtractorSession
+from app.services.lexicon import Lexicon, write_lexicon_artifact
+
+
+ENTRIES = {
+    ("procedure", "mri"): ("RAD002", "MRI"),
+    ("procedure", "x-ray"): ("RAD001", "X-Ray"),
+    ("procedure", "chest x-ray"): ("RAD003", "Chest X-Ray"),
+    ("diagnosis", "asthma"): ("DX001", "Asthma"),
+    ("lab_test", "blood sugar"): ("LAB001", "Blood Sugar"),
+    ("symptom", "cough"): ("SYM001", "Cough"),  # Not an extractor category
+}
+
+TRANSCRIPT = "Chest X-ray shows asthma; MRI normal, blood sugar high. MRIs later, cough, x-ray."
+
+
+@pytest.fixture(scope="module")
+def lexicon(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("lexicon") / "terms.lex")
+    write_lexicon_artifact(ENTRIES, path)
+    return Lexicon(path)
+
+
+# {term: [(start, end), ...]} of every entity span reported
+def spans(entities):
+    found = {}
+    for entity in entities:
+        found.setdefault(entity.text, []).extend((span.start, span.end) for span in entity.spans)
+    return {term: sorted(positions) for term, positions in found.items()}
+
+
+def run_session(lexicon, pieces):
+    session = ExtractorSession(lexicon)
+    reported = []
+    for piece in pieces:
+        reported += session.append(piece)
+    reported += session.close()
+    return session, reported
+
+
+def test_whole_transcript(lexicon):
+    session, reported = run_session(lexicon, [TRANSCRIPT])
+    expected = {
+        "chest x-ray": [(0, 11)],
+        "x-ray": [(6, 11), (75, 80)],
+        "asthma": [(18, 24)],
+        "mri": [(26, 29)],
+        "blood sugar": [(38, 49)],
+    }
+    assert spans(session.entities()) == expected
+    assert spans(reported) == expected
+    assert session.text == TRANSCRIPT.lower()
+
+
+def test_every_two_way_split_matches_one_pass(lexicon):
+    whole, _ = run_session(lexicon, [TRANSCRIPT])
+    expected = spans(whole.entities())
+    for split in range(1, len(TRANSCRIPT)):
+        session, reported = run_session(lexicon, [TRANSCRIPT[:split], TRANSCRIPT[split:]])
+        assert spans(session.entities()) == expected, split
+        assert spans(reported) == expected, split
+
+
+def test_random_chunking_matches_one_pass(lexicon):
+    whole, _ = run_session(lexicon, [TRANSCRIPT])
+    expected = spans(whole.entities())
+    rng = random.Random(5)
+    for _ in range(100):
+        cuts = sorted(rng.sample(range(1, len(TRANSCRIPT)), rng.randint(1, 12)))
+        pieces = [TRANSCRIPT[a:b] for a, b in zip([0] + cuts, cuts + [len(TRANSCRIPT)])]
+        session, _ = run_session(lexicon, pieces)
+        assert spans(session.entities()) == expected, pieces
+
+
+def test_match_at_end_of_text_waits_for_next_character(lexicon):
+    session = ExtractorSession(lexicon)
+    assert session.append("ordered an mri") == []
+    assert session.append("s") == []  # "mris" is not the word "mri"
+    assert session.append(" and an mri") == []
+    assert [entity.text for entity in session.append(" today")] == ["mri"]
+    assert session.close() == []
+
+
+def test_close_reports_pending_match(lexicon):
+    session = ExtractorSession(lexicon)
+    session.append("history of ast")
+    assert session.append("hma") == []
+    assert [entity.text for entity in session.close()] == ["asthma"]
+
+
+def test_closed_session_rejects_text(lexicon):
+    session = ExtractorSession(lexicon)
+    session.close()
+    with pytest.raises(RuntimeError):
+        session.append("mri")
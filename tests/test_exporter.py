@@ -0,0 +1,118 @@
+# file: test_exporter.py
+
+'''
+Tests for the bulk exporter: results files are read as NDJSON (batch output, skipping
+failed items and the summary), a JSON array decoded record by record, or a single
+response; the rows come back intact from CSV, Parquet and XLSX output; and the export
+endpoint refuses a file whose first record is not JSON with a 400.
+'''
+
+import io
+import csv
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import exporter
+from app.services.exporter import EXPORT_COLUMNS, open_records, read_records, rows_from_records, stream_export
+
+
+def response(*terms):
+    return {"transcription": "patient needs an mri", "structured_data": [
+        {"text": text, "type": "procedure", "code": code, "standard_name": text.upper(), "confidence": 0.9}
+        for text, code in terms
+    ]}
+
+
+BATCH_LINES = [
+    {"index": 1, "filename": "b.wav", "status": "ok", **response(("ct", "RAD001"))},
+    {"index": 0, "filename": "a.wav", "status": "error", "status_code": 400, "detail": "Unsupported audio format"},
+    {"index": 2, "filename": "c.wav", "status": "ok", **response(("mri", "RAD002"), ("x-ray", "RAD003"))},
+    {"summary": {"total": 3, "succeeded": 2, "failed": 1}},
+]
+EXPECTED_ROWS = [
+    ("b.wav", 0, "ct", "procedure", "RAD001", "CT", 0.9),
+    ("c.wav", 0, "mri", "procedure", "RAD002", "MRI", 0.9),
+    ("c.wav", 1, "x-ray", "procedure", "RAD003", "X-RAY", 0.9),
+]
+
+
+def export_bytes(export_format: str) -> bytes:
+    return b"".join(stream_export(rows_from_records(BATCH_LINES, "batch"), export_format))
+
+
+def test_ndjson_skips_errors_and_summary():
+    ndjson = b"".join(json.dumps(line).encode() + b"\n\n" for line in BATCH_LINES)
+    rows = list(rows_from_records(read_records(io.BytesIO(ndjson)), "batch"))
+    assert rows == EXPECTED_ROWS
+
+
+def test_pretty_printed_array_is_read_record_by_record(monkeypatch):
+    monkeypatch.setattr(exporter, "FILE_CHUNK_BYTES", 7)  # Records span many reads
+    document = json.dumps([response(("mri", "RAD002")), {"job_id": "j1", "result": response(("ct", "RAD001"))}],
+                          indent=2).encode()
+    records = list(read_records(io.BytesIO(document)))
+    assert len(records) == 2
+    assert [row[:3] for row in rows_from_records(records, "upload")] == [("upload#0", 0, "mri"), ("j1", 0, "ct")]
+
+
+def test_single_response_document():
+    document = json.dumps(response(("mri", "RAD002")), indent=2).encode()
+    assert list(read_records(io.BytesIO(document))) == [response(("mri", "RAD002"))]
+    assert list(read_records(io.BytesIO(b"\n  \n"))) == []
+
+
+def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        list(read_records(io.BytesIO(b'[\n  {"structured_data": []},\n  {"structured')))
+
+
+def test_csv_export():
+    rows = list(csv.reader(io.StringIO(export_bytes("csv").decode("utf-8"))))
+    assert tuple(rows[0]) == EXPORT_COLUMNS
+    assert rows[1:] == [[str(value) for value in row] for row in EXPECTED_ROWS]
+
+
+def test_parquet_export():
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(export_bytes("parquet")))
+    assert tuple(table.column_names) == EXPORT_COLUMNS
+    assert [tuple(row.values()) for row in table.to_pylist()] == EXPECTED_ROWS
+
+
+def test_xlsx_export():
+    from openpyxl import load_workbook
+    sheet = load_workbook(io.BytesIO(export_bytes("xlsx")), read_only=True)["structured_data"]
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0] == EXPORT_COLUMNS
+    assert rows[1:] == EXPECTED_ROWS
+
+
+def test_unknown_format_is_refused():
+    with pytest.raises(ValueError):
+        list(stream_export(iter(EXPECTED_ROWS), "ods"))
+
+
+def test_open_records_checks_the_first_record(tmp_path):
+    path = tmp_path / "results.ndjson"
+    path.write_bytes(b"not json at all\n")
+    with pytest.raises(ValueError):
+        open_records(str(path))
+    path.write_bytes(b"".join(json.dumps(line).encode() + b"\n" for line in BATCH_LINES))
+    assert list(open_records(str(path))) == BATCH_LINES
+
+
+def test_export_endpoint():
+    ndjson = b"".join(json.dumps(line).encode() + b"\n" for line in BATCH_LINES)
+    with TestClient(app) as client:
+        exported = client.post("/api/export", files={"file": ("batch run.ndjson", ndjson)}, data={"format": "csv"})
+        refused = client.post("/api/export", files={"file": ("notes.txt", b"not json\n")}, data={"format": "csv"})
+        unknown = client.post("/api/export", files={"file": ("batch.ndjson", ndjson)}, data={"format": "ods"})
+    assert exported.status_code == 200
+    assert exported.headers["content-disposition"] == 'attachment; filename="batch_run_export.csv"'
+    assert len(list(csv.reader(io.StringIO(exported.text)))) == 1 + len(EXPECTED_ROWS)
+    assert refused.status_code == 400
+    assert refused.json()["detail"].startswith("Results file is not valid JSON or NDJSON")
+    assert unknown.status_code == 400
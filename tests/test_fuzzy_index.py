@@ -0,0 +1,80 @@
+# file: test_fuzzy_index.py
+
+'''
+Tests for FuzzyIndex: with an uncapped candidate list it returns exactly what
+difflib.get_close_matches returns over the terms sharing a trigram with the query; the
+default cap keeps every candidate tied with the last one admitted, and candidates outside
+the reachable length band are never scored.
+'''
+
+import random
+import difflib
+
+from app.services.fuzzy_index import FuzzyIndex, trigrams
+
+
+def random_terms(seed: int, count: int):
+    rng = random.Random(seed)
+    return sorted({"".join(rng.choice("abcdefgh ") for _ in range(rng.randint(3, 14))).strip()
+                   for _ in range(count)} - {""})
+
+
+def misspell(rng: random.Random, term: str) -> str:
+    position = rng.randrange(len(term))
+    return term[:position] + rng.choice("abcxyz") + term[position + 1:]
+
+
+def test_trigrams_are_padded():
+    assert trigrams("mri") == {"  m", " mr", "mri", "ri "}
+
+
+def test_uncapped_index_matches_difflib_over_trigram_candidates():
+    terms = random_terms(1, 2000)
+    index = FuzzyIndex(terms, max_candidates=None)
+    rng = random.Random(2)
+    for _ in range(300):
+        word = misspell(rng, rng.choice(terms))
+        sharing = [term for term in terms if trigrams(term) & trigrams(word)]
+        for cutoff in (0.6, 0.8):
+            assert index.close_matches(word, 3, cutoff) == difflib.get_close_matches(word, sharing, 3, cutoff), word
+
+
+def test_default_cap_agrees_with_difflib_on_typos():
+    terms = random_terms(3, 3000)
+    index = FuzzyIndex(terms)
+    rng = random.Random(4)
+    for _ in range(200):
+        word = misspell(rng, rng.choice(terms))
+        assert index.close_matches(word, 3, 0.8) == difflib.get_close_matches(word, terms, 3, 0.8), word
+
+
+def test_cap_keeps_candidates_tied_with_the_last_one():
+    # Every term shares the same trigrams with the query, so all candidates tie
+    terms = [f"pain{suffix}" for suffix in "abcdefgh"]
+    index = FuzzyIndex(terms, max_candidates=2)
+    assert sorted(index.candidates("pain", 0.5)) == list(range(len(terms)))
+
+
+def test_cap_limits_untied_candidates():
+    terms = ["pain", "paint", "painter", "spain", "pains", "panel", "pawn"]
+    index = FuzzyIndex(terms, max_candidates=2)
+    best = [index.terms[i] for i in index.candidates("pain", 0.0)]
+    assert best[0] == "pain"
+    assert len(best) < len(terms)
+
+
+def test_length_band_excludes_unreachable_terms():
+    index = FuzzyIndex(["mri", "mri scan of the whole spine"])
+    assert [index.terms[i] for i in index.candidates("mri", 0.8)] == ["mri"]
+
+
+def test_no_shared_trigrams_means_no_candidates():
+    index = FuzzyIndex(["mri", "ct scan"])
+    assert index.candidates("zzz", 0.5) == []
+    assert index.close_matches("zzz") == []
+
+
+def test_batch_scores_each_distinct_word_once():
+    index = FuzzyIndex(["diabetes", "asthma", "anemia"])
+    result = index.close_matches_batch(["diabetis", "asthmaa", "diabetis"])
+    assert result == {"diabetis": ["diabetes"], "asthmaa": ["asthma"]}
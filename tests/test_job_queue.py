@@ -0,0 +1,146 @@
+# file: test_job_queue.py
+
+'''
+Tests for JobStore, the SQLite persistence of the job queue: claims and leases,
+recovery of expired leases only, attempt limits, graceful release, migration of
+databases that predate the lease columns, and paged/batched result iteration.
+'''
+
+import os
+import sqlite3
+
+import pytest
+
+from app.services import job_queue
+from app.services.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobStore, job_view, new_job_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "payloads"))
+
+
+def submit(store: JobStore, filename: str = "a.wav") -> str:
+    job_id = new_job_id()
+    with open(store.payload_path(job_id), "wb") as f:
+        f.write(b"audio")
+    store.submit(job_id, filename, "en-US", False, 5)
+    return job_id
+
+
+def expire_lease(store: JobStore, job_id: str, seconds_ago: float = 3600):
+    with store._connect() as db:
+        db.execute("UPDATE jobs SET heartbeat_at = heartbeat_at - ? WHERE id = ?", (seconds_ago, job_id))
+
+
+def test_claims_oldest_job_first_and_leases_it(store):
+    first, second = submit(store), submit(store)
+    job = store.claim_next("worker-a")
+    assert job["id"] == first
+    assert job["status"] == RUNNING and job["worker_id"] == "worker-a" and job["attempts"] == 1
+    assert store.claim_next("worker-b")["id"] == second
+    assert store.claim_next("worker-b") is None
+
+
+def test_finish_requires_the_lease(store):
+    job_id = submit(store)
+    store.claim_next("worker-a")
+    assert not store.finish(job_id, result={"transcription": "x"}, worker_id="worker-b")
+    assert store.get(job_id)["status"] == RUNNING
+    assert store.finish(job_id, result={"transcription": "x"}, worker_id="worker-a")
+    job = store.get(job_id)
+    assert job["status"] == SUCCEEDED
+    assert job_view(job)["result"] == {"transcription": "x"}
+    assert not os.path.exists(store.payload_path(job_id))
+
+
+def test_progress_is_monotonic_and_lease_bound(store):
+    job_id = submit(store)
+    store.claim_next("worker-a")
+    store.update_progress(job_id, 3, 10, worker_id="worker-a")
+    store.update_progress(job_id, 2, 10, worker_id="worker-a")
+    store.update_progress(job_id, 9, 10, worker_id="worker-b")
+    assert store.get(job_id)["segments_done"] == 3
+
+
+def test_recover_leaves_live_leases_alone(store):
+    job_id = submit(store)
+    store.claim_next("worker-a")
+    assert store.recover(max_attempts=3, lease_s=60) == 0
+    assert store.get(job_id)["status"] == RUNNING
+
+
+def test_recover_requeues_expired_leases(store):
+    job_id = submit(store)
+    store.claim_next("worker-a")
+    store.update_progress(job_id, 4, 10, worker_id="worker-a")
+    expire_lease(store, job_id)
+    assert store.recover(max_attempts=3, lease_s=60) == 1
+    job = store.get(job_id)
+    assert job["status"] == QUEUED and job["worker_id"] is None and job["segments_done"] == 0
+    # The crashed worker can no longer finish the job it lost
+    assert not store.finish(job_id, result={}, worker_id="worker-a")
+    assert store.claim_next("worker-b")["attempts"] == 2
+
+
+def test_heartbeat_renews_the_lease(store):
+    job_id = submit(store)
+    store.claim_next("worker-a")
+    expire_lease(store, job_id)
+    assert store.heartbeat("worker-a") == 1
+    assert store.recover(max_attempts=3, lease_s=60) == 0
+
+
+def test_recover_fails_jobs_out_of_attempts(store):
+    job_id = submit(store)
+    for attempt in range(2):
+        store.claim_next(f"worker-{attempt}")
+        expire_lease(store, job_id)
+        store.recover(max_attempts=2, lease_s=60)
+    job = store.get(job_id)
+    assert job["status"] == FAILED and job["error"] == "Job interrupted too many times"
+    assert not os.path.exists(store.payload_path(job_id))
+
+
+def test_release_requeues_only_own_jobs(store):
+    mine, theirs = submit(store), submit(store)
+    store.claim_next("worker-a")
+    store.claim_next("worker-b")
+    assert store.release("worker-a") == 1
+    assert store.get(mine)["status"] == QUEUED
+    assert store.get(theirs)["status"] == RUNNING
+
+
+def test_migrates_databases_without_lease_columns(tmp_path):
+    db_path = str(tmp_path / "old.sqlite3")
+    old_schema = job_queue.SCHEMA.replace("    worker_id        TEXT,\n", "").replace(
+        ",\n    heartbeat_at     REAL", "")
+    assert "worker_id" not in old_schema and "heartbeat_at" not in old_schema
+    with sqlite3.connect(db_path) as db:
+        db.executescript(old_schema)
+        db.execute("INSERT INTO jobs (id, status, language, payload_path, created_at) VALUES (?, ?, ?, ?, ?)",
+                   ("old", RUNNING, "en-US", "x", 0.0))
+    store = JobStore(db_path, str(tmp_path / "payloads"))
+    job = store.get("old")
+    assert job["worker_id"] is None and job["heartbeat_at"] is None
+    # A job left running by the old version has no heartbeat, so it counts as expired
+    assert store.recover(max_attempts=3, lease_s=60) == 1
+
+
+def test_iter_results_pages_and_batches_ids(store, monkeypatch):
+    job_ids = []
+    for i in range(7):
+        job_id = submit(store, f"f{i}.wav")
+        store.claim_next("worker-a")
+        store.finish(job_id, result={"n": i}, worker_id="worker-a")
+        job_ids.append(job_id)
+    failed = submit(store)
+    store.claim_next("worker-a")
+    store.finish(failed, error="boom", worker_id="worker-a")
+
+    assert [job["result"]["n"] for job in store.iter_results(page_size=2)] == list(range(7))
+
+    monkeypatch.setattr(job_queue, "ID_BATCH", 2)
+    wanted = job_ids[1:6] + [job_ids[1], failed, "missing"]
+    found = [job["id"] for job in store.iter_results(wanted, page_size=1)]
+    assert sorted(found) == sorted(job_ids[1:6])
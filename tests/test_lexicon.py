@@ -0,0 +1,68 @@
+# file: test_lexicon.py
+
+'''
+Tests for the freshness check of the compiled lexicon artifact: it is reused only while
+the workbook, the format version and the hash of the other build inputs (VARIATION_MAP
+and the builder/matcher code) all match what the running code would produce.
+'''
+
+import os
+
+import pytest
+
+from app.services import lexicon
+from app.services.lexicon import Lexicon, write_lexicon_artifact
+
+ENTRIES = {("procedure", "mri"): ("RAD002", "MRI")}
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    source = tmp_path / "terms.xlsx"
+    source.write_bytes(b"workbook")
+    path = str(tmp_path / "terms.lex")
+    write_lexicon_artifact(ENTRIES, path, str(source))
+    return path, str(source)
+
+
+def test_header_records_version_and_build_hash(artifact):
+    header = Lexicon(artifact[0]).header
+    assert header["format_version"] == lexicon.FORMAT_VERSION
+    assert header["build_hash"] == lexicon.build_inputs_hash()
+
+
+def test_fresh_artifact_is_reused(artifact):
+    assert lexicon._artifact_is_fresh(*artifact)
+
+
+def test_changed_workbook_is_stale(artifact):
+    path, source = artifact
+    os.utime(source, (0, 0))
+    assert not lexicon._artifact_is_fresh(path, source)
+
+
+def test_changed_build_inputs_are_stale(artifact, monkeypatch):
+    monkeypatch.setattr(lexicon, "build_inputs_hash", lambda: "changed")
+    assert not lexicon._artifact_is_fresh(*artifact)
+
+
+def test_changed_format_version_is_stale(artifact, monkeypatch):
+    monkeypatch.setattr(lexicon, "FORMAT_VERSION", lexicon.FORMAT_VERSION + 1)
+    assert not lexicon._artifact_is_fresh(*artifact)
+
+
+def test_build_hash_covers_the_variation_map(monkeypatch):
+    before = lexicon.build_inputs_hash()
+    monkeypatch.setitem(lexicon.VARIATION_MAP, "cat scan", "ct scan")
+    lexicon.build_inputs_hash.cache_clear()
+    try:
+        assert lexicon.build_inputs_hash() != before
+    finally:
+        lexicon.build_inputs_hash.cache_clear()
+
+
+def test_artifact_without_workbook_is_kept(artifact, monkeypatch):
+    path, source = artifact
+    os.remove(source)
+    monkeypatch.setattr(lexicon, "build_inputs_hash", lambda: "changed")
+    assert lexicon._artifact_is_fresh(path, source)
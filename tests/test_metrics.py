@@ -0,0 +1,35 @@
+# file: test_metrics.py
+
+'''
+Tests for the Prometheus rendering of scrape-time collectors: a collector that raises
+drops only its own samples, and the failure is counted in collector_errors_total.
+'''
+
+from app.services import metrics
+
+
+def collect_ok():
+    yield ("widgets", "gauge", "Widgets in stock", [({"kind": "blue"}, 3), ({"kind": "red"}, None)])
+
+
+def collect_locked_db():
+    yield ("jobs", "gauge", "Jobs by state", [({"status": "queued"}, 1)])
+    raise RuntimeError("database is locked")
+
+
+def test_failing_collector_drops_only_its_block(monkeypatch):
+    monkeypatch.setattr(metrics, "_collectors", [collect_locked_db, collect_ok])
+    text = metrics.render_prometheus()
+    assert 'widgets{kind="blue"} 3' in text
+    assert 'kind="red"' not in text
+    assert "jobs{" not in text
+    assert 'collector_errors_total{collector="collect_locked_db"}' in text
+    assert 'collector="collect_ok"' not in text
+
+
+def test_collector_errors_accumulate_across_scrapes(monkeypatch):
+    monkeypatch.setattr(metrics, "_collectors", [collect_locked_db])
+    before = metrics.COLLECTOR_ERRORS._values.get(("collect_locked_db",), 0)
+    metrics.render_prometheus()
+    metrics.render_prometheus()
+    assert metrics.COLLECTOR_ERRORS._values[("collect_locked_db",)] == before + 2
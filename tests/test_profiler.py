@@ -0,0 +1,101 @@
+# file: test_profiler.py
+
+'''
+Tests for request profiling gates and profile files: the X-Profile header is ignored unless
+PROFILE_HEADER_ENABLED is on (and then needs PROFILE_TOKEN when one is set), sampling follows
+PROFILE_SAMPLE_RATE, a reused request id never overwrites an earlier profile, only one
+request is profiled at a time, and only the newest PROFILE_MAX_FILES profiles are kept.
+'''
+
+import os
+import pstats
+
+import pytest
+
+from app.config import settings
+from app.services.profiler import prune_profiles, request_id_from, request_profiler, should_profile
+
+
+@pytest.fixture(autouse=True)
+def profile_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "PROFILE_HEADER_ENABLED", False)
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", "")
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 50)
+
+
+def test_header_is_ignored_by_default():
+    assert not should_profile({"x-profile": "1"})
+
+
+def test_header_works_once_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_HEADER_ENABLED", True)
+    assert should_profile({"x-profile": "1"})
+    assert should_profile({"x-profile": "true"})
+    assert not should_profile({"x-profile": "0"})
+    assert not should_profile({})
+
+
+def test_token_is_required_when_set(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_HEADER_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", "s3cret")
+    assert not should_profile({"x-profile": "1"})
+    assert not should_profile({"x-profile": "1", "x-profile-token": "wrong"})
+    assert should_profile({"x-profile": "1", "x-profile-token": "s3cret"})
+
+
+def test_sampling_follows_the_rate(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 1.0)
+    assert should_profile({})
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+    assert not should_profile({})
+
+
+def test_request_ids_are_sanitized():
+    assert request_id_from({"x-request-id": "../../etc/passwd"}) == "....etcpasswd"
+    assert len(request_id_from({"x-request-id": "a" * 200})) == 64
+    assert len(request_id_from({})) == 32
+
+
+def test_reused_request_id_gets_a_new_file():
+    paths = []
+    for _ in range(2):
+        with request_profiler("same-id", True) as path:
+            sum(range(1000))
+        paths.append(path)
+    assert paths[0] != paths[1]
+    assert all(os.path.basename(path).startswith("same-id-") for path in paths)
+    for path in paths:
+        assert pstats.Stats(path).total_calls > 0
+
+
+def test_one_profile_at_a_time():
+    with request_profiler("outer", True) as outer:
+        with request_profiler("inner", True) as inner:
+            pass
+    assert outer is not None and inner is None
+    with request_profiler("disabled", False) as path:
+        assert path is None
+
+
+def test_only_the_newest_profiles_are_kept(tmp_path):
+    for age in range(5):
+        path = tmp_path / f"profile-{age}.prof"
+        path.write_bytes(b"")
+        os.utime(path, (1000 - age, 1000 - age))
+    (tmp_path / "notes.txt").write_bytes(b"")
+    prune_profiles(str(tmp_path), 2)
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt", "profile-0.prof", "profile-1.prof"]
+    prune_profiles(str(tmp_path / "missing"), 2)
+
+
+def test_writing_a_profile_prunes_old_ones(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 1)
+    with request_profiler("first", True) as first:
+        pass
+    os.utime(first, (0, 0))  # Clearly older than the next one, whatever the clock resolution
+    with request_profiler("second", True):
+        pass
+    kept = os.listdir(os.path.join(settings.UPLOAD_DIR, "profiles"))
+    assert len(kept) == 1 and kept[0].startswith("second-")
@@ -0,0 +1,81 @@
+# file: test_recognition_executor.py
+
+'''
+Tests for the recognition pool and recognition slots: calls cancelled before a worker picks
+them up leave the queue gauge, and recognition_slot() bounds the recognitions in flight to
+RECOGNITION_MAX_WORKERS for their whole lifetime.
+'''
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+from app.config import settings
+from app.services import recognition_executor
+from app.services.recognition_executor import recognition_slot, recognition_stats, run_recognition
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    recognition_executor.shutdown_executor()
+    monkeypatch.setattr(settings, "RECOGNITION_MAX_WORKERS", 1)
+    yield
+    recognition_executor.shutdown_executor()
+
+
+def test_cancelled_queued_call_leaves_the_queue(one_worker):
+    release = threading.Event()
+
+    async def run():
+        blocker = asyncio.create_task(run_recognition(release.wait))
+        waiting = asyncio.create_task(run_recognition(time.sleep, 0))
+        await asyncio.sleep(0.05)
+        assert recognition_stats()["queued"] == 1
+        waiting.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        await blocker
+
+    asyncio.run(run())
+    stats = recognition_stats()
+    assert stats["queued"] == 0 and stats["active"] == 0
+
+
+def test_slots_bound_recognitions_in_flight(one_worker, monkeypatch):
+    monkeypatch.setattr(settings, "RECOGNITION_MAX_WORKERS", 2)
+    peak = 0
+
+    async def recognition():
+        nonlocal peak
+        async with recognition_slot():
+            peak = max(peak, recognition_stats()["recognitions_active"])
+            await asyncio.sleep(0.02)
+
+    async def run():
+        tasks = [asyncio.create_task(recognition()) for _ in range(6)]
+        await asyncio.sleep(0.005)
+        assert recognition_stats()["recognitions_waiting"] == 4
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert peak == 2
+    stats = recognition_stats()
+    assert stats["recognitions_active"] == 0 and stats["recognitions_waiting"] == 0
+
+
+def test_cancelled_recognition_frees_its_slot(one_worker):
+    async def run():
+        holder = asyncio.create_task(hold_slot())
+        await asyncio.sleep(0.01)
+        holder.cancel()
+        await asyncio.sleep(0)
+        async with recognition_slot():
+            return recognition_stats()["recognitions_active"]
+
+    async def hold_slot():
+        async with recognition_slot():
+            await asyncio.sleep(10)
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,186 @@
+# file: test_resilience.py
+
+'''
+Tests for the resilience layer: failure classification, circuit breaker transitions
+(closed -> open -> half-open -> closed/open), and ResilientRecognizer retrying only
+transient failures, failing fast while the circuit is open, and hedging slow calls.
+'''
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services import resilience
+from app.services.recognizer_backend import RecognitionError
+from app.services.resilience import CircuitBreaker, CircuitOpenError, ResilientRecognizer, is_transient
+
+PCM = b"\x00\x00" * 1600  # 0.1 s of 16 kHz audio
+SEGMENT = [{"text": "ok", "offset": 0, "duration": 1}]
+
+
+class FakeBackend:
+    """Recognizer backend whose calls play back a script of delays and outcomes"""
+
+    name = "fake"
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    async def recognize_pcm(self, pcm: bytes, sample_rate: int, language: str):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        delay, outcome = step if isinstance(step, tuple) else (0.0, step)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "RECOGNITION_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "RECOGNITION_RETRY_BASE_S", 0.0)
+    monkeypatch.setattr(settings, "RECOGNITION_RETRY_MAX_S", 0.0)
+    monkeypatch.setattr(settings, "RECOGNITION_HEDGE_PERCENTILE", 0)
+    monkeypatch.setattr(settings, "RECOGNITION_ATTEMPT_TIMEOUT_S", 5.0)
+
+
+def recognize(recognizer: ResilientRecognizer):
+    return asyncio.run(recognizer.recognize_pcm(PCM, 16000, "en-US"))
+
+
+def test_is_transient():
+    assert is_transient(RecognitionError("canceled"))
+    assert is_transient(asyncio.TimeoutError())
+    assert is_transient(ConnectionResetError())
+    assert is_transient(HTTPException(status_code=503))
+    assert is_transient(HTTPException(status_code=429))
+    assert not is_transient(HTTPException(status_code=400))
+    assert not is_transient(ValueError("bad input"))
+    assert not is_transient(KeyError("bug"))
+    assert not is_transient(CircuitOpenError(1.0))
+
+
+class TestCircuitBreaker:
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+        return now
+
+    def breaker(self):
+        return CircuitBreaker(window=10, min_calls=4, failure_ratio=0.5, cooldown_s=30)
+
+    def test_stays_closed_below_min_calls_or_ratio(self, clock):
+        breaker = self.breaker()
+        for _ in range(3):
+            breaker.record(False)
+        assert breaker.state == "closed"
+        for _ in range(4):
+            breaker.record(True)
+        breaker.record(False)  # 4 failures of 8 calls: at the ratio
+        assert breaker.state == "open"
+
+    def test_opens_and_fails_fast_until_cooldown(self, clock):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(False)
+        assert breaker.state == "open" and breaker.opened_count == 1
+        with pytest.raises(CircuitOpenError) as refused:
+            breaker.allow()
+        assert refused.value.retry_after_s == pytest.approx(30)
+        breaker.record(False)  # Late outcome of a call started before opening: ignored
+        assert breaker.status()["recent_calls"] == 0
+
+    def test_half_open_lets_one_probe_through(self, clock):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(False)
+        clock[0] += 31
+        breaker.allow()
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()  # Second caller while the probe is in flight
+        breaker.record(True)
+        assert breaker.state == "closed"
+        breaker.allow()
+
+    def test_failed_probe_reopens(self, clock):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(False)
+        clock[0] += 31
+        breaker.allow()
+        breaker.record(False)
+        assert breaker.state == "open" and breaker.opened_count == 2
+
+    def test_abandoned_probe_frees_the_slot(self, clock):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(False)
+        clock[0] += 31
+        breaker.allow()
+        breaker.abandon()
+        breaker.allow()
+        assert breaker.state == "half_open"
+
+
+def test_retries_transient_failures():
+    backend = FakeBackend(RecognitionError("canceled"), SEGMENT)
+    recognizer = ResilientRecognizer(backend)
+    assert recognize(recognizer) == SEGMENT
+    assert backend.calls == 2
+    assert recognizer.stats["retries"] == 1
+    assert recognizer.breaker.status()["recent_failures"] == 1
+
+
+def test_gives_up_after_max_attempts():
+    backend = FakeBackend(RecognitionError("canceled"))
+    recognizer = ResilientRecognizer(backend)
+    with pytest.raises(RecognitionError):
+        recognize(recognizer)
+    assert backend.calls == 3
+
+
+def test_non_transient_failure_is_not_retried_or_counted():
+    backend = FakeBackend(ValueError("bad input"), SEGMENT)
+    recognizer = ResilientRecognizer(backend)
+    with pytest.raises(ValueError):
+        recognize(recognizer)
+    assert backend.calls == 1
+    assert recognizer.breaker.status()["recent_calls"] == 0
+
+
+def test_attempt_timeout_is_transient(monkeypatch):
+    monkeypatch.setattr(settings, "RECOGNITION_ATTEMPT_TIMEOUT_S", 0.05)
+    backend = FakeBackend((1.0, SEGMENT), SEGMENT)
+    recognizer = ResilientRecognizer(backend)
+    assert recognize(recognizer) == SEGMENT
+    assert backend.calls == 2
+
+
+def test_open_circuit_fails_fast_without_calling_backend():
+    backend = FakeBackend(RecognitionError("outage"))
+    recognizer = ResilientRecognizer(backend)
+    recognizer.breaker = CircuitBreaker(window=10, min_calls=2, failure_ratio=0.5, cooldown_s=60)
+    with pytest.raises(CircuitOpenError):
+        recognize(recognizer)  # Two failed attempts open the circuit; the retry is refused
+    assert backend.calls == 2
+    with pytest.raises(CircuitOpenError):
+        recognize(recognizer)
+    assert backend.calls == 2
+    assert recognizer.stats["rejected"] == 2
+
+
+def test_slow_call_is_hedged(monkeypatch):
+    monkeypatch.setattr(settings, "RECOGNITION_HEDGE_PERCENTILE", 95)
+    monkeypatch.setattr(settings, "RECOGNITION_HEDGE_MIN_DELAY_S", 0.01)
+    backend = FakeBackend((2.0, [{"text": "slow"}]), (0.0, SEGMENT))
+    recognizer = ResilientRecognizer(backend)
+    recognizer._latencies.extend([0.01] * resilience.HEDGE_MIN_SAMPLES)
+    assert recognize(recognizer) == SEGMENT
+    assert recognizer.stats["hedges"] == 1 and recognizer.stats["hedges_won"] == 1
@@ -0,0 +1,90 @@
+# file: test_term_matcher.py
+
+'''
+Tests for the Aho-Corasick TermMatcher: it must report exactly what a per-term
+`\\bterm\\b` regex search reports, and a scan split across calls must find the same
+occurrences as one scan over the whole text.
+'''
+
+import re
+import random
+
+from app.services.term_matcher import TermMatcher
+
+
+TERMS = ["mri", "x-ray", "chest x-ray", "ct", "ct scan", "blood sugar", "sugar", "a1c", "(copd)", "c++"]
+
+
+# Reference result: every `\bterm\b` match of every term, as (term_index, start, end)
+def regex_matches(terms, text):
+    found = set()
+    for term_id, term in enumerate(terms):
+        pattern = re.compile(r"(?=(\b" + re.escape(term) + r"\b))")
+        for m in pattern.finditer(text):
+            found.add((term_id, m.start(1), m.end(1)))
+    return found
+
+
+def test_finds_whole_words_only():
+    matcher = TermMatcher(TERMS)
+    found = {(TERMS[t], s, e) for t, s, e in matcher.find_all("an mri, not mrin or smri; mri")}
+    assert found == {("mri", 3, 6), ("mri", 26, 29)}
+
+
+def test_reports_overlapping_terms():
+    matcher = TermMatcher(TERMS)
+    text = "chest x-ray and ct scan"
+    found = {TERMS[t] for t, _, _ in matcher.find_all(text)}
+    assert found == {"chest x-ray", "x-ray", "ct", "ct scan"}
+
+
+def test_terms_with_non_word_edges_follow_regex_boundaries():
+    matcher = TermMatcher(TERMS)
+    for text in ["history of (copd).", "a(copd)b", "uses c++ daily", "c++x", "xc++ y"]:
+        assert set(matcher.find_all(text)) == regex_matches(TERMS, text), text
+
+
+def test_matches_regex_on_random_text():
+    rng = random.Random(7)
+    pieces = TERMS + [" ", "  ", ",", ".", "-", "x", "s", "1", "_"]
+    matcher = TermMatcher(TERMS)
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 12)))
+        assert set(matcher.find_all(text)) == regex_matches(TERMS, text), text
+
+
+def test_without_word_boundary_reports_substrings():
+    matcher = TermMatcher(["mri"])
+    assert list(matcher.find_all("smris", word_boundary=False)) == [(0, 1, 4)]
+
+
+def test_scan_state_carries_across_chunks():
+    matcher = TermMatcher(TERMS)
+    text = "ordered a chest x-ray, ct scan and blood sugar"
+    whole, _ = matcher.scan(text)
+    for split in range(len(text) + 1):
+        first, state = matcher.scan(text[:split])
+        second, _ = matcher.scan(text[split:], state)
+        assert first + [(t, end + split) for t, end in second] == whole, split
+
+
+def test_match_exact():
+    matcher = TermMatcher(TERMS + ["mri"])
+    assert matcher.match_exact("mri") == [0, len(TERMS)]
+    assert matcher.match_exact("ct scan") == [TERMS.index("ct scan")]
+    assert matcher.match_exact("ct sc") == []
+    assert matcher.match_exact("mris") == []
+
+
+def test_empty_terms_never_match():
+    matcher = TermMatcher(["", "mri"])
+    assert list(matcher.find_all("an mri")) == [(1, 3, 6)]
+    assert matcher.match_exact("") == []
+
+
+def test_round_trips_through_arrays():
+    matcher = TermMatcher(TERMS)
+    rebuilt = TermMatcher.from_arrays(matcher.to_arrays())
+    text = "chest x-ray, (copd), a1c and blood sugar"
+    assert list(rebuilt.find_all(text)) == list(matcher.find_all(text))
+    assert len(rebuilt) == len(TERMS)
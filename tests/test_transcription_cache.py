@@ -0,0 +1,82 @@
+# file: test_transcription_cache.py
+
+'''
+Tests for the two-tier TranscriptionCache: keys separate audio, language and backend,
+the memory tier evicts least recently used entries, evicted entries are reloaded from
+disk, and the disk tier stays under its size bound by dropping its oldest files.
+'''
+
+import os
+import asyncio
+
+from app.services.transcription_cache import TranscriptionCache, cache_key
+
+
+def result(text: str) -> dict:
+    return {"transcription": text, "entities": [], "segments": []}
+
+
+def test_cache_key_depends_on_audio_language_and_backend():
+    base = cache_key(b"audio", "en-US", "stub/1")
+    assert base == cache_key(b"audio", "en-US", "stub/1")
+    assert base != cache_key(b"audio!", "en-US", "stub/1")
+    assert base != cache_key(b"audio", "en-GB", "stub/1")
+    assert base != cache_key(b"audio", "en-US", "azure/1")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TranscriptionCache(memory_entries=2, disk_dir=None, disk_max_bytes=0)
+
+    async def run():
+        await cache.put("a", result("a"))
+        await cache.put("b", result("b"))
+        assert await cache.get("a") == result("a")  # "a" is now the most recently used
+        await cache.put("c", result("c"))
+        return await cache.get("a"), await cache.get("b"), await cache.get("c")
+
+    assert asyncio.run(run()) == (result("a"), None, result("c"))
+    status = cache.status()
+    assert status["memory_evictions"] == 1
+    assert status["misses"] == 1
+    assert status["memory_entries"] == 2
+
+
+def test_evicted_entries_are_reloaded_from_disk(tmp_path):
+    cache = TranscriptionCache(memory_entries=1, disk_dir=str(tmp_path), disk_max_bytes=1024 * 1024)
+
+    async def run():
+        await cache.put("a", result("a"))
+        await cache.put("b", result("b"))  # Pushes "a" out of memory
+        return await cache.get("a")
+
+    assert asyncio.run(run()) == result("a")
+    assert cache.stats["disk_hits"] == 1
+    # A fresh instance over the same directory sees the persisted entries and their size
+    reopened = TranscriptionCache(memory_entries=1, disk_dir=str(tmp_path), disk_max_bytes=1024 * 1024)
+    assert reopened.status()["disk_bytes"] == cache.status()["disk_bytes"] > 0
+    assert asyncio.run(reopened.get("b")) == result("b")
+
+
+def test_disk_tier_stays_under_its_size_bound(tmp_path):
+    entry_size = len(b'{"transcription": "xxxxxxxxxx", "entities": [], "segments": []}')
+    cache = TranscriptionCache(memory_entries=1, disk_dir=str(tmp_path), disk_max_bytes=entry_size * 3)
+
+    async def run():
+        for i in range(6):
+            await cache.put(f"k{i}", result(f"{i}" * 10))
+            # Distinct mtimes so the eviction order is deterministic
+            os.utime(tmp_path / f"k{i}.json", (i, i))
+
+    asyncio.run(run())
+    remaining = sorted(os.listdir(tmp_path))
+    assert len(remaining) <= 3
+    assert "k5.json" in remaining and "k0.json" not in remaining
+    assert cache.status()["disk_bytes"] <= entry_size * 3
+    assert cache.stats["disk_evictions"] >= 3
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    cache = TranscriptionCache(memory_entries=1, disk_dir=str(tmp_path), disk_max_bytes=1024)
+    (tmp_path / "broken.json").write_text("{not json")
+    assert asyncio.run(cache.get("broken")) is None
+    assert cache.stats["misses"] == 1